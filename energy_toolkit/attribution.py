@@ -0,0 +1,146 @@
+"""
+Attribution module.
+Offers the attribution of shared energy domains to the measured process tree.
+"""
+
+import os
+import resource
+import threading
+from typing import Tuple
+
+from energy_toolkit.procfs import ProcFS
+from energy_toolkit.rapl_interface import RAPLInterface
+from energy_toolkit.util import CPU_TYPE
+
+
+class EnergyAttribution:
+    """
+    Attributes the energy of a shared domain to the programs started by the toolkit. While a
+    program runs, a sampler thread reads the energy counter, the busy time of all cpus in the
+    domain and the cpu time of the toolkit's process tree. The energy of each interval is
+    apportioned by the share of the domain's busy time the process tree used.
+
+    Busy times are only available in scheduler ticks, so the attribution of programs shorter than
+    a few ticks is coarse. Programs that already finished are accounted with their exact resource
+    usage.
+    """
+
+    def __init__(self, vendor: CPU_TYPE, cores, interval=0.05):
+        """
+        Create a new attribution for the domains of the given core or set of cores. Intel
+        counters cover the whole package, AMD counters the physical core including its hardware
+        threads
+        """
+        cores = {cores} if isinstance(cores, int) else set(cores)
+        self._vendor = vendor
+        self._readers = list(RAPLInterface.domains(vendor, cores).values())
+        self._interval = interval
+
+        self._domain = set()
+        for core in cores:
+            if vendor == CPU_TYPE.INTEL:
+                self._domain |= ProcFS.read_topology(core, "package_cpus_list")
+            elif vendor == CPU_TYPE.AMD:
+                self._domain |= ProcFS.read_topology(core, "core_cpus_list")
+            else:
+                self._domain.add(core)
+
+        # The sampler thread lives as long as the attribution, so starting an execution only
+        # signals it instead of paying the thread startup inside the timed section
+        self._condition = threading.Condition()
+        self._active = False
+
+        self._children_start = 0.0
+        self._last: Tuple[float, float, float] = None
+        self._attributed = 0.0
+
+        self._thread = threading.Thread(
+            target=self._sample, name="energy-toolkit-attribution", daemon=True
+        )
+        self._thread.start()
+
+        # Keep the sampler off the measurement cores, unless there are no other cores
+        others = os.sched_getaffinity(0) - cores
+        if others:
+            os.sched_setaffinity(self._thread.native_id, others)
+
+    def _read_energy(self) -> float:
+        """Read the summed energy of all domains"""
+        return sum(RAPLInterface.read(self._vendor, reader) for reader in self._readers)
+
+    def get_domain(self) -> set:
+        """Return the cpus whose busy time is part of the energy domain"""
+        return self._domain
+
+    @staticmethod
+    def _children_time() -> float:
+        """Return the cpu time in seconds of all reaped children of the toolkit"""
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return usage.ru_utime + usage.ru_stime
+
+    def _tree_time(self, finished: bool) -> float:
+        """Return the cpu time the process tree used since start"""
+        cpu_time = self._children_time() - self._children_start
+        if not finished:
+            cpu_time += ProcFS.read_descendants_cpu_time(os.getpid())
+
+        return cpu_time
+
+    def _account(self, energy: float, finished: bool) -> None:
+        """
+        Attribute the energy since the last sample by the cpu share of the process tree. Has to
+        be called with the condition held
+        """
+        busy = ProcFS.read_cpus_busy_time(self._domain)
+        tree = self._tree_time(finished)
+
+        last_energy, last_busy, last_tree = self._last
+        delta_energy = energy - last_energy
+        delta_busy = busy - last_busy
+        delta_tree = tree - last_tree
+
+        # Without any observed busy time the tree is the only candidate
+        share = 1.0 if delta_busy <= 0 else min(max(delta_tree / delta_busy, 0.0), 1.0)
+        self._attributed += max(delta_energy, 0.0) * share
+        self._last = (energy, busy, tree)
+
+    def _sample(self) -> None:
+        """Sample the domain in fixed intervals while a program is executed"""
+        with self._condition:
+            while True:
+                while not self._active:
+                    self._condition.wait()
+
+                # Woken up early if the execution ends
+                self._condition.wait(self._interval)
+                if self._active:
+                    self._account(self._read_energy(), False)
+
+    def prepare(self) -> None:
+        """
+        Take the busy time and cpu time baselines of the next execution. Called before the timed
+        section, as reading them costs a few syscalls
+        """
+        with self._condition:
+            self._children_start = self._children_time()
+            self._last = (0.0, ProcFS.read_cpus_busy_time(self._domain), 0.0)
+            self._attributed = 0.0
+
+    def start(self, energy: float) -> None:
+        """Start attributing with the energy reading taken right before the execution"""
+        with self._condition:
+            self._last = (energy,) + self._last[1:]
+            self._active = True
+            self._condition.notify()
+
+    def stop(self, energy: float) -> float:
+        """
+        Stop attributing with the energy reading taken right after the execution. Returns the
+        energy attributed to the process tree
+        """
+        with self._condition:
+            self._active = False
+            self._condition.notify()
+
+            self._account(energy, True)
+            return self._attributed
@@ -1,16 +1,66 @@
+# pylint: disable=too-many-lines
 """
 Command line interface of the energy-toolkit
 The cli uses click as framework to realize user interaction
 """
 
+import contextlib
 import os
+import time
 from datetime import datetime
 import click
+import numpy as np
+from energy_toolkit.compare import Comparator
 from energy_toolkit.config_parser import ConfigParser
-from energy_toolkit.energy_toolkit import EnergyToolkit
+from energy_toolkit.dashboard import Dashboard, ResultStreamer
+from energy_toolkit.energy_toolkit import EnergyToolkit, MeasurementAborted
+from energy_toolkit.logger import Logger
+from energy_toolkit.measurement_cache import MeasurementCache
+from energy_toolkit.metrics import MetricsExporter
 from energy_toolkit.plotter import Plotter
+from energy_toolkit.power_limit import PowerCapSweep
+from energy_toolkit.profiler import EnergyProfile, EnergyProfiler
+from energy_toolkit.procfs import CoreIsolation, ProcFS
 from energy_toolkit.program import Program
-from energy_toolkit.util import PlotMode
+from energy_toolkit.result_store import ResultStore
+from energy_toolkit.scaling import ScalingAnalysis
+from energy_toolkit.util import (
+    CPU_TYPE,
+    CacheMode,
+    FailurePolicy,
+    InterferencePolicy,
+    PlotMode,
+    ToolkitUtil,
+)
+
+
+class CoreSetType(click.ParamType):
+    """Click parameter type for a set of cores in the cpu list notation, e.g. 0-7,16"""
+
+    name = "cores"
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, set):
+            return value
+
+        try:
+            cores = ProcFS.parse_cpu_list(str(value))
+        except ValueError:
+            self.fail(f"'{value}' is not a core list like 2 or 0-7,16.", param, ctx)
+
+        if not cores:
+            self.fail("No core given.", param, ctx)
+
+        unknown = {core for core in cores if core >= os.cpu_count()}
+        if unknown:
+            self.fail(
+                f"Cores {ProcFS.format_cpu_list(unknown)} do not exist, the system has "
+                f"{os.cpu_count()} cores.",
+                param,
+                ctx,
+            )
+
+        return cores
 
 
 @click.group()
@@ -29,10 +79,10 @@ def cli():
 @click.option(
     "--core",
     "-c",
-    type=click.IntRange(0, os.cpu_count()),
-    default=0,
+    type=CoreSetType(),
+    default="0",
     show_default=True,
-    help="Core the measurement should be performed on.",
+    help="Core or set of cores the measurement should be performed on, e.g. 2 or 0-7,16.",
 )
 @click.option(
     "--repetitions",
@@ -55,7 +105,145 @@ def cli():
 )
 @click.option("--verbose", "-v", is_flag=True, help="Output debug prints")
 @click.option("--stats", "-s", is_flag=True, help="Print statistics after execution")
-def measure(programs, core, repetitions, datapoints, output, verbose, stats):
+@click.option(
+    "--warmup",
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+    help="Unrecorded warm-up executions per program, unless set in the PROGRAMS file.",
+)
+@click.option(
+    "--warmup-time",
+    type=click.FloatRange(min=0),
+    default=0.0,
+    show_default=True,
+    help="Minimal warm-up time in seconds per program, unless set in the PROGRAMS file.",
+)
+@click.option(
+    "--cache-mode",
+    type=click.Choice(["warm", "drop", "evict"], case_sensitive=False),
+    default="warm",
+    show_default=True,
+    help="Page cache state of each repetition, unless set in the PROGRAMS file. 'drop' drops "
+    "the whole page cache, 'evict' evicts the program's executable and input file.",
+)
+@click.option(
+    "--perf",
+    is_flag=True,
+    help="Record performance counters (instructions, cycles, task-clock, ...) per repetition.",
+)
+@click.option(
+    "--metrics-port",
+    type=click.IntRange(0, 65535),
+    default=None,
+    help="Serve live campaign metrics in the Prometheus format on localhost at this port.",
+)
+@click.option(
+    "--event-log",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Write all log messages and measurement events as JSON lines to this file.",
+)
+@click.option(
+    "--store",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Additionally add the results as a campaign to this SQLite result store.",
+)
+@click.option("--label", default="", help="Label of the campaign in the result store.")
+@click.option(
+    "--cache",
+    type=click.Path(file_okay=False),
+    default=None,
+    help="Measurement cache directory. Unchanged programs are served from cached results.",
+)
+@click.option(
+    "--cache-ttl",
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help="Hours after which cached results expire.",
+)
+@click.option(
+    "--cache-size",
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help="Maximal size of the measurement cache in MiB. Least recently used entries are evicted.",
+)
+@click.option("--force", is_flag=True, help="Measure all programs even if cached results exist.")
+@click.option(
+    "--timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help="Seconds after which an execution is killed, unless set in the PROGRAMS file.",
+)
+@click.option(
+    "--on-failure",
+    type=click.Choice(["retry", "skip", "abort"], case_sensitive=False),
+    default="retry",
+    show_default=True,
+    help="Handling of failed or timed out executions. 'retry' measures the repetition again and "
+    "skips the program once the retries are exhausted.",
+)
+@click.option(
+    "--retries",
+    type=click.IntRange(min=0),
+    default=3,
+    show_default=True,
+    help="Retries of a failed repetition with --on-failure retry.",
+)
+@click.option(
+    "--isolate",
+    is_flag=True,
+    help="Move all other tasks and movable interrupts off the measurement core while measuring.",
+)
+@click.option(
+    "--priority",
+    type=click.Choice(["realtime", "high"], case_sensitive=False),
+    default=None,
+    help="Run the measured programs with real-time (SCHED_FIFO) or the highest nice priority.",
+)
+@click.option(
+    "--attribute",
+    is_flag=True,
+    help="Additionally record the share of the energy domain used by the measured programs.",
+)
+@click.option(
+    "--regions",
+    is_flag=True,
+    help="Record the energy and time of the regions the measured programs mark with roi.h or "
+    "energy_toolkit.roi.",
+)
+@click.option(
+    "--native",
+    is_flag=True,
+    help="Measure whole datapoints in the native C measurement kernel. Records energy and time "
+    "only, recommended for sub-millisecond programs.",
+)
+@click.option(
+    "--interference",
+    type=click.Choice(["off", "flag", "remeasure"], case_sensitive=False),
+    default="off",
+    show_default=True,
+    help="Detect repetitions disturbed by foreign activity on the measurement cores. 'flag' "
+    "keeps and counts them, 'remeasure' measures them again up to --retries times.",
+)
+@click.option(
+    "--interference-threshold",
+    type=click.FloatRange(min=0, min_open=True),
+    default=0.05,
+    show_default=True,
+    help="Share of the repetition time foreign tasks may run or wait on the measurement cores.",
+)
+@click.option(
+    "--stream",
+    is_flag=True,
+    help="Append every datapoint to a results.partial.csv as soon as it is recorded, so the "
+    "campaign can be followed with the watch command.",
+)
+def measure(programs, core, repetitions, datapoints, output, verbose, stats, warmup, # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+            warmup_time, cache_mode, perf, metrics_port, event_log, store, label, cache,
+            cache_ttl, cache_size, force, timeout, on_failure, retries, isolate, priority,
+            attribute, regions, native, interference, interference_threshold, stream):
     """Measure command. Used to measure the files defined in the given program config."""
 
     # Validate that the command was called with elevated rights
@@ -74,31 +262,58 @@ def measure(programs, core, repetitions, datapoints, output, verbose, stats):
 
     if verbose:
         debug_log("Configuration valid.")
-        debug_log(f"Running analysis on core {core}.")
+        debug_log(f"Running analysis on cores {ProcFS.format_cpu_list(core)}.")
         debug_log(f"Measurement will record {datapoints}.")
         debug_log(f"Each datapoint will be averaged over {repetitions}.")
         debug_log(f"Resulting files will be saved at {os.path.abspath(output)}")
 
     # Create the toolkit with the defined configuration
-    toolkit = EnergyToolkit(datapoints, repetitions, core, [], output)
+    toolkit = EnergyToolkit(
+        datapoints,
+        repetitions,
+        core,
+        [],
+        output,
+        perf_counters=perf,
+        cache=create_cache(cache, cache_ttl, cache_size),
+        force=force,
+        timeout=timeout,
+        failure_policy=FailurePolicy.str_to_failurepolicy(on_failure.lower()),
+        retries=retries,
+        attribution=attribute,
+        regions=regions,
+        native=native,
+        interference=InterferencePolicy.str_to_interferencepolicy(interference.lower()),
+        interference_threshold=interference_threshold,
+    )
 
     # Add the parsed programs to the toolkit
-    for prog_obj in config["programs"]:
-        pname = prog_obj["executeable"]
+    for prog in create_programs(config, warmup, warmup_time, cache_mode, verbose):
+        toolkit.add_program(prog)
 
-        if verbose:
-            debug_log(f"Adding program {pname} to EnergyToolkit")
+    exporter = attach_instrumentation(toolkit, metrics_port, event_log)
 
-        prog = Program(pname, prog_obj["args"], prog_obj["input"])
-        toolkit.add_program(prog)
+    # Datapoints are written as they are recorded, so the campaign can be watched
+    if stream:
+        ResultStreamer(toolkit, output)
 
     if verbose:
         debug_log("Starting measurements! Grab a coffee... ☕")
 
     # Start the measurements and write the measurement files
-    toolkit.measure()
-    toolkit.write_results()
-    toolkit.write_statistics()
+    isolation = contextlib.nullcontext()
+    if isolate or priority is not None:
+        isolation = CoreIsolation(
+            core, tasks=isolate, irqs=isolate, priority=priority.lower() if priority else None
+        )
+
+    with isolation:
+        run_measurement(toolkit, exporter)
+
+    if store is not None:
+        campaign = toolkit.write_store(store, label)
+        if verbose:
+            debug_log(f"Stored results as campaign {campaign} in {store}")
 
     if verbose:
         debug_log("Measurements finished.")
@@ -135,7 +350,7 @@ def validate(programs):
 )
 @click.option(
     "--mode",
-    type=click.Choice(["bar", "line"], case_sensitive=False),
+    type=click.Choice(["bar", "line", "histogram", "ecdf", "violin"], case_sensitive=False),
     default="bar",
     show_default=True,
     help="Choose the chart style.",
@@ -162,8 +377,641 @@ def plot(results, mode, headless):
         error_log(f"Reason: {e}")
 
 
+@cli.command(
+    help=(
+        "Watch a running campaign.\n\n"
+        "Serves a local page that follows the results streamed by measure --stream under "
+        "RESULTS and shows the traces, running means and confidence intervals of all programs"
+    )
+)
+@click.argument("results", type=click.Path(file_okay=False))
+@click.option("--port", type=int, default=8050, show_default=True, help="Port of the page.")
+@click.option(
+    "--host", default="127.0.0.1", show_default=True, help="Address the page is served on."
+)
+@click.option(
+    "--alpha",
+    type=click.FloatRange(0.0, 1.0, min_open=True, max_open=True),
+    default=0.05,
+    show_default=True,
+    help="Significance level of the confidence intervals.",
+)
+@click.option(
+    "--refresh",
+    type=click.FloatRange(0.1),
+    default=1.0,
+    show_default=True,
+    help="Seconds between two updates of the page.",
+)
+def watch(results, port, host, alpha, refresh):
+    """Serve the live dashboard of the given result tree until interrupted"""
+    dashboard = Dashboard(results, alpha, refresh)
+    try:
+        dashboard.start(port, host)
+    except OSError as e:
+        raise click.ClickException(f"Dashboard could not be served on {host}:{port}: {e}")
+
+    debug_log(f"Watching {os.path.abspath(results)} on http://{host}:{dashboard.get_port()}/")
+    debug_log("Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        dashboard.stop()
+
+
+@cli.command(
+    help=(
+        "Export figures of generated energy-toolkit results.\n\n"
+        "Renders the selected chart modes of the results under RESULTS in a single kaleido "
+        "session and writes them in the selected formats."
+    )
+)
+@click.argument("results", type=click.Path(exists=True, file_okay=False))
+@click.option(
+    "--mode",
+    "modes",
+    type=click.Choice(["bar", "line", "histogram", "ecdf", "violin"], case_sensitive=False),
+    multiple=True,
+    default=["bar"],
+    show_default=True,
+    help="Chart style to export, can be given multiple times.",
+)
+@click.option(
+    "--format",
+    "formats",
+    type=click.Choice(["pdf", "svg", "png"], case_sensitive=False),
+    multiple=True,
+    default=["pdf"],
+    show_default=True,
+    help="File format to export, can be given multiple times.",
+)
+@click.option(
+    "--per-program", is_flag=True, help="Additionally export one figure for every program."
+)
+@click.option(
+    "--parallel",
+    "-j",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Figures rendered in parallel by the kaleido session.",
+)
+@click.option(
+    "--output", "-o", default=None, help="Output directory, defaults to RESULTS/figures."
+)
+def export(results, modes, formats, per_program, parallel, output): # pylint: disable=too-many-arguments,too-many-positional-arguments
+    """Export figures of the data under the given path"""
+    plotmodes = [PlotMode.str_to_plotmode(mode.lower()) for mode in modes]
+    output = output or os.path.join(results, "figures")
+
+    plotter = Plotter(results, plotmodes[0])
+    files = plotter.export(
+        output, plotmodes, [fmt.lower() for fmt in formats], per_program, parallel
+    )
+
+    debug_log(f"Exported {len(files)} figures to {os.path.abspath(output)}")
+
+
+@cli.command(
+    help=(
+        "Query a SQLite result store.\n\n"
+        "Lists the stored runs matching the filters, newest first, and optionally plots them."
+    )
+)
+@click.argument("store", type=click.Path(exists=True, dir_okay=False))
+@click.option("--program", "-p", default=None, help="Executable path or name of the program.")
+@click.option("--host", default=None, help="Hostname the runs were measured on.")
+@click.option("--label", default=None, help="Label of the campaigns.")
+@click.option(
+    "--last", "-n", type=click.IntRange(min=1), default=None, help="Only the newest N runs."
+)
+@click.option(
+    "--plot",
+    "mode",
+    type=click.Choice(["bar", "line", "histogram", "ecdf", "violin"], case_sensitive=False),
+    default=None,
+    help="Plot the matching runs with the given chart style.",
+)
+def query(store, program, host, label, last, mode): # pylint: disable=too-many-arguments,too-many-positional-arguments
+    """Query stored runs and print or plot them"""
+    result_store = ResultStore(store)
+    try:
+        runs = result_store.query(program, host, last, label)
+    finally:
+        result_store.close()
+
+    for run in runs:
+        click.echo(
+            f"{run.get_label():<50.50} {run.hostname:<20.20} {run.label:<12.12} "
+            f"energy {np.mean(run.columns['energy']):.5e} J "
+            f"time {np.mean(run.columns['time']):.5e} s"
+        )
+
+    debug_log(f"{len(runs)} runs matched.")
+
+    if mode is not None:
+        plotter = Plotter.from_runs(runs, PlotMode.str_to_plotmode(mode))
+        plotter.plot(os.path.dirname(os.path.abspath(store)))
+
+
+@cli.command(
+    help=(
+        "Compare two result trees and detect regressions.\n\n"
+        "Pairs the programs of BASE and NEW and tests every pair with a Mann-Whitney U test and a "
+        "bootstrap of the difference of medians. The false-discovery rate is controlled over all "
+        "programs. Exits with status 1 if a significant regression was found."
+    )
+)
+@click.argument("base", type=click.Path(exists=True, file_okay=False))
+@click.argument("new", type=click.Path(exists=True, file_okay=False))
+@click.option(
+    "--metric",
+    default="energy",
+    show_default=True,
+    help="Result column that is compared, e.g. energy or time.",
+)
+@click.option(
+    "--alpha",
+    type=click.FloatRange(0, 1, min_open=True, max_open=True),
+    default=0.05,
+    show_default=True,
+    help="False-discovery rate and confidence level of the bootstrap interval.",
+)
+@click.option(
+    "--threshold",
+    type=click.FloatRange(min=0),
+    default=0.0,
+    show_default=True,
+    help="Minimal relative increase of the median that counts as regression (0.05 = 5%).",
+)
+@click.option(
+    "--resamples",
+    type=click.IntRange(min=100),
+    default=2000,
+    show_default=True,
+    help="Bootstrap resamples.",
+)
+@click.option("--seed", type=int, default=None, help="Seed of the bootstrap.")
+def compare(base, new, metric, alpha, threshold, resamples, seed): # pylint: disable=too-many-arguments,too-many-positional-arguments
+    """Compare two result trees and exit with a nonzero status on regressions"""
+    comparator = Comparator(metric.lower(), alpha, threshold, resamples, seed)
+
+    try:
+        comparisons = comparator.compare_paths(base, new)
+    except KeyError as e:
+        raise click.ClickException(f"Metric {e} is not part of the results.") from e
+
+    if not comparisons:
+        raise click.ClickException("No programs of BASE could be paired with NEW.")
+
+    regressions = 0
+    for comparison in comparisons:
+        if comparison.regression:
+            regressions += 1
+            status = click.style("REGRESSION", fg="red")
+        elif comparison.significant and comparison.difference < 0:
+            status = click.style("improved", fg="green")
+        elif comparison.significant:
+            status = "changed"
+        else:
+            status = "unchanged"
+
+        click.echo(
+            f"{comparison.label:<40.40} {comparison.base_median:.5e} -> "
+            f"{comparison.new_median:.5e} ({comparison.get_relative_change():+.2%}) "
+            f"CI [{comparison.ci_low:+.3e}, {comparison.ci_high:+.3e}] "
+            f"q={comparison.q_value:.3g} {status}"
+        )
+
+    debug_log(f"{regressions} of {len(comparisons)} programs regressed.")
+    if regressions > 0:
+        raise click.exceptions.Exit(1)
+
+
+def parse_sizes(ctx, param, value): # pylint: disable=unused-argument
+    """Parse a comma separated size series into a sorted list of distinct sizes"""
+    try:
+        sizes = sorted({int(size) for size in value.split(",") if size.strip()})
+    except ValueError as e:
+        raise click.BadParameter("Sizes have to be comma separated integers.") from e
+
+    if len(sizes) < 3 or sizes[0] < 1:
+        raise click.BadParameter("At least three different positive sizes are needed.")
+
+    return sizes
+
+
+@cli.command(
+    context_settings={"ignore_unknown_options": True},
+    help=(
+        "Measure how energy and time scale with the input size.\n\n"
+        "Runs EXECUTEABLE once per size of the series, replacing {n} in ARGS and the input file "
+        "with the size. Fits n, n log n, n^2 and power law models to energy and time, reports "
+        "the best fit with bootstrap intervals and predicts the values at the --predict size."
+    )
+)
+@click.argument("executeable", type=click.Path(exists=True, dir_okay=False))
+@click.argument("args", nargs=-1, type=click.UNPROCESSED)
+@click.option(
+    "--sizes",
+    required=True,
+    callback=parse_sizes,
+    help="Comma separated input sizes, e.g. 1000,2000,4000,8000.",
+)
+@click.option("--input", "inputfile", default="", help="Input file, {n} is replaced by the size.")
+@click.option(
+    "--predict",
+    type=click.IntRange(min=1),
+    required=True,
+    help="Production input size the energy and time are predicted for.",
+)
+@click.option(
+    "--core",
+    "-c",
+    type=CoreSetType(),
+    default="0",
+    show_default=True,
+    help="Core or set of cores the measurement should be performed on, e.g. 2 or 0-7,16.",
+)
+@click.option(
+    "--repetitions",
+    "-r",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="Repetitions used to average the measurements.",
+)
+@click.option(
+    "--datapoints",
+    "-d",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="Datapoints that should be collected per size.",
+)
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(file_okay=False),
+    default="./results",
+    show_default=True,
+    help="Directory for the results, scaling.csv and the figure.",
+)
+@click.option(
+    "--resamples",
+    type=click.IntRange(min=100),
+    default=1000,
+    show_default=True,
+    help="Bootstrap resamples.",
+)
+@click.option("--seed", type=int, default=None, help="Seed of the bootstrap.")
+@click.option("--native", is_flag=True, help="Measure in the native C measurement kernel.")
+@click.option(
+    "--headless",
+    "-h",
+    is_flag=True,
+    help="Save the figure as pdf instead of html.",
+)
+def scale(executeable, args, sizes, inputfile, predict, core, repetitions, datapoints, output, # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+          resamples, seed, native, headless):
+    """Scaling command. Measures a program across input sizes and fits complexity models"""
+    if not is_admin():
+        raise click.ClickException(
+            "scale has to be run with elevated rights (e.g sudo) otherwise we cannot record "
+            "measurements!"
+        )
+
+    programs = ScalingAnalysis.create_programs(executeable, list(args), inputfile, sizes)
+    toolkit = EnergyToolkit(datapoints, repetitions, core, programs, output, native=native)
+
+    debug_log(f"Measuring {len(sizes)} sizes from {sizes[0]} to {sizes[-1]}...")
+    run_measurement(toolkit, None)
+
+    results = toolkit.get_results()
+    measured = [i for i in range(len(sizes)) if i in results and len(results[i]) > 0]
+    if len(measured) < 3:
+        raise click.ClickException(
+            f"Only {len(measured)} of {len(sizes)} sizes were measured, at least three are "
+            "needed to fit a model."
+        )
+    all_sizes = np.concatenate([np.full(len(results[i]), sizes[i]) for i in measured])
+    values = {
+        metric: np.concatenate([results[i][metric] for i in measured])
+        for metric in ("energy", "time")
+    }
+
+    analysis = ScalingAnalysis(resamples, seed=seed)
+    try:
+        fits = {
+            metric: analysis.fit(all_sizes, metric_values, predict)
+            for metric, metric_values in values.items()
+        }
+    except ValueError as e:
+        raise click.ClickException(str(e)) from e
+
+    units = {"energy": "J", "time": "s"}
+    for metric, metric_fits in fits.items():
+        best = metric_fits[0]
+        click.echo(f"{metric.capitalize()}: best fit {best.model}: {best}")
+        for fit in metric_fits:
+            click.echo(f"  {fit.model:<10} R² {fit.r_squared:.4f}")
+        click.echo(
+            f"  predicted at n={predict}: {best.prediction:.5e} {units[metric]} "
+            f"[{best.ci_low:.5e}, {best.ci_high:.5e}], "
+            f"{best.get_per_element():.5e} {units[metric]} per element"
+        )
+
+    ScalingAnalysis.write(output, fits)
+
+    fig = Plotter.create_scaling_figure(all_sizes, values, fits)
+    if headless:
+        fig.write_image(
+            os.path.join(output, "scaling.pdf"), width=Plotter.WIDTH, height=Plotter.HEIGHT
+        )
+    else:
+        fig.write_html(os.path.join(output, "scaling.html"))
+    debug_log(f"Scaling analysis written to {os.path.abspath(output)}")
+
+
+def parse_caps(ctx, param, value): # pylint: disable=unused-argument
+    """Parse a comma separated series of power caps in Watt"""
+    try:
+        caps = [float(cap) for cap in value.split(",") if cap.strip()]
+    except ValueError as e:
+        raise click.BadParameter("Caps have to be comma separated numbers of Watt.") from e
+
+    if not caps or min(caps) <= 0:
+        raise click.BadParameter("At least one positive cap is needed.")
+
+    return caps
+
+
+@cli.command(
+    help=(
+        "Find the energy-optimal package power cap.\n\n"
+        "Measures the programs defined in PROGRAMS once under each power cap by writing the "
+        "RAPL package power limit (Intel MSR 0x610). Reports energy, time and energy-delay "
+        "product per cap and marks the optimal caps. The original limit is always restored."
+    )
+)
+@click.argument("programs", type=click.Path(exists=True))
+@click.option(
+    "--caps",
+    required=True,
+    callback=parse_caps,
+    help="Comma separated package power caps in Watt, e.g. 15,25,35,45.",
+)
+@click.option(
+    "--core",
+    "-c",
+    type=CoreSetType(),
+    default="0",
+    show_default=True,
+    help="Core or set of cores the measurement should be performed on, e.g. 2 or 0-7,16.",
+)
+@click.option(
+    "--repetitions",
+    "-r",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="Repetitions used to average the measurements.",
+)
+@click.option(
+    "--datapoints",
+    "-d",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="Datapoints that should be collected per cap.",
+)
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(file_okay=False),
+    default="./results",
+    show_default=True,
+    help="Directory for the results of each cap and sweep.csv.",
+)
+@click.option(
+    "--warmup",
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+    help="Unrecorded warm-up executions of each program per cap.",
+)
+@click.option(
+    "--timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help="Seconds after which an execution is killed, unless set in the PROGRAMS file.",
+)
+def sweep(programs, caps, core, repetitions, datapoints, output, warmup, timeout): # pylint: disable=too-many-arguments,too-many-positional-arguments
+    """Power cap sweep command. Measures the programs under each of the given power caps"""
+    if not is_admin():
+        raise click.ClickException(
+            "sweep has to be run with elevated rights (e.g sudo) otherwise we cannot set power "
+            "limits!"
+        )
+    if ToolkitUtil.get_cpu_vendor() != CPU_TYPE.INTEL:
+        raise click.ClickException("Power limits can only be set on Intel CPUs.")
+
+    config = ConfigParser.parse(programs)
+    ConfigParser.validate(config)
+
+    def create_toolkit(cap):
+        return EnergyToolkit(
+            datapoints,
+            repetitions,
+            core,
+            create_programs(config, warmup, 0.0, "warm"),
+            os.path.join(output, f"cap_{cap:g}W"),
+            timeout=timeout,
+        )
+
+    try:
+        results = PowerCapSweep(caps, core).run(create_toolkit)
+    except (OSError, ValueError) as e:
+        raise click.ClickException(f"Power limit could not be set: {e}") from e
+
+    click.echo(PowerCapSweep.format(results))
+    PowerCapSweep.write(output, results)
+    debug_log(f"Sweep written to {os.path.abspath(output)}")
+
+
+@cli.command(
+    context_settings={"ignore_unknown_options": True},
+    help=(
+        "Profile the energy of a Python script per function.\n\n"
+        "Runs SCRIPT with ARGS in the toolkit's interpreter on the given cores while sampling its "
+        "stack and the energy counters. The energy of each interval is attributed to the sampled "
+        "stack. Writes collapsed stacks, a speedscope profile and a flame graph."
+    )
+)
+@click.argument("script", type=click.Path(exists=True, dir_okay=False))
+@click.argument("args", nargs=-1, type=click.UNPROCESSED)
+@click.option(
+    "--core",
+    "-c",
+    type=CoreSetType(),
+    default="0",
+    show_default=True,
+    help="Core or set of cores the script is run on, e.g. 2 or 0-7,16.",
+)
+@click.option(
+    "--interval",
+    type=click.FloatRange(min=0.001),
+    default=0.005,
+    show_default=True,
+    help="Seconds between two samples.",
+)
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(file_okay=False),
+    default="./results",
+    show_default=True,
+    help="Directory for the profile and the flame graph.",
+)
+@click.option(
+    "--top",
+    type=click.IntRange(min=0),
+    default=10,
+    show_default=True,
+    help="Number of functions with the highest self energy that are printed.",
+)
+@click.option(
+    "--headless",
+    "-h",
+    is_flag=True,
+    help="Save the flame graph as pdf instead of html.",
+)
+def profile(script, args, core, interval, output, top, headless): # pylint: disable=too-many-arguments,too-many-positional-arguments
+    """Profile command. Attributes the energy of a Python script to its functions"""
+    if not is_admin():
+        raise click.ClickException(
+            "profile has to be run with elevated rights (e.g sudo) otherwise we cannot read the "
+            "energy counters!"
+        )
+
+    cores = {core} if isinstance(core, int) else set(core)
+    # Created before pinning, so that the sampler thread keeps to the remaining cores
+    profiler = EnergyProfiler(cores, interval)
+    affinity = os.sched_getaffinity(0)
+    os.sched_setaffinity(0, cores)
+    try:
+        energy_profile, exitcode = profiler.run_script(script, list(args))
+    finally:
+        os.sched_setaffinity(0, affinity)
+
+    if exitcode:
+        debug_log(f"{script} exited with code {exitcode}")
+
+    functions = sorted(
+        energy_profile.get_functions().items(), key=lambda item: item[1][0], reverse=True
+    )
+    click.echo(
+        f"{energy_profile.total_energy:.5e} J in {energy_profile.duration:.3f} s, "
+        f"{sum(energy_profile.samples.values())} samples, "
+        f"{100 * energy_profile.overhead:.2f} % sampling overhead"
+    )
+    click.echo(f"  {'Self (J)':>12} {'Total (J)':>12}  Function")
+    for frame, (own, inclusive) in functions[:top]:
+        click.echo(f"  {own:>12.5e} {inclusive:>12.5e}  {EnergyProfile.frame_name(frame)}")
+
+    energy_profile.write(output)
+    fig = Plotter.create_flame_graph(energy_profile)
+    if headless:
+        fig.write_image(
+            os.path.join(output, "profile.pdf"), width=Plotter.WIDTH, height=Plotter.HEIGHT
+        )
+    else:
+        fig.write_html(os.path.join(output, "profile.html"))
+    debug_log(f"Profile written to {os.path.abspath(output)}")
+
+
+def create_programs(config, warmup, warmup_time, cache_mode, verbose=False):
+    """Create the programs of a parsed program configuration with the given default settings"""
+    programs = []
+    for prog_obj in config["programs"]:
+        pname = prog_obj["executeable"]
+
+        if verbose:
+            debug_log(f"Adding program {pname} to EnergyToolkit")
+
+        programs.append(
+            Program(
+                pname,
+                prog_obj["args"],
+                prog_obj["input"],
+                warmup=prog_obj.get("warmup", warmup),
+                warmup_time=prog_obj.get("warmup_time", warmup_time),
+                cache_mode=CacheMode.str_to_cachemode(
+                    prog_obj.get("cache_mode", cache_mode.lower())
+                ),
+                timeout=prog_obj.get("timeout"),
+            )
+        )
+
+    return programs
+
+
+def run_measurement(toolkit, exporter):
+    """
+    Measure all programs of the toolkit and write the results and statistics. Results of the
+    programs completed before an abort are written as well
+    """
+    try:
+        toolkit.measure()
+    except MeasurementAborted:
+        toolkit.write_results()
+        toolkit.write_statistics()
+        raise
+    finally:
+        if exporter is not None:
+            exporter.stop()
+
+    toolkit.write_results()
+    toolkit.write_statistics()
+
+
+def create_cache(path, ttl_hours, size_mib):
+    """Create the measurement cache at the given path. Returns None if no path is given"""
+    if path is None:
+        return None
+
+    return MeasurementCache(
+        path,
+        ttl=ttl_hours * 3600 if ttl_hours is not None else None,
+        max_size=int(size_mib * 1024 * 1024) if size_mib is not None else None,
+    )
+
+
+def attach_instrumentation(toolkit, metrics_port, event_log):
+    """
+    Register the optional event log and metrics exporter on the given toolkit.
+    Returns the started exporter or None
+    """
+    if event_log is not None:
+        Logger().enable_event_log(event_log)
+        for hook in EnergyToolkit.HOOKS:
+            toolkit.register_hook(hook, lambda event, name=hook: Logger().log_event(name, event))
+
+    exporter = None
+    if metrics_port is not None:
+        exporter = MetricsExporter(toolkit)
+        exporter.start(metrics_port)
+
+    return exporter
+
+
 def debug_log(message):
     """Debug helper function to print debug messages with time code and styling"""
+    # Render queued toolkit logs first to keep the output in order
+    Logger().flush()
     current_time = datetime.now().strftime("%H:%M:%S")
     colored_time = click.style(f"[{current_time}]", fg="green")
     click.echo(f"{colored_time} {message}")
@@ -171,6 +1019,7 @@ def debug_log(message):
 
 def error_log(message):
     """Debug helper function to print error messages with time code and styling"""
+    Logger().flush()
     current_time = datetime.now().strftime("%H:%M:%S")
     colored_time = click.style(f"[{current_time}]", fg="red")
     click.echo(f"{colored_time} {message}")
@@ -0,0 +1,251 @@
+"""
+Comparison module.
+Offers statistical tests to detect energy regressions between two result trees.
+"""
+
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from energy_toolkit.result_reader import ProgramResult, ResultReader
+
+
+class Comparison:
+    """Data class holding the comparison of one program between a base and a new result set"""
+
+    label: str = ""
+    base_pid: int = 0
+    new_pid: int = 0
+    base_median: float = 0.0
+    new_median: float = 0.0
+    difference: float = 0.0
+    ci_low: float = 0.0
+    ci_high: float = 0.0
+    p_value: float = 1.0
+    q_value: float = 1.0
+    significant: bool = False
+    regression: bool = False
+
+    def __init__(self, label, base_pid, new_pid):
+        self.label = label
+        self.base_pid = base_pid
+        self.new_pid = new_pid
+
+    def get_relative_change(self) -> float:
+        """Return the change of the median relative to the base median"""
+        if self.base_median == 0:
+            return float("nan")
+        return self.difference / self.base_median
+
+
+class Comparator:
+    """
+    Compares two result sets program by program. For all programs at once it runs a
+    Mann-Whitney U test and a bootstrap of the difference of medians, and controls the false
+    discovery rate with the Benjamini-Hochberg procedure. A program regressed if its difference
+    is significant and the median grew by more than the given relative threshold.
+    """
+
+    def __init__(self, metric="energy", alpha=0.05, threshold=0.0, resamples=2000, seed=None): # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self._metric = metric
+        self._alpha = alpha
+        self._threshold = threshold
+        self._resamples = resamples
+        self._rng = np.random.default_rng(seed)
+
+    def compare_paths(self, base_path: str, new_path: str) -> List[Comparison]:
+        """Read and compare the result trees under the given paths"""
+        return self.compare(ResultReader.read_tree(base_path), ResultReader.read_tree(new_path))
+
+    def compare(self, base: List[ProgramResult], new: List[ProgramResult]) -> List[Comparison]:
+        """Pair the programs of both result sets and compare the selected metric"""
+        pairs = self.pair_programs(base, new)
+        comparisons = [Comparison(b.get_label(), b.pid, n.pid) for b, n in pairs]
+        if not pairs:
+            return comparisons
+
+        samples = [
+            (b.columns[self._metric], n.columns[self._metric]) for b, n in pairs
+        ]
+
+        # Programs with equal sample sizes are tested together in one vectorized pass
+        groups: Dict[Tuple[int, int], List[int]] = {}
+        for i, (a, b) in enumerate(samples):
+            groups.setdefault((len(a), len(b)), []).append(i)
+
+        p_values = np.ones(len(pairs))
+        for (n1, n2), indices in groups.items():
+            if n1 == 0 or n2 == 0:
+                continue
+
+            a = np.vstack([samples[i][0] for i in indices])
+            b = np.vstack([samples[i][1] for i in indices])
+
+            _, p_values[indices] = self.mann_whitney(a, b)
+            diff, low, high = self.bootstrap_median_difference(a, b)
+
+            base_median = np.median(a, axis=1)
+            for j, i in enumerate(indices):
+                comparisons[i].base_median = float(base_median[j])
+                comparisons[i].new_median = float(base_median[j] + diff[j])
+                comparisons[i].difference = float(diff[j])
+                comparisons[i].ci_low = float(low[j])
+                comparisons[i].ci_high = float(high[j])
+
+        q_values = self.benjamini_hochberg(p_values)
+        for i, comparison in enumerate(comparisons):
+            comparison.p_value = float(p_values[i])
+            comparison.q_value = float(q_values[i])
+            comparison.significant = comparison.q_value < self._alpha
+            comparison.regression = (
+                comparison.significant
+                and comparison.difference > 0
+                and comparison.get_relative_change() > self._threshold
+            )
+
+        return comparisons
+
+    @staticmethod
+    def pair_programs(
+        base: List[ProgramResult], new: List[ProgramResult]
+    ) -> List[Tuple[ProgramResult, ProgramResult]]:
+        """
+        Pair programs of both sets by executable name, arguments and input if both sets carry
+        program descriptions. Otherwise programs are paired by their pid
+        """
+        if not all(r.program for r in base + new):
+            new_by_pid = {r.pid: r for r in new}
+            return [(r, new_by_pid[r.pid]) for r in base if r.pid in new_by_pid]
+
+        def keys(results):
+            seen: Dict[tuple, int] = {}
+            keyed = {}
+            for r in results:
+                key = (
+                    os.path.basename(r.program.get("executeable", "")),
+                    tuple(str(arg) for arg in r.program.get("args") or []),
+                    r.program.get("input") or "",
+                )
+                # Identical programs are told apart by their order
+                seen[key] = seen.get(key, 0) + 1
+                keyed[key + (seen[key],)] = r
+            return keyed
+
+        new_keyed = keys(new)
+        return [(r, new_keyed[k]) for k, r in keys(base).items() if k in new_keyed]
+
+    @staticmethod
+    def mann_whitney(a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Two sided Mann-Whitney U test for each row of a (programs, n1) against b (programs, n2).
+        Uses the normal approximation with tie and continuity correction. Returns the U
+        statistic of b and the p-values
+        """
+        n1 = a.shape[1]
+        n2 = b.shape[1]
+        n = n1 + n2
+
+        combined = np.concatenate((a, b), axis=1)
+        order = np.argsort(combined, axis=1, kind="mergesort")
+        ordered = np.take_along_axis(combined, order, axis=1)
+
+        # Find the first and last position of each run of tied values
+        positions = np.broadcast_to(np.arange(n), ordered.shape)
+        starts = np.ones(ordered.shape, dtype=bool)
+        starts[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+        ends = np.ones(ordered.shape, dtype=bool)
+        ends[:, :-1] = starts[:, 1:]
+
+        first = np.maximum.accumulate(np.where(starts, positions, 0), axis=1)
+        last = np.minimum.accumulate(
+            np.where(ends, positions, n - 1)[:, ::-1], axis=1
+        )[:, ::-1]
+
+        # Tied values share the average of their ranks
+        ranks = np.empty(ordered.shape)
+        np.put_along_axis(ranks, order, (first + last) / 2.0 + 1.0, axis=1)
+
+        u_stat = ranks[:, n1:].sum(axis=1) - n2 * (n2 + 1) / 2.0
+
+        tie_sizes = last - first + 1
+        tie_term = (tie_sizes ** 2 - 1).sum(axis=1)
+
+        mean = n1 * n2 / 2.0
+        sigma = np.sqrt(n1 * n2 / 12.0 * ((n + 1) - tie_term / (n * (n - 1))))
+
+        deviation = np.abs(u_stat - mean) - 0.5
+        z = np.divide(
+            np.maximum(deviation, 0.0), sigma, out=np.zeros_like(sigma), where=sigma > 0
+        )
+        p_values = Comparator.normal_two_sided(z)
+
+        return u_stat, p_values
+
+    @staticmethod
+    def normal_two_sided(z: np.ndarray) -> np.ndarray:
+        """
+        Two sided tail probability erfc(z / sqrt(2)) of the standard normal distribution for an
+        array of non-negative z. Uses the Chebyshev approximation of erfc from Numerical Recipes,
+        its relative error is below 1.2e-7
+        """
+        x = np.asarray(z, dtype=float) / np.sqrt(2.0)
+        t = 1.0 / (1.0 + 0.5 * x)
+
+        coefficients = (-1.26551223, 1.00002368, 0.37409196, 0.09678418, -0.18628806,
+                        0.27886807, -1.13520398, 1.48851587, -0.82215223, 0.17087277)
+        polynomial = np.zeros_like(t)
+        for coefficient in reversed(coefficients):
+            polynomial = coefficient + t * polynomial
+
+        return t * np.exp(-x * x + polynomial)
+
+    def bootstrap_median_difference(
+        self, a: np.ndarray, b: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Bootstrap the difference of medians (b - a) for each row. Returns the observed difference
+        and the lower and upper bound of the (1 - alpha) percentile interval
+        """
+        observed = np.median(b, axis=1) - np.median(a, axis=1)
+
+        medians_a = self._resampled_medians(np.sort(a, axis=1), self._resamples)
+        medians_b = self._resampled_medians(np.sort(b, axis=1), self._resamples)
+
+        low, high = np.percentile(
+            medians_b - medians_a,
+            [100 * self._alpha / 2, 100 * (1 - self._alpha / 2)],
+            axis=1,
+        )
+
+        return observed, low, high
+
+    def _resampled_medians(self, ordered: np.ndarray, resamples: int) -> np.ndarray:
+        """
+        Medians of bootstrap resamples of each sorted row, shape (rows, resamples). All rows share
+        the drawn indices. Drawn indices are sorted, so the resampled values are sorted as well and
+        the median is read directly at the middle positions without sorting any resample
+        """
+        n = ordered.shape[1]
+        indices = np.sort(self._rng.integers(0, n, size=(resamples, n)), axis=1)
+
+        lower = ordered[:, indices[:, (n - 1) // 2]]
+        upper = ordered[:, indices[:, n // 2]]
+        return (lower + upper) / 2.0
+
+    @staticmethod
+    def benjamini_hochberg(p_values: np.ndarray) -> np.ndarray:
+        """Return the Benjamini-Hochberg adjusted p-values (q-values)"""
+        m = len(p_values)
+        if m == 0:
+            return p_values
+
+        order = np.argsort(p_values)
+        scaled = p_values[order] * m / np.arange(1, m + 1)
+
+        # Enforce monotonicity from the largest p-value downwards
+        adjusted = np.minimum.accumulate(scaled[::-1])[::-1]
+
+        q_values = np.empty(m)
+        q_values[order] = np.minimum(adjusted, 1.0)
+        return q_values
@@ -63,3 +63,34 @@ class ConfigParser:
                 raise click.ClickException(f"'args' in entry {idx} must be a list.")
             if "input" in program and not isinstance(program["input"], str):
                 raise click.ClickException(f"'input' in entry {idx} must be a string.")
+
+            ConfigParser.validate_settings(idx, program)
+
+    @staticmethod
+    def validate_settings(idx: int, program: dict) -> None:
+        """Validate the optional measurement settings of a single program entry"""
+
+        # Optional: check the warm-up and cache settings
+        if "warmup" in program and (
+            not isinstance(program["warmup"], int) or program["warmup"] < 0
+        ):
+            raise click.ClickException(
+                f"'warmup' in entry {idx} must be a non-negative integer."
+            )
+        if "warmup_time" in program and (
+            not isinstance(program["warmup_time"], (int, float))
+            or program["warmup_time"] < 0
+        ):
+            raise click.ClickException(
+                f"'warmup_time' in entry {idx} must be a non-negative number."
+            )
+        if "cache_mode" in program and program["cache_mode"] not in ("warm", "drop", "evict"):
+            raise click.ClickException(
+                f"'cache_mode' in entry {idx} must be one of warm, drop or evict."
+            )
+        if "timeout" in program and (
+            not isinstance(program["timeout"], (int, float)) or program["timeout"] <= 0
+        ):
+            raise click.ClickException(
+                f"'timeout' in entry {idx} must be a positive number of seconds."
+            )
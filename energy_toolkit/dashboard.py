@@ -0,0 +1,536 @@
+"""
+Dashboard module.
+Offers a live view of a running campaign that tails the result tree while it is written.
+"""
+
+import json
+import math
+import os
+import statistics
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+import plotly.offline
+import yaml
+
+from energy_toolkit.energy_toolkit import EnergyToolkit
+from energy_toolkit.events import DatapointEvent, FailureEvent
+from energy_toolkit.logger import Logger
+from energy_toolkit.result_reader import ProgramResult
+
+
+class RunningStatistics:
+    """
+    Mean, variance and confidence interval of a stream of values, updated with Welford's
+    algorithm so each value is only seen once
+    """
+
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, value: float) -> None:
+        """Add a single value"""
+        if math.isnan(value):
+            return
+
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def get_variance(self) -> float:
+        """Return the sample variance, nan below two values"""
+        return self.m2 / (self.count - 1) if self.count > 1 else float("nan")
+
+    def get_interval(self, alpha=0.05) -> tuple:
+        """Return the normal approximation of the 1 - alpha confidence interval of the mean"""
+        if self.count < 2:
+            return float("nan"), float("nan")
+
+        z = statistics.NormalDist().inv_cdf(1 - alpha / 2)
+        half = z * math.sqrt(self.get_variance() / self.count)
+        return self.mean - half, self.mean + half
+
+
+class ResultStreamer:
+    """
+    Appends each datapoint to the results.partial.csv of its program as soon as it was
+    recorded, so the result tree can be watched while the campaign runs. The rows are formatted
+    like the final results.csv written by EnergyToolkit.write_results, which removes the partial
+    files afterwards. The partial files of skipped programs are removed right away
+    """
+
+    def __init__(self, toolkit: EnergyToolkit, path: str):
+        """Create a new streamer for the result tree at path and register its hooks"""
+        self._toolkit = toolkit
+        self._path = path
+        self._columns: Dict[int, List[str]] = {}
+
+        toolkit.register_hook("on_datapoint", self._on_datapoint)
+        toolkit.register_hook("on_failure", self._on_failure)
+
+    def _on_datapoint(self, event: DatapointEvent) -> None:
+        datapoint = event.datapoint
+        folder = os.path.join(self._path, str(event.program))
+
+        try:
+            if event.index == 0 or event.program not in self._columns:
+                # The first datapoint replaces the partial results of an earlier campaign
+                os.makedirs(folder, exist_ok=True)
+                self._columns[event.program] = ["time", "energy"] + list(datapoint.metrics)
+
+                with open(
+                    os.path.join(folder, EnergyToolkit.PARTIAL_PROGRAM), "w", encoding="utf-8"
+                ) as f:
+                    yaml.safe_dump(
+                        self._toolkit.get_programs()[event.program].to_dict(), f, sort_keys=False
+                    )
+                mode, header = "w", self._format_header(self._columns[event.program])
+            else:
+                mode, header = "a", ""
+
+            values = {"time": datapoint.time, "energy": datapoint.energy, **datapoint.metrics}
+            row = ",".join(
+                self._format_value(values.get(name, math.nan))
+                for name in self._columns[event.program]
+            )
+
+            # A single write per row, readers never see half a line unless the disk is full
+            with open(
+                os.path.join(folder, EnergyToolkit.PARTIAL_RESULTS), mode, encoding="utf-8"
+            ) as f:
+                f.write(f"{header}{row}\n")
+        except OSError as e:
+            Logger().get_logger().error("Datapoint could not be streamed: %s", e)
+
+    def _on_failure(self, event: FailureEvent) -> None:
+        # Only the last failure of a program that is given up marks it as skipped
+        if not self._toolkit.get_outcomes().get(event.program, {}).get("skipped"):
+            return
+
+        self._columns.pop(event.program, None)
+        folder = os.path.join(self._path, str(event.program))
+        for name in (EnergyToolkit.PARTIAL_RESULTS, EnergyToolkit.PARTIAL_PROGRAM):
+            try:
+                os.remove(os.path.join(folder, name))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                Logger().get_logger().error("Streamed results could not be removed: %s", e)
+
+    @staticmethod
+    def _format_header(columns: List[str]) -> str:
+        """Return the header line numpy writes for the given columns"""
+        return "# " + ",".join(name.capitalize() for name in columns) + "\n"
+
+    @staticmethod
+    def _format_value(value: float) -> str:
+        """Format a value like numpy.savetxt with fmt="%s" does"""
+        return str(float(value))
+
+
+class TailedProgram: # pylint: disable=too-many-instance-attributes
+    """
+    State of a single result file that is tailed. Keeps the rows read so far and the running
+    statistics of every column
+    """
+
+    pid: int = 0
+    path: str = ""
+    offset: int = 0
+    inode: int = 0
+    columns: List[str] = None
+    rows: List[tuple] = None
+    statistics: Dict[str, RunningStatistics] = None
+    label: str = ""
+
+    def __init__(self, pid, path, inode):
+        self.pid = pid
+        self.path = path
+        self.offset = 0
+        self.inode = inode
+        self.columns = []
+        self.rows = []
+        self.statistics = {}
+        self.label = f"PID {pid}"
+
+
+class ResultTail:
+    """
+    Follows a result tree of the form <path>/<pid>/results.csv. Results streamed to a
+    results.partial.csv while the program is measured are preferred. Each poll reads only the bytes
+    appended since the previous poll and feeds complete rows into the running statistics.
+    Files that were truncated or replaced are read again from their beginning
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._programs: Dict[int, TailedProgram] = {}
+        self._lock = threading.Lock()
+
+        # Each row gets a sequence number so clients can ask for rows they have not seen
+        self._sequence = 0
+        self._sequences: Dict[int, List[int]] = {}
+        # Changes whenever rows that were already handed out became invalid
+        self._generation = 0
+
+    def poll(self) -> None:
+        """Read the data appended to all result files since the last poll"""
+        with self._lock:
+            try:
+                entries = os.listdir(self._path)
+            except OSError:
+                return
+
+            for entry in entries:
+                if not entry.isdigit():
+                    continue
+
+                status = None
+                for name in (EnergyToolkit.PARTIAL_RESULTS, "results.csv"):
+                    path = os.path.join(self._path, entry, name)
+                    try:
+                        status = os.stat(path)
+                        break
+                    except OSError:
+                        continue
+                if status is None:
+                    continue
+
+                pid = int(entry)
+                program = self._programs.get(pid)
+                if program is None or program.path != path or program.inode != status.st_ino or (
+                    status.st_size < program.offset
+                ):
+                    if program is not None:
+                        self._generation += 1
+                    program = self._programs[pid] = TailedProgram(pid, path, status.st_ino)
+                    self._sequences[pid] = []
+                    self._read_label(program)
+
+                if status.st_size > program.offset:
+                    self._read_appended(program)
+
+    @staticmethod
+    def _read_label(program: TailedProgram) -> None:
+        """Label the program with the program.yaml belonging to its result file if it exists"""
+        folder = os.path.dirname(program.path)
+        name = "program.yaml"
+        if os.path.basename(program.path) == EnergyToolkit.PARTIAL_RESULTS:
+            name = EnergyToolkit.PARTIAL_PROGRAM
+
+        try:
+            with open(os.path.join(folder, name), "r", encoding="utf-8") as f:
+                description = yaml.safe_load(f) or {}
+        except (OSError, yaml.YAMLError):
+            return
+
+        program.label = ProgramResult(program.pid, {}, description).get_label()
+
+    def _read_appended(self, program: TailedProgram) -> None:
+        """Parse the complete lines appended after the offset of the program"""
+        try:
+            with open(program.path, "rb") as f:
+                f.seek(program.offset)
+                data = f.read()
+        except OSError:
+            return
+
+        # A trailing partial line is read again once it is complete
+        complete = data.rfind(b"\n") + 1
+        program.offset += complete
+
+        for line in data[:complete].decode("utf-8", "replace").splitlines():
+            if line.startswith("#"):
+                program.columns = [
+                    name.strip().lower() for name in line.lstrip("#").split(",")
+                ]
+                program.statistics = {name: RunningStatistics() for name in program.columns}
+                continue
+
+            try:
+                row = tuple(float(value) for value in line.split(","))
+            except ValueError:
+                continue
+            if len(row) != len(program.columns):
+                continue
+
+            program.rows.append(row)
+            for name, value in zip(program.columns, row):
+                program.statistics[name].update(value)
+
+            self._sequence += 1
+            self._sequences[program.pid].append(self._sequence)
+
+    def get_update(self, since=0, generation=None, alpha=0.05) -> dict:
+        """
+        Return the rows added after the sequence number since and the current statistics of
+        all programs. If generation is not the current one, all rows are returned
+        """
+        with self._lock:
+            if generation != self._generation:
+                since = 0
+
+            programs = {}
+            for pid, program in sorted(self._programs.items()):
+                sequences = self._sequences[pid]
+                # Sequence numbers are increasing, so the new rows are a suffix
+                start = len(sequences)
+                while start > 0 and sequences[start - 1] > since:
+                    start -= 1
+
+                columns = {
+                    name: [row[i] for row in program.rows[start:]]
+                    for i, name in enumerate(program.columns)
+                }
+                summary = {}
+                for name, running in program.statistics.items():
+                    low, high = running.get_interval(alpha)
+                    summary[name] = {
+                        "count": running.count,
+                        "mean": running.mean,
+                        "ci_low": low,
+                        "ci_high": high,
+                    }
+
+                programs[str(pid)] = {
+                    "label": program.label,
+                    "start": start,
+                    "columns": columns,
+                    "statistics": summary,
+                }
+
+            return {
+                "generation": self._generation,
+                "sequence": self._sequence,
+                "programs": programs,
+            }
+
+
+class Dashboard:
+    """
+    Serves a page on a local HTTP endpoint that shows the traces, running means and confidence
+    intervals of a result tree while it is written. The page asks for new rows once per
+    refresh interval, each request polls the tree
+    """
+
+    def __init__(self, path: str, alpha=0.05, refresh=1.0):
+        self._tail = ResultTail(path)
+        self._alpha = alpha
+        self._refresh = refresh
+        self._server = None
+
+    def render(self) -> str:
+        """Render the HTML page of the dashboard"""
+        return PAGE.replace("{refresh}", str(int(self._refresh * 1000))).replace(
+            "{confidence}", f"{100 * (1 - self._alpha):g}"
+        )
+
+    def update(self, since=0, generation=None) -> dict:
+        """Poll the result tree and return the rows added after since"""
+        self._tail.poll()
+        return self._tail.get_update(since, generation, self._alpha)
+
+    def encode(self, since=0, generation=None) -> bytes:
+        """Return the update as JSON, non finite values become null"""
+        return json.dumps(self._finite(self.update(since, generation))).encode("utf-8")
+
+    def start(self, port=8050, host="127.0.0.1") -> None:
+        """Serve the dashboard on http://host:port/ in a background thread"""
+        dashboard = self
+        plotly_js = plotly.offline.get_plotlyjs().encode("utf-8")
+
+        class _DashboardHandler(BaseHTTPRequestHandler):
+            def do_GET(self): # pylint: disable=invalid-name
+                """Answer requests of the page, plotly.js and the data endpoint"""
+                url = urlparse(self.path)
+
+                if url.path == "/":
+                    self._answer(dashboard.render().encode("utf-8"), "text/html; charset=utf-8")
+                elif url.path == "/plotly.js":
+                    self._answer(plotly_js, "application/javascript")
+                elif url.path == "/data":
+                    query = parse_qs(url.query)
+                    try:
+                        since = int(query.get("since", ["0"])[0])
+                        generation = int(query["generation"][0]) if "generation" in query else None
+                    except ValueError:
+                        self.send_error(400)
+                        return
+
+                    self._answer(dashboard.encode(since, generation), "application/json")
+                else:
+                    self.send_error(404)
+
+            def _answer(self, body: bytes, content_type: str) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args): # pylint: disable=redefined-builtin
+                # Refreshes should not clutter the terminal
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), _DashboardHandler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+        Logger().get_logger().info(
+            "Serving dashboard on http://%s:%d/", host, self._server.server_port
+        )
+
+    @staticmethod
+    def _finite(value):
+        """Replace nan and infinite values in nested dicts and lists with None"""
+        if isinstance(value, float):
+            return value if math.isfinite(value) else None
+        if isinstance(value, dict):
+            return {key: Dashboard._finite(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [Dashboard._finite(item) for item in value]
+        return value
+
+    def get_port(self) -> int:
+        """Return the port the dashboard is listening on"""
+        return self._server.server_port if self._server is not None else 0
+
+    def stop(self) -> None:
+        """Shut the dashboard down"""
+        server, self._server = self._server, None
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>energy-toolkit watch</title>
+<script src="/plotly.js"></script>
+<style>
+body { font-family: sans-serif; margin: 1em 2em; }
+table { border-collapse: collapse; margin-bottom: 1em; }
+td, th { padding: 0.2em 0.8em; text-align: right; border-bottom: 1px solid #ddd; }
+td:first-child, th:first-child { text-align: left; }
+#status { color: #777; }
+</style>
+</head>
+<body>
+<h2>energy-toolkit watch</h2>
+<p id="status">Waiting for results...</p>
+<table id="summary"></table>
+<div id="energy" style="height: 420px;"></div>
+<div id="time" style="height: 420px;"></div>
+<script>
+const refresh = {refresh};
+const metrics = ["energy", "time"];
+const units = {energy: "Energy (J)", time: "Time (s)"};
+let generation = null;
+let sequence = 0;
+let traces = {};
+
+function reset() {
+    traces = {};
+    for (const metric of metrics) {
+        Plotly.newPlot(metric, [], {
+            title: units[metric] + " per datapoint",
+            xaxis: {title: "Datapoint"},
+            yaxis: {title: units[metric]},
+        });
+    }
+}
+
+function format(value) {
+    return value === null ? "-" : value.toPrecision(5);
+}
+
+function summarize(programs) {
+    let rows = "<tr><th>Program</th><th>Datapoints</th>";
+    for (const metric of metrics) {
+        rows += "<th>Mean " + metric + "</th><th>{confidence}% CI</th><th>CI / mean</th>";
+    }
+    rows += "</tr>";
+
+    for (const [pid, program] of Object.entries(programs)) {
+        const energy = program.statistics.energy;
+        rows += "<tr><td>" + pid + ": " + program.label + "</td><td>"
+            + (energy ? energy.count : 0) + "</td>";
+        for (const metric of metrics) {
+            const stats = program.statistics[metric];
+            if (!stats) {
+                rows += "<td>-</td><td>-</td><td>-</td>";
+                continue;
+            }
+            const width = stats.ci_low === null ? null : (stats.ci_high - stats.ci_low) / 2;
+            rows += "<td>" + format(stats.mean) + "</td><td>"
+                + (width === null ? "-" : format(stats.ci_low) + " .. " + format(stats.ci_high))
+                + "</td><td>"
+                + (width === null || !stats.mean ? "-" : (100 * width / stats.mean).toFixed(2) + " %")
+                + "</td>";
+        }
+        rows += "</tr>";
+    }
+    document.getElementById("summary").innerHTML = rows;
+}
+
+async function update() {
+    const query = "since=" + sequence + (generation === null ? "" : "&generation=" + generation);
+    const response = await fetch("/data?" + query);
+    const data = await response.json();
+
+    if (data.generation !== generation) {
+        reset();
+        generation = data.generation;
+    }
+    sequence = data.sequence;
+
+    for (const [pid, program] of Object.entries(data.programs)) {
+        for (const metric of metrics) {
+            const values = program.columns[metric];
+            if (!values || values.length === 0) {
+                continue;
+            }
+            const x = values.map((_, i) => program.start + i);
+            const key = pid + ":" + metric;
+            if (!(key in traces)) {
+                traces[key] = document.getElementById(metric).data.length;
+                Plotly.addTraces(metric, {
+                    x: x, y: values, mode: "lines+markers", name: pid + ": " + program.label,
+                });
+            } else {
+                Plotly.extendTraces(metric, {x: [x], y: [values]}, [traces[key]]);
+            }
+        }
+    }
+
+    summarize(data.programs);
+    document.getElementById("status").textContent =
+        "Last update " + new Date().toLocaleTimeString();
+}
+
+async function loop() {
+    try {
+        await update();
+    } catch (error) {
+        document.getElementById("status").textContent = "Connection lost, retrying...";
+    }
+    setTimeout(loop, refresh);
+}
+
+reset();
+loop();
+</script>
+</body>
+</html>
+"""
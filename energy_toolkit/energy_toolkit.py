@@ -1,24 +1,75 @@
+# pylint: disable=too-many-lines
 """
 Main component of the library.
 Offer methods for measuring programs.
 """
 
+import shutil
 import time
-from typing import Dict, List
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
 import os
+import click
 import numpy as np
+import yaml
+from energy_toolkit.attribution import EnergyAttribution
+from energy_toolkit.interference import ActivitySnapshot, InterferenceMonitor
 from energy_toolkit.rapl_interface import RAPLInterface
-from energy_toolkit.program import Program
+from energy_toolkit.measurement_cache import MeasurementCache
+from energy_toolkit.perf_counters import PerfCounters
+from energy_toolkit.procfs import ProcFS
+from energy_toolkit.program import ExecutionResult, FunctionProgram, Program
+from energy_toolkit.result_store import ResultStore
+from energy_toolkit.roi import RegionMarkers
 from energy_toolkit.logger import Logger
-from energy_toolkit.util import Datapoint, ToolkitUtil
+from energy_toolkit.events import (
+    DatapointEvent,
+    FailureEvent,
+    MeasurementEvent,
+    ProgramDoneEvent,
+    RepetitionEvent,
+    RetryEvent,
+)
+from energy_toolkit.util import (
+    CPU_TYPE,
+    CacheMode,
+    Datapoint,
+    ExecutionStatus,
+    FailurePolicy,
+    InterferencePolicy,
+    ToolkitUtil,
+)
 
 
-class EnergyToolkit:
+class ProgramFailure(Exception):
+    """Raised while measuring a program that has to be given up because of failed executions"""
+
+    def __init__(self, event: FailureEvent):
+        super().__init__(
+            "timed out" if event.status == "timeout" else f"failed (exit code {event.returncode})"
+        )
+        self.event = event
+
+
+class MeasurementAborted(click.ClickException):
+    """
+    Raised if the failure policy aborts a campaign. The results of the programs completed before
+    are kept and can still be written
+    """
+
+
+class EnergyToolkit: # pylint: disable=too-many-instance-attributes
     """
     Main class of the energy-toolkit package. Provides multiple methods for measuring the energy 
     of any given program
     """
 
+    # Names of the hooks that can be registered with register_hook
+    HOOKS = ("on_repetition", "on_datapoint", "on_program_done", "on_retry", "on_failure")
+
+    # Files of results streamed while a program is measured, replaced by write_results
+    PARTIAL_RESULTS = "results.partial.csv"
+    PARTIAL_PROGRAM = "program.partial.yaml"
+
     _datapoints = 0
     _repetitions = 0
     _core = 0
@@ -38,10 +89,39 @@ class EnergyToolkit:
         core=0,
         programs=None,
         resultpath="./results",
-    ):
+        perf_counters=False,
+        cache=None,
+        force=False,
+        timeout=None,
+        failure_policy=FailurePolicy.RETRY,
+        retries=3,
+        attribution=False,
+        regions=False,
+        native=False,
+        interference=InterferencePolicy.OFF,
+        interference_threshold=0.05,
+    ): # pylint: disable=too-many-arguments,too-many-positional-arguments
         self._datapoints = datapoints
         self._repetitions = repetitions
-        self._core = core
+        # Programs are pinned to all cores of the set, the first core is the reference core
+        self._cores = sorted(Program.cpu_set(core))
+        self._core = self._cores[0]
+
+        # Record perf_event counters for each repetition, they are opened on each execution
+        self._perf_counters = perf_counters
+        self._perf_events = list(PerfCounters.EVENTS) if perf_counters else None
+
+        # Optional MeasurementCache serving unchanged programs, force only refreshes it
+        self._cache = cache
+        self._force = force
+
+        # Timeout of each execution for programs without their own timeout
+        self._timeout = timeout
+        # Handling of failed or timed out executions, RETRY measures a repetition retries times
+        self._failure_policy = failure_policy
+        self._retries = retries
+        # Outcome counts of the executions of each measured program
+        self._outcomes: Dict[int, Dict[str, int]] = {}
 
         # Create a new list if no programs are provided
         self._programs = programs if programs is not None else []
@@ -49,6 +129,51 @@ class EnergyToolkit:
         self._result_path = resultpath
         self._logger = Logger().get_logger()
         self._vendor = ToolkitUtil.get_cpu_vendor()
+        # Energy domains covering the cores, their energy is summed up per repetition
+        self._domains = RAPLInterface.domains(self._vendor, self._cores)
+
+        # Attribute the energy of the shared domain to the measured process tree
+        self._attribution = EnergyAttribution(self._vendor, self._cores) if attribution else None
+        # Answer region markers of the measured programs and record each region
+        self._markers = (
+            RegionMarkers(lambda: sum(self._read_energy())) if regions else None
+        )
+        self._unclosed_regions = set()
+
+        # Detect repetitions disturbed by foreign activity on the measurement cores
+        self._interference_policy = interference
+        self._interference = (
+            InterferenceMonitor(self._cores, interference_threshold)
+            if interference != InterferencePolicy.OFF
+            else None
+        )
+
+        # Measure whole datapoints in the native measurement kernel where possible
+        self._native = native
+        self._hooks: Dict[str, List[Callable[[MeasurementEvent], None]]] = {
+            name: [] for name in self.HOOKS
+        }
+
+    def register_hook(self, name: str, callback: Callable[[MeasurementEvent], None]) -> None:
+        """
+        Register a callback that is called with the respective event object while measuring.
+        Valid names are on_repetition, on_datapoint, on_program_done, on_retry and on_failure.
+        Callbacks are executed on the measuring thread between two executions and should return
+        quickly
+        """
+        if name not in self._hooks:
+            raise ValueError(f"Unknown hook '{name}'. Valid hooks are {', '.join(self.HOOKS)}")
+
+        self._hooks[name].append(callback)
+
+    def _emit(self, name: str, event: MeasurementEvent) -> None:
+        """Call all callbacks registered for the given hook"""
+        for callback in self._hooks[name]:
+            callback(event)
+
+    def get_total_repetitions(self) -> int:
+        """Return the number of valid repetitions a full measurement will record"""
+        return len(self._programs) * self._datapoints * self._repetitions
 
     def add_program(self, program: Program) -> None:
         """
@@ -70,72 +195,628 @@ class EnergyToolkit:
 
         # Dict to store relation program -> Datapoints
         program_energy_usage: Dict[str, List[Datapoint]] = {}
+        # Cache keys of the programs that were actually measured
+        cache_keys: Dict[int, str] = {}
+        self._outcomes = {}
+
+        for idx, program in enumerate(self._programs):
+            # Unchanged programs are served from the cache
+            cached = self._begin_program(idx, program, program_energy_usage, cache_keys)
+            if cached is not None:
+                if self._hooks["on_program_done"]:
+                    self._emit("on_program_done", ProgramDoneEvent(idx, cached))
+                continue
+
+            try:
+                prog_values = self._measure_program(idx, program)
+            except ProgramFailure as failure:
+                self._give_up_program(failure, program_energy_usage, cache_keys)
+                continue
+
+            # Store the datapoints recorded for the current program in our dict
+            program_energy_usage[idx] = prog_values
+
+            if self._hooks["on_program_done"]:
+                self._emit("on_program_done", ProgramDoneEvent(idx, prog_values))
+
+        self._store_results(program_energy_usage)
+        self._update_cache(cache_keys)
+
+    def _begin_program(
+        self,
+        idx: int,
+        program: Program,
+        program_energy_usage: Dict[str, List[Datapoint]],
+        cache_keys: Dict[int, str],
+    ) -> Optional[List[Datapoint]]:
+        """
+        Start the measurement of a program. Returns its datapoints if it is served from the
+        cache, otherwise its outcomes are reset and None is returned
+        """
+        Logger().get_logger().debug(
+            "Evaluating program %d [%s]...",
+            idx,
+            program.get_executeable()
+        )
+
+        cached = self._lookup_cache(idx, program, cache_keys)
+        if cached is not None:
+            program_energy_usage[idx] = cached
+            return cached
+
+        self._outcomes[idx] = {
+            "ok": 0, "failed": 0, "timeout": 0, "skipped": 0, "flagged": 0, "remeasured": 0
+        }
+        return None
+
+    def _measure_program(self, idx: int, program: Program) -> List[Datapoint]:
+        """
+        Record all datapoints of a single program. Raises ProgramFailure if the failure policy
+        gives up on the program
+        """
+        # Store the recorded datapoint objects for each program separately
+        prog_values: List[Datapoint] = []
+
+        # Warm-up executions are not part of the results
+        self._warm_up(program)
+
+        native = self._native and self._native_supported(program)
+
+        # Record 0 up to self._datapoints many average measurements
+        for dp_idx in range(0, self._datapoints):
+            self._log_datapoint(dp_idx)
+
+            if native:
+                repetitions = self._measure_datapoint_native(program, (idx, dp_idx))
+            else:
+                # Record 0 up to self._repetitions many repetitions
+                repetitions = (
+                    self._measure_repetition(program, (idx, dp_idx, rep_idx))
+                    for rep_idx in range(0, self._repetitions)
+                )
+
+            # Store the energy, duration and metrics of each valid repetition
+            measured = []
+            for rep_idx, repetition in enumerate(repetitions):
+                measured.append(repetition)
+
+                # Only build event objects if somebody is listening
+                if self._hooks["on_repetition"]:
+                    self._emit(
+                        "on_repetition", RepetitionEvent(idx, dp_idx, rep_idx, *repetition[:2])
+                    )
+
+            datapoint = self._create_datapoint(measured)
+            prog_values.append(datapoint)
+
+            if self._hooks["on_datapoint"]:
+                self._emit("on_datapoint", DatapointEvent(idx, dp_idx, datapoint))
+
+        return prog_values
+
+    async def measure_async(self) -> AsyncIterator[MeasurementEvent]:
+        """
+        Asynchronous variant of measure. Executes the programs without blocking the event loop
+        and yields the same events that are passed to the registered hooks (RepetitionEvent,
+        DatapointEvent, ProgramDoneEvent, RetryEvent and FailureEvent). Results and statistics
+        are stored once all programs are measured.
+
+        Cancelling the consuming task kills the currently running program. Campaigns on
+        different cores can be awaited concurrently, keep in mind that package wide energy
+        domains are shared between the campaigns.
+        """
+
+        # Dict to store relation program -> Datapoints
+        program_energy_usage: Dict[str, List[Datapoint]] = {}
+        cache_keys: Dict[int, str] = {}
+        self._outcomes = {}
 
         for idx, program in enumerate(self._programs):
-            # Store the recorded datapoint objects for each program separately
             prog_values: List[Datapoint] = []
 
-            Logger().get_logger().debug(
-                "Evaluating program %d [%s]...",
-                idx,
-                program.get_executeable()
+            cached = self._begin_program(idx, program, program_energy_usage, cache_keys)
+            if cached is not None:
+                event = ProgramDoneEvent(idx, cached)
+                self._emit("on_program_done", event)
+                yield event
+                continue
+
+            await self._warm_up_async(program)
+
+            # Events of discarded attempts of the current repetition
+            events: List[MeasurementEvent] = []
+
+            try:
+                for dp_idx in range(0, self._datapoints):
+                    self._log_datapoint(dp_idx)
+
+                    measured = []
+                    for rep_idx in range(0, self._repetitions):
+                        repetition = await self._measure_repetition_async(
+                            program, (idx, dp_idx, rep_idx), events
+                        )
+
+                        for event in events:
+                            yield event
+                        events.clear()
+
+                        measured.append(repetition)
+                        event = RepetitionEvent(idx, dp_idx, rep_idx, *repetition[:2])
+                        self._emit("on_repetition", event)
+                        yield event
+
+                    datapoint = self._create_datapoint(measured)
+                    prog_values.append(datapoint)
+
+                    event = DatapointEvent(idx, dp_idx, datapoint)
+                    self._emit("on_datapoint", event)
+                    yield event
+
+            except ProgramFailure as failure:
+                for event in events + [failure.event]:
+                    yield event
+                self._give_up_program(failure, program_energy_usage, cache_keys)
+                continue
+
+            program_energy_usage[idx] = prog_values
+
+            event = ProgramDoneEvent(idx, prog_values)
+            self._emit("on_program_done", event)
+            yield event
+
+        self._store_results(program_energy_usage)
+        self._update_cache(cache_keys)
+
+    async def run_async(self) -> Dict[str, np.ndarray]:
+        """
+        Run measure_async to completion and return the recorded results. Several toolkits
+        can be awaited at once, e.g. with asyncio.gather
+        """
+        async for _ in self.measure_async():
+            pass
+
+        return self._results
+
+    def _get_timeout(self, program: Program) -> Optional[float]:
+        """Return the timeout of the program, falling back to the global timeout"""
+        if program.get_timeout() is not None:
+            return program.get_timeout()
+
+        return self._timeout
+
+    def _log_datapoint(self, dp_idx: int) -> None:
+        """Log the progress of the datapoints of the current program"""
+        Logger().get_logger().debug(
+            "Evaluating datapoint %d/%d",
+            dp_idx + 1,
+            self._datapoints,
+            extra={"same_line": True}
+        )
+
+    @staticmethod
+    def _warming_up(program: Program, start: float, executions: int) -> bool:
+        """Check whether the warm-up started at start needs further executions"""
+        return (
+            executions < program.get_warmup()
+            or time.perf_counter() - start < program.get_warmup_time()
+        )
+
+    def _warm_up(self, program: Program) -> None:
+        """
+        Execute the program the configured number of warm-up times and continue until the
+        configured warm-up time has passed
+        """
+        if program.get_warmup() <= 0 and program.get_warmup_time() <= 0:
+            return
+
+        Logger().get_logger().debug(
+            "Warming up (%d executions, at least %.2f s)...",
+            program.get_warmup(),
+            program.get_warmup_time(),
+        )
+
+        start = time.perf_counter()
+        executions = 0
+        while self._warming_up(program, start, executions):
+            program.execute(self._cores, self._get_timeout(program))
+            executions += 1
+
+    async def _warm_up_async(self, program: Program) -> None:
+        """Asynchronous variant of _warm_up"""
+        start = time.perf_counter()
+        executions = 0
+        while self._warming_up(program, start, executions):
+            await program.execute_async(self._cores, self._get_timeout(program))
+            executions += 1
+
+    def _measure_repetition(
+        self, program: Program, position: Tuple[int, int, int]
+    ) -> Tuple[float, float, Dict[str, float]]:
+        """
+        Measure a single valid repetition of the given program. Repetitions with a non positive
+        energy delta or a failed execution are measured again, as are disturbed repetitions if
+        the interference policy asks for it. Returns the energy, the duration and additional
+        metrics
+        """
+        attempts = {"failed": 0, "remeasured": 0}
+        timeout = self._get_timeout(program)
+        # Functions run in the measuring thread, their time is in its thread time
+        in_thread = isinstance(program, FunctionProgram)
+
+        while True:
+            start = self._start_attempt(program)
+            execution = program.execute(self._cores, timeout, self._markers, self._perf_events)
+            repetition, _ = self._finish_attempt(start, execution, position, attempts, in_thread)
+
+            if repetition is not None:
+                return repetition
+
+    async def _measure_repetition_async(
+        self,
+        program: Program,
+        position: Tuple[int, int, int],
+        events: List[MeasurementEvent],
+    ) -> Tuple[float, float, Dict[str, float]]:
+        """
+        Asynchronous variant of _measure_repetition. Events of discarded attempts are appended
+        to the given events list
+        """
+        attempts = {"failed": 0, "remeasured": 0}
+        timeout = self._get_timeout(program)
+
+        while True:
+            start = self._start_attempt(program)
+            execution = await program.execute_async(
+                self._cores, timeout, self._markers, self._perf_events
+            )
+            # Functions run in an executor thread, not in the measuring one
+            repetition, discarded = self._finish_attempt(
+                start, execution, position, attempts, False
             )
+            events += discarded
+
+            if repetition is not None:
+                return repetition
+
+    def _start_attempt(self, program: Program) -> Tuple[ActivitySnapshot, float, List[float]]:
+        """
+        Prepare an execution and take the readings right before it. Returns the activity
+        snapshot, the time and the energy readings
+        """
+        # Establish the requested page cache state outside of the timed section
+        program.prepare_cache()
+
+        activity_before = self._interference.snapshot() if self._interference else None
+        if self._attribution is not None:
+            self._attribution.prepare()
+
+        # Take the current timer and energy reading
+        time_before = time.perf_counter()
+        eng_before = self._read_energy()
+        if self._attribution is not None:
+            self._attribution.start(sum(eng_before))
+
+        return activity_before, time_before, eng_before
+
+    def _finish_attempt( # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        start: Tuple[ActivitySnapshot, float, List[float]],
+        execution: ExecutionResult,
+        position: Tuple[int, int, int],
+        attempts: Dict[str, int],
+        in_thread: bool,
+    ) -> Tuple[Optional[Tuple[float, float, Dict[str, float]]], List[MeasurementEvent]]:
+        """
+        Take the readings right after an execution and evaluate the attempt. Returns the
+        energy, duration and metrics of a valid repetition, otherwise None and the emitted
+        events of the discarded attempt. Raises ProgramFailure if the program is given up
+        """
+        # Read time and energy counter after measurement
+        eng_after = self._read_energy()
+        time_after = time.perf_counter()
+
+        activity_before, time_before, eng_before = start
+        attributed = self._attribution.stop(sum(eng_after)) if self._attribution else None
+        deltas = [after - before for before, after in zip(eng_before, eng_after)]
+        activity_after = self._interference.snapshot() if self._interference else None
 
-            # Record 0 up to self._datapoints many average measurements
-            for _ in range(0, self._datapoints):
-                # Store the values recorded during each measurement repetition
-                energy_per_rep = []
-                time_per_rep = []
-
-                Logger().get_logger().debug(
-                    "Evaluating datapoint %d/%d",
-                    _ + 1,
-                    self._datapoints,
-                    extra={"same_line": True}
+        # Energy of failed or killed executions is never recorded
+        if execution.status != ExecutionStatus.OK:
+            attempts["failed"] += 1
+            discarded = list(self._account_failure(execution, position, attempts["failed"]))
+            self._emit("on_failure", discarded[0])
+            self._emit("on_retry", discarded[1])
+            return None, discarded
+
+        # Check for negative energy (possible overflow) in any of the domains
+        if min(deltas) < 0 or sum(deltas) <= 0 or not self._regions_valid():
+            event = RetryEvent(*position, "overflow")
+            self._emit("on_retry", event)
+            return None, [event]
+
+        activity = None
+        if self._interference is not None:
+            activity, remeasure = self._check_interference(
+                activity_before, activity_after, time_after - time_before, position,
+                attempts["remeasured"], execution, in_thread,
+            )
+            if remeasure:
+                attempts["remeasured"] += 1
+                event = RetryEvent(*position, "interference")
+                self._emit("on_retry", event)
+                return None, [event]
+
+        self._outcomes[position[0]]["ok"] += 1
+
+        # Resource usage of the reaped child comes for free with the execution
+        metrics = dict(execution.usage)
+        metrics.update(execution.counters)
+        if attributed is not None:
+            metrics["attributed_energy"] = attributed
+        if self._markers is not None:
+            metrics.update(self._markers.metrics())
+        if activity is not None:
+            metrics.update(activity)
+        metrics.update(self._domain_metrics(deltas))
+
+        return (sum(deltas), time_after - time_before, metrics), []
+
+    def _read_energy(self) -> List[float]:
+        """Read the energy counters of all domains covering the measured cores"""
+        return [RAPLInterface.read(self._vendor, reader) for reader in self._domains.values()]
+
+    def _domain_metrics(self, deltas: List[float]) -> Dict[str, float]:
+        """Return the energy of each domain if the cores are covered by more than one domain"""
+        if len(deltas) < 2:
+            return {}
+        return {f"{name}_energy": delta for name, delta in zip(self._domains, deltas)}
+
+    def _native_supported(self, program: Program) -> bool:
+        """
+        Check whether the program can be measured by the native measurement kernel. It records
+        energy and time only and does not support timeouts or page cache control
+        """
+        reasons = []
+        if self._vendor not in (CPU_TYPE.INTEL, CPU_TYPE.AMD):
+            reasons.append(f"{self._vendor.name} CPUs")
+        if len(self._cores) > 1:
+            reasons.append("core sets")
+        if self._get_timeout(program) is not None:
+            reasons.append("timeouts")
+        if isinstance(program, FunctionProgram):
+            reasons.append("Python callables")
+        if program.get_cache_mode() != CacheMode.WARM:
+            reasons.append("cache modes")
+        if self._perf_counters or self._attribution is not None or self._markers is not None:
+            reasons.append("additional metrics")
+        if self._interference is not None:
+            reasons.append("interference detection")
+
+        if reasons:
+            self._logger.warning(
+                "Native measurements do not support %s, measuring %s in Python",
+                ", ".join(reasons),
+                program.get_executeable(),
+            )
+
+        return not reasons
+
+    def _measure_datapoint_native(
+        self, program: Program, position: Tuple[int, int]
+    ) -> List[Tuple[float, float, Dict[str, float]]]:
+        """
+        Measure all repetitions of a datapoint in the native measurement kernel. The kernel only
+        returns to Python if an execution failed, which is then handled like in Python
+        """
+        energies = np.empty(self._repetitions)
+        times = np.empty(self._repetitions)
+        executeable = shutil.which(program.get_executeable()) or program.get_executeable()
+        argv = [program.get_executeable()] + program.get_arguments()
+
+        measured = 0
+        attempts = 0
+        while measured < self._repetitions:
+            done, returncode, retries = RAPLInterface.measure_exec(
+                self._vendor,
+                self._core,
+                executeable,
+                argv,
+                program.get_inputfile(),
+                energies[measured:],
+                times[measured:],
+            )
+            measured += done
+            self._outcomes[position[0]]["ok"] += done
+
+            # The retries of a datapoint are reported at the repetition that stopped the kernel
+            if self._hooks["on_retry"]:
+                for _ in range(retries):
+                    self._emit("on_retry", RetryEvent(*position, measured, "overflow"))
+
+            if measured < self._repetitions:
+                attempts = attempts + 1 if done == 0 else 1
+                failure, retry = self._account_failure(
+                    ExecutionResult(returncode, {}, ExecutionStatus.FAILED),
+                    (*position, measured),
+                    attempts,
                 )
+                self._emit("on_failure", failure)
+                self._emit("on_retry", retry)
 
-                # Record 0 up to self._repetitions many repetitions
-                for _ in range(0, self._repetitions):
-                    measurement_valid = False
+        return [(float(e), float(t), {}) for e, t in zip(energies, times)]
+
+    def _check_interference( # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        before: ActivitySnapshot,
+        after: ActivitySnapshot,
+        duration: float,
+        position: Tuple[int, int, int],
+        remeasured: int,
+        execution: ExecutionResult,
+        in_thread: bool,
+    ) -> Tuple[Dict[str, float], bool]:
+        """
+        Evaluate the foreign activity of a repetition, in_thread tells whether the execution ran
+        in the measuring thread. Returns its metrics and whether the repetition has to be
+        measured again. Disturbed repetitions that are kept are flagged
+        """
+        program_time = execution.usage["user_time"] + execution.usage["sys_time"]
+        metrics = self._interference.metrics(before, after, program_time, in_thread)
+        disturbed = self._interference.is_disturbed(metrics, duration)
 
-                    while not measurement_valid:
-                        # Take the current timer and energy reading
-                        time_before = time.perf_counter()
-                        eng_before = RAPLInterface.read(self._vendor, self._core)
+        if (
+            disturbed
+            and self._interference_policy == InterferencePolicy.REMEASURE
+            and remeasured < self._retries
+        ):
+            self._outcomes[position[0]]["remeasured"] += 1
+            return metrics, True
 
-                        # Execute the current program
-                        program.execute(self._core)
+        self._outcomes[position[0]]["flagged"] += int(disturbed)
+        metrics["flagged"] = float(disturbed)
+        return metrics, False
 
-                        # Read time and energy counter after measurement
-                        eng_after = RAPLInterface.read(self._vendor, self._core)
-                        time_after = time.perf_counter()
+    def _regions_valid(self) -> bool:
+        """Check the regions of the last execution, unclosed regions are reported and dropped"""
+        if self._markers is None:
+            return True
 
-                        # Check for negative energy (possible overflow)
-                        if eng_after - eng_before > 0:
-                            measurement_valid = True
+        # Report each unclosed region only once instead of for every repetition
+        unclosed = set(self._markers.get_unclosed()) - self._unclosed_regions
+        if unclosed:
+            self._logger.warning("Regions %s were never ended", ", ".join(sorted(unclosed)))
+            self._unclosed_regions |= unclosed
 
-                            # Store valid measurements
-                            energy_per_rep.append(eng_after - eng_before)
-                            time_per_rep.append(time_after - time_before)
+        return self._markers.valid()
 
-                # Convert readings to numpy arrays
-                np_energ = np.array(energy_per_rep)
-                np_time = np.array(time_per_rep)
+    def _account_failure(
+        self, execution: ExecutionResult, position: Tuple[int, int, int], attempts: int
+    ) -> Tuple[FailureEvent, RetryEvent]:
+        """
+        Count a failed or timed out execution. Returns the events of the discarded attempt if
+        the repetition is measured again, otherwise raises ProgramFailure
+        """
+        status = execution.status.name.lower()
+        self._outcomes[position[0]][status] += 1
 
-                # Create and append a new datapoint object to our list of datapoints for the
-                # current program
-                prog_values.append(Datapoint(np.mean(np_energ), np.mean(np_time)))
+        failure = FailureEvent(*position, status, execution.returncode)
+        if self._failure_policy != FailurePolicy.RETRY or attempts > self._retries:
+            raise ProgramFailure(failure)
 
-            # Store the datapoints recorded for the current program in our dict
-            program_energy_usage[idx] = prog_values
+        return failure, RetryEvent(*position, status)
 
-        # Convert our dict to dict -> numpy structure
-        dtype = np.dtype([("energy", float), ("time", float)])
+    def _give_up_program(
+        self,
+        failure: "ProgramFailure",
+        program_energy_usage: Dict[str, List[Datapoint]],
+        cache_keys: Dict[int, str],
+    ) -> None:
+        """
+        Skip the program of the given failure, its results are discarded. Raises
+        MeasurementAborted after storing the results of the completed programs if the failure
+        policy aborts the campaign
+        """
+        idx = failure.event.program
+        # Hooks of the last failure already see the program as skipped
+        self._outcomes[idx]["skipped"] = 1
+        self._emit("on_failure", failure.event)
+        cache_keys.pop(idx, None)
 
-        arrays = {
-            key: np.array([(dp.energy, dp.time) for dp in dplist], dtype=dtype)
-            for key, dplist in program_energy_usage.items()
-        }
+        if self._failure_policy == FailurePolicy.ABORT:
+            self._store_results(program_energy_usage)
+            self._update_cache(cache_keys)
+            raise MeasurementAborted(
+                f"Program {idx} [{self._programs[idx].get_executeable()}] {failure}, "
+                "aborting the measurement."
+            )
+
+        self._logger.warning(
+            "Program %d [%s] %s, skipping it.", idx, self._programs[idx].get_executeable(), failure
+        )
+
+    def _lookup_cache(
+        self, idx: int, program: Program, cache_keys: Dict[int, str]
+    ) -> Optional[List[Datapoint]]:
+        """
+        Return the cached datapoints of the program or None if it has to be measured. The key of
+        a program that has to be measured is remembered in cache_keys
+        """
+        if self._cache is None:
+            return None
+
+        key = MeasurementCache.key(
+            program,
+            {
+                "datapoints": self._datapoints,
+                "repetitions": self._repetitions,
+                "core": ProcFS.format_cpu_list(set(self._cores)),
+                "perf_counters": self._perf_counters,
+                "attribution": self._attribution is not None,
+                "regions": self._markers is not None,
+                "native": self._native,
+                # Programs without their own timeout are killed after the global timeout and
+                # failed repetitions are only kept after the retries of the failure policy
+                "timeout": self._timeout,
+                "failure_policy": self._failure_policy.name.lower(),
+                "retries": self._retries,
+                "interference": self._interference_policy.name.lower(),
+                "interference_settings": (
+                    self._interference.get_settings() if self._interference else None
+                ),
+            },
+        )
+
+        results = None if self._force else self._cache.get(key)
+        if results is None:
+            cache_keys[idx] = key
+            return None
+
+        Logger().get_logger().debug("Program %d unchanged, using cached results", idx)
+
+        extra = [name for name in results.dtype.names if name not in ("energy", "time")]
+        return [
+            Datapoint(
+                float(row["energy"]), float(row["time"]), {m: float(row[m]) for m in extra}
+            )
+            for row in results
+        ]
+
+    def _update_cache(self, cache_keys: Dict[int, str]) -> None:
+        """Add the results of the measured programs to the cache"""
+        for idx, key in cache_keys.items():
+            self._cache.put(key, self._results[idx])
+
+    @staticmethod
+    def _create_datapoint(repetitions: List[Tuple[float, float, Dict[str, float]]]) -> Datapoint:
+        """Average the energy, duration and additional metrics of the repetitions of a datapoint"""
+        metrics_per_rep: Dict[str, List[float]] = {}
+        for _, _, metrics in repetitions:
+            for name, value in metrics.items():
+                metrics_per_rep.setdefault(name, []).append(value)
+
+        return Datapoint(
+            np.mean([energy for energy, _, _ in repetitions]),
+            np.mean([duration for _, duration, _ in repetitions]),
+            {name: float(np.mean(values)) for name, values in metrics_per_rep.items()},
+        )
+
+    def _store_results(self, program_energy_usage: Dict[str, List[Datapoint]]) -> None:
+        """Convert the recorded datapoints to numpy arrays and generate the statistics"""
+
+        arrays = {}
+        for key, dplist in program_energy_usage.items():
+            # Additional metrics become additional fields after energy and time. Metrics that
+            # only some datapoints recorded, e.g. region markers, are nan in the other ones
+            extra = list(dict.fromkeys(m for dp in dplist for m in dp.metrics))
+            dtype = np.dtype([("energy", float), ("time", float)] + [(m, float) for m in extra])
+
+            arrays[key] = np.array(
+                [
+                    (dp.energy, dp.time) + tuple(dp.metrics.get(m, np.nan) for m in extra)
+                    for dp in dplist
+                ],
+                dtype=dtype,
+            )
 
         # Save measured results to the object
         self._results = arrays
@@ -153,33 +834,51 @@ class EnergyToolkit:
         statistics = {}
 
         # Iterate over program ids in the given results
-        for pid in self._results:
+        for pid, results in self._results.items():
             program_stats = {}
-            time_dict = {}
-            energy_dict = {}
 
-            time_values = self._results[pid]["time"]
-            energy_values = self._results[pid]["energy"]
+            # Time and energy first, followed by any additional recorded metric
+            values = {"time": results["time"], "energy": results["energy"]}
+            for name in results.dtype.names:
+                if name not in values:
+                    values[name] = results[name]
 
-            # Call numpy statistic methods to calculate values
-            time_dict["mean"] = time_values.mean()
-            time_dict["variance"] = time_values.var()
-            time_dict["std_deviation"] = time_values.std()
-
-            energy_dict["mean"] = energy_values.mean()
-            energy_dict["variance"] = energy_values.var()
-            energy_dict["std_deviation"] = energy_values.std()
+            # Ratios derived from the performance counters of each datapoint
+            if "instructions" in values:
+                values["energy_per_instruction"] = self._ratio(
+                    results["energy"], results["instructions"]
+                )
+                if "cycles" in values:
+                    values["ipc"] = self._ratio(results["instructions"], results["cycles"])
 
-            program_stats["time"] = time_dict
-            program_stats["energy"] = energy_dict
+            for name, metric_values in values.items():
+                # Call numpy statistic methods to calculate values
+                program_stats[name] = {
+                    "mean": metric_values.mean(),
+                    "variance": metric_values.var(),
+                    "std_deviation": metric_values.std(),
+                }
 
             statistics[pid] = program_stats
 
         self._statistics = statistics
 
+    @staticmethod
+    def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+        """Element wise ratio that is nan wherever the denominator is not positive"""
+        return np.divide(
+            numerator,
+            denominator,
+            out=np.full(len(numerator), np.nan),
+            where=denominator > 0,
+        )
+
     def print_statistics(self) -> None:
         """Prints some statistic metrics for the given results returned from a measurement"""
 
+        # Render queued log messages before printing directly
+        Logger().flush()
+
         # Iterate over program ids in the given results
         for stat_item in self._statistics.items():
             pid = stat_item[0] # Query the pid from the tuple
@@ -192,6 +891,9 @@ class EnergyToolkit:
 
             output = f"""====================================
       Program {pid}: {program.get_executeable()}
+      Cache: {program.get_cache_mode().name.lower()}
+      Warm-up: {program.get_warmup()} executions, {program.get_warmup_time()} s
+      {self._format_outcomes(pid)}
 
       Time:
         AVG: {time_values["mean"]:.5e} s
@@ -202,11 +904,62 @@ class EnergyToolkit:
         AVG: {energy_values["mean"]:.5e} J
         VAR: {energy_values["variance"]:.5e} J
         STD: {energy_values["std_deviation"]:.5e} J
+{self._format_metric_statistics(pid)}
       ====================================
       """
 
             print(output)
 
+        # Skipped programs have no statistics, only their outcomes are reported
+        for pid, outcomes in self._outcomes.items():
+            if outcomes["skipped"]:
+                print(
+                    f"""====================================
+      Program {pid}: {self._programs[pid].get_executeable()}
+      {self._format_outcomes(pid)}
+      ====================================
+      """
+                )
+
+    def _format_outcomes(self, pid) -> str:
+        """Format the execution outcome counts of a program for print_statistics"""
+        if pid not in self._outcomes:
+            return "Outcomes: served from cache"
+
+        outcomes = self._outcomes[pid]
+        output = (
+            f"Outcomes: {outcomes['ok']} ok, {outcomes['failed']} failed, "
+            f"{outcomes['timeout']} timed out"
+        )
+        if outcomes["flagged"] or outcomes["remeasured"]:
+            output += (
+                f", interference: {outcomes['flagged']} flagged, "
+                f"{outcomes['remeasured']} remeasured"
+            )
+        if outcomes["skipped"]:
+            output += ", skipped"
+
+        return output
+
+    def _format_metric_statistics(self, pid) -> str:
+        """Format the statistics of all metrics besides time and energy for print_statistics"""
+        output = ""
+        for name, metric_values in self._statistics[pid].items():
+            if name in ("time", "energy"):
+                continue
+
+            output += f"""
+      {name.replace("_", " ").capitalize()}:
+        AVG: {metric_values["mean"]:.5e}
+        VAR: {metric_values["variance"]:.5e}
+        STD: {metric_values["std_deviation"]:.5e}
+"""
+        return output
+
+    def get_programs(self) -> List[Program]:
+        """Return the programs added to the toolkit, indexed by their program id"""
+        return self._programs
+
     def get_results(self) -> Dict[str, np.ndarray]:
         """Return the currently saved results"""
         return self._results
@@ -215,6 +968,15 @@ class EnergyToolkit:
         """Return the currently saved statistics"""
         return self._statistics
 
+    def get_outcomes(self) -> Dict[int, Dict[str, int]]:
+        """
+        Return the execution outcomes of each measured program: the number of ok, failed and
+        timed out executions, whether the program was skipped and the number of repetitions that
+        were flagged or remeasured for interference. Programs served from the cache have no
+        outcomes
+        """
+        return self._outcomes
+
     def _create_location_if_not_exists(self, location) -> bool:
         """Helper method that creates a folder at a location if it does not exists. 
         If an error occurs an error message is printed"""
@@ -239,11 +1001,12 @@ class EnergyToolkit:
 
         if folder_successfully_created:
             # iterate over the saved results
-            for pid in self._results:
-                # Convert custom dict to a numpy array
-                data = np.column_stack(
-                    (self._results[pid]["time"], self._results[pid]["energy"])
-                )
+            for pid, results in self._results.items():
+                # Convert custom dict to a numpy array, time and energy stay the first columns
+                columns = ["time", "energy"] + [
+                    name for name in results.dtype.names if name not in ("time", "energy")
+                ]
+                data = np.column_stack([results[name] for name in columns])
 
                 # Construct the pid folder inside the results dir
                 savefolder = os.path.join(self._result_path, str(pid))
@@ -255,22 +1018,40 @@ class EnergyToolkit:
                     np.savetxt(
                         savelocation,
                         data,
-                        header="Time,Energy",
+                        header=",".join(name.capitalize() for name in columns),
                         delimiter=",",
                         fmt="%s",
                     )
+
+                    # Label the results with the program and its measurement settings
+                    with open(
+                        os.path.join(savefolder, "program.yaml"), "w", encoding="utf-8"
+                    ) as f:
+                        yaml.safe_dump(self._programs[pid].to_dict(), f, sort_keys=False)
                 else:
                     self._logger.error(
                         "File could not be saved! Do you habe the correct rights to access "
                         "the result location?"
                     )
 
+            # The written results replace the streamed ones, skipped programs keep none
+            self._remove_partial_results()
+
         else:
             self._logger.error(
                 "File could not be saved! Do you habe the correct rights to access the result "
                 "location?"
             )
 
+    def _remove_partial_results(self):
+        """Remove the files streamed while the programs were measured"""
+        for pid in range(len(self._programs)):
+            for name in (self.PARTIAL_RESULTS, self.PARTIAL_PROGRAM):
+                try:
+                    os.remove(os.path.join(self._result_path, str(pid), name))
+                except FileNotFoundError:
+                    pass
+
     def write_statistics(self):
         """Write the last saved statistics to a file. One file for each program under analysis at "
         the specific result location"""
@@ -281,13 +1062,11 @@ class EnergyToolkit:
         if folder_successfully_created:
             # iterate over the saved results
             for pid in self._results:
-                # Convert custom dict to a numpy array
+                # Convert custom dict to a numpy array, one column per metric
+                columns = list(self._statistics[pid])
                 data = np.column_stack(
-                    (
-                        ["mean", "variance", "std_deviation"],
-                        list(self._statistics[pid]["time"].values()),
-                        list(self._statistics[pid]["energy"].values()),
-                    )
+                    [["mean", "variance", "std_deviation"]]
+                    + [list(self._statistics[pid][name].values()) for name in columns]
                 )
 
                 # Construct the pid folder inside the results dir
@@ -300,7 +1079,7 @@ class EnergyToolkit:
                     np.savetxt(
                         savelocation,
                         data,
-                        header="Value,Time,Energy",
+                        header=",".join(["Value"] + [name.capitalize() for name in columns]),
                         delimiter=",",
                         fmt="%s",
                     )
@@ -310,8 +1089,48 @@ class EnergyToolkit:
                         "result location?"
                     )
 
+            # Outcomes are also written for skipped programs without results
+            self._write_outcomes()
+
         else:
             self._logger.error(
                 "File could not be saved! Do you habe the correct rights to access the result "
                 "location?"
             )
+
+    def _write_outcomes(self):
+        """Write the execution outcomes of each measured program to its outcomes.csv file"""
+        columns = ["ok", "failed", "timeout", "skipped", "flagged", "remeasured"]
+
+        for pid, outcomes in self._outcomes.items():
+            savefolder = os.path.join(self._result_path, str(pid))
+
+            if self._create_location_if_not_exists(savefolder):
+                np.savetxt(
+                    os.path.join(savefolder, "outcomes.csv"),
+                    [[outcomes[name] for name in columns]],
+                    header=",".join(name.capitalize() for name in columns),
+                    delimiter=",",
+                    fmt="%d",
+                )
+            else:
+                self._logger.error(
+                    "File could not be saved! Do you habe the correct rights to access the "
+                    "result location?"
+                )
+
+    def write_store(self, path: str, label: str = "") -> int:
+        """Add the last saved results as a new campaign to the result store at the given path.
+        Returns the id of the campaign"""
+        store = ResultStore(path)
+        try:
+            return store.add_campaign(
+                [program.to_dict() for program in self._programs],
+                self._results,
+                self._datapoints,
+                self._repetitions,
+                ProcFS.format_cpu_list(set(self._cores)),
+                label,
+            )
+        finally:
+            store.close()
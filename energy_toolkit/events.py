@@ -0,0 +1,83 @@
+"""
+Event module of the energy-toolkit.
+Offers the event objects that are emitted while a measurement campaign is running.
+"""
+
+from energy_toolkit.util import Datapoint
+
+
+class MeasurementEvent:
+    """Base class of all measurement events. Each event belongs to a program id"""
+
+    program: int = 0
+
+    def __init__(self, program):
+        self.program = program
+
+
+class RepetitionEvent(MeasurementEvent):
+    """Event emitted after each valid repetition of a program"""
+
+    datapoint: int = 0
+    repetition: int = 0
+    energy: float = 0.0
+    time: float = 0.0
+
+    def __init__(self, program, datapoint, repetition, energy, time): # pylint: disable=too-many-arguments,too-many-positional-arguments
+        super().__init__(program)
+        self.datapoint = datapoint
+        self.repetition = repetition
+        self.energy = energy
+        self.time = time
+
+
+class DatapointEvent(MeasurementEvent):
+    """Event emitted after each datapoint of a program has been averaged"""
+
+    index: int = 0
+    datapoint: Datapoint = None
+
+    def __init__(self, program, index, datapoint):
+        super().__init__(program)
+        self.index = index
+        self.datapoint = datapoint
+
+
+class ProgramDoneEvent(MeasurementEvent):
+    """Event emitted after all datapoints of a program have been recorded"""
+
+    datapoints: list = None
+
+    def __init__(self, program, datapoints):
+        super().__init__(program)
+        self.datapoints = datapoints
+
+
+class RetryEvent(MeasurementEvent):
+    """Event emitted whenever a repetition is discarded and measured again"""
+
+    datapoint: int = 0
+    repetition: int = 0
+    reason: str = ""
+
+    def __init__(self, program, datapoint, repetition, reason):
+        super().__init__(program)
+        self.datapoint = datapoint
+        self.repetition = repetition
+        self.reason = reason
+
+
+class FailureEvent(MeasurementEvent):
+    """Event emitted whenever an execution fails or exceeds its timeout"""
+
+    datapoint: int = 0
+    repetition: int = 0
+    status: str = ""
+    returncode: int = 0
+
+    def __init__(self, program, datapoint, repetition, status, returncode): # pylint: disable=too-many-arguments,too-many-positional-arguments
+        super().__init__(program)
+        self.datapoint = datapoint
+        self.repetition = repetition
+        self.status = status
+        self.returncode = returncode
@@ -0,0 +1,126 @@
+"""
+Interference module.
+Offers the detection of foreign activity on the measurement cores during single repetitions.
+"""
+
+import os
+import resource
+from typing import Dict
+
+from energy_toolkit.procfs import ProcFS
+
+
+class ActivitySnapshot:
+    """Data class holding the activity counters of the measurement cores at one point in time"""
+
+    busy_time: float = 0.0
+    run_time: float = None
+    run_delay: float = None
+    interrupts: int = 0
+    # Cpu time of the measuring thread, None if it may run outside of the measurement cores
+    thread_time: float = None
+
+    def __init__(self, busy_time, run_time, run_delay, interrupts, thread_time): # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self.busy_time = busy_time
+        self.run_time = run_time
+        self.run_delay = run_delay
+        self.interrupts = interrupts
+        self.thread_time = thread_time
+
+
+class InterferenceMonitor:
+    """
+    Detects repetitions that were disturbed by foreign activity on the measurement cores.
+    Around each repetition the busy time, the scheduler statistics and the interrupt counts of
+    the cores are read. The cpu time of the measured execution is subtracted, and so is the cpu
+    time of the measuring thread if its affinity keeps it on the measurement cores. The rest is
+    foreign. Both are counted per execution and thread, so campaigns of other toolkits in the
+    same process are foreign as well.
+    A repetition is disturbed if the foreign cpu time or the time tasks waited in the run queues
+    exceeds the given share of its duration, or if the cores received more interrupts per second
+    than the given rate.
+
+    The run and wait times of /proc/schedstat are exact to the nanosecond. Kernels without
+    schedstats fall back to the busy time of /proc/stat, which is only exact to a scheduler tick,
+    so one tick per core is tolerated and the wait time is not available.
+    """
+
+    def __init__(self, cores, threshold=0.05, interrupt_rate=2000.0):
+        """
+        Create a new monitor for the given core or set of cores. Threshold is the tolerated
+        share of foreign and waiting time, interrupt_rate the tolerated interrupts per second
+        and core
+        """
+        self._cores = {cores} if isinstance(cores, int) else set(cores)
+        self._threshold = threshold
+        self._interrupt_rate = interrupt_rate
+        self._schedstat = ProcFS.read_schedstat(self._cores) is not None
+
+    def has_schedstat(self) -> bool:
+        """Return whether the exact run and wait times of /proc/schedstat are used"""
+        return self._schedstat
+
+    def get_settings(self) -> dict:
+        """Return the thresholds of the monitor, e.g. as part of a cache key"""
+        return {"threshold": self._threshold, "interrupt_rate": self._interrupt_rate}
+
+    def snapshot(self) -> ActivitySnapshot:
+        """
+        Read the activity counters of the measurement cores. Has to be called from the thread
+        that starts the executions
+        """
+        schedstat = ProcFS.read_schedstat(self._cores) if self._schedstat else None
+        # Time of a thread that may run elsewhere cannot be told apart from foreign activity
+        thread_time = None
+        if os.sched_getaffinity(0) <= self._cores:
+            usage = resource.getrusage(resource.RUSAGE_THREAD)
+            thread_time = usage.ru_utime + usage.ru_stime
+
+        return ActivitySnapshot(
+            ProcFS.read_cpus_busy_time(self._cores),
+            schedstat[0] if schedstat is not None else None,
+            schedstat[1] if schedstat is not None else None,
+            ProcFS.read_cores_interrupt_count(self._cores),
+            thread_time,
+        )
+
+    def metrics(
+        self, before: ActivitySnapshot, after: ActivitySnapshot, program_time=0.0, in_thread=False
+    ) -> Dict[str, float]:
+        """
+        Return the foreign cpu time and the run queue wait time in seconds and the interrupts
+        between the two snapshots. Program_time is the cpu time of the execution, in_thread
+        tells whether it ran in the measuring thread
+        """
+        programs = program_time
+        if before.thread_time is not None and after.thread_time is not None:
+            thread = after.thread_time - before.thread_time
+            programs += max(thread - program_time if in_thread else thread, 0.0)
+
+        if self._schedstat:
+            foreign = after.run_time - before.run_time - programs
+            waiting = after.run_delay - before.run_delay
+        else:
+            tolerance = len(self._cores) / os.sysconf("SC_CLK_TCK")
+            foreign = after.busy_time - before.busy_time - programs - tolerance
+            waiting = 0.0
+
+        return {
+            "foreign_time": max(foreign, 0.0),
+            "run_delay": max(waiting, 0.0),
+            "interrupts": float(after.interrupts - before.interrupts),
+        }
+
+    def is_disturbed(self, metrics: Dict[str, float], duration: float) -> bool:
+        """Check the metrics of a repetition of the given duration against the thresholds"""
+        if duration <= 0:
+            return False
+
+        # A single interrupt per core is tolerated, short repetitions would be flagged otherwise
+        interrupts = self._interrupt_rate * duration * len(self._cores) + len(self._cores)
+
+        return (
+            metrics["foreign_time"] > self._threshold * duration
+            or metrics["run_delay"] > self._threshold * duration
+            or metrics["interrupts"] > interrupts
+        )
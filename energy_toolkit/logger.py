@@ -2,27 +2,49 @@
 Logger class that implements a singleton logger
 """
 
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import queue
 import sys
-from datetime import datetime
+import threading
+import time
 import click
 
 
 class ClickFormatter(logging.Formatter):
     """Custom formatter that styles output similar to click.echo logs"""
 
-    def format(self, record):
-        current_time = datetime.now().strftime("%H:%M:%S")
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The styled timestamp only changes once per second, so cache it per color
+        self._cached_second = None
+        self._cached_prefixes = {}
 
+    def format(self, record):
         # Choose color based on level
         if record.levelno >= logging.ERROR:
-            colored_time = click.style(f"[{current_time}]", fg="red")
+            color = "red"
         elif record.levelno >= logging.WARNING:
-            colored_time = click.style(f"[{current_time}]", fg="yellow")
+            color = "yellow"
         elif record.levelno >= logging.INFO:
-            colored_time = click.style(f"[{current_time}]", fg="blue")
+            color = "blue"
         else:  # DEBUG
-            colored_time = click.style(f"[{current_time}]", fg="green")
+            color = "green"
+
+        # Use the creation time of the record, it might be rendered later
+        second = int(record.created)
+        if second != self._cached_second:
+            self._cached_second = second
+            self._cached_prefixes = {}
+
+        colored_time = self._cached_prefixes.get(color)
+        if colored_time is None:
+            current_time = time.strftime("%H:%M:%S", time.localtime(record.created))
+            colored_time = click.style(f"[{current_time}]", fg=color)
+            self._cached_prefixes[color] = colored_time
 
         # Format base message
         message = super().format(record)
@@ -61,12 +83,151 @@ class SingleLineStreamHandler(logging.StreamHandler):
             self.handleError(record)
 
 
+class JsonLinesHandler(logging.FileHandler):
+    """
+    Handler that writes each record as one JSON object per line. Structured data attached to a
+    record with extra={"event": {...}} is written next to the message
+    """
+
+    def emit(self, record):
+        try:
+            entry = {
+                "time": record.created,
+                "level": record.levelname,
+                "message": record.getMessage(),
+            }
+
+            event = getattr(record, "event", None)
+            if event is not None:
+                entry["event"] = event
+
+            self.stream = self.stream or self._open()
+            # Event objects are serialized by their attributes
+            self.stream.write(json.dumps(entry, default=vars) + "\n")
+            self.flush()
+
+        except Exception: # pylint: disable=broad-exception-caught
+            self.handleError(record)
+
+
+class RecordQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that enqueues records unformatted, so the message is only built by the
+    renderer thread. Exceptions are rendered right away, their tracebacks would change later on
+    """
+
+    _exc_formatter = logging.Formatter()
+
+    def prepare(self, record):
+        if record.exc_info:
+            record = copy.copy(record)
+            if not record.exc_text:
+                record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+
+        return record
+
+
+class LogRenderer(threading.Thread):
+    """
+    Background thread that renders queued records. Same-line progress records are coalesced,
+    only the newest one is written to the terminal and at most refresh_rate times per second.
+    Structured handlers receive every record.
+    """
+
+    _STOP = object()
+
+    def __init__(self, log_queue: queue.SimpleQueue, terminal: logging.Handler, refresh_rate=10.0):
+        super().__init__(name="energy-toolkit-log-renderer", daemon=True)
+        self._queue = log_queue
+        self._terminal = terminal
+        self._structured = []
+        self._interval = 1.0 / refresh_rate
+
+        # Newest progress record that has not been written yet
+        self._pending = None
+        self._last_render = 0.0
+
+    def add_structured_handler(self, handler: logging.Handler) -> None:
+        """Add a handler that receives every record, including pure event records"""
+        self._structured.append(handler)
+
+    def flush(self, timeout=1.0) -> None:
+        """Block until all records queued so far are rendered"""
+        if not self.is_alive():
+            return
+
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def stop(self) -> None:
+        """Render all outstanding records and end the thread"""
+        if self.is_alive():
+            self._queue.put(self._STOP)
+            self.join(1.0)
+
+    def _render_pending(self) -> None:
+        """Write the newest coalesced progress record to the terminal"""
+        if self._pending is not None:
+            self._terminal.handle(self._pending)
+            self._pending = None
+            self._last_render = time.monotonic()
+
+    def _handle(self, record: logging.LogRecord) -> None:
+        """Dispatch a single record to the structured handlers and the terminal"""
+        for handler in self._structured:
+            handler.handle(record)
+
+        if getattr(record, "event_only", False):
+            return
+
+        if getattr(record, "same_line", False):
+            self._pending = record
+            if time.monotonic() - self._last_render >= self._interval:
+                self._render_pending()
+        else:
+            # Show the last progress state before the next regular message
+            self._render_pending()
+            self._terminal.handle(record)
+
+    def run(self):
+        while True:
+            timeout = None
+            if self._pending is not None:
+                timeout = max(0.0, self._last_render + self._interval - time.monotonic())
+
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, logging.LogRecord):
+                self._handle(item)
+                continue
+
+            # Refresh interval elapsed, flush or stop request
+            self._render_pending()
+
+            if item is self._STOP:
+                break
+            if isinstance(item, threading.Event):
+                item.set()
+
+        for handler in self._structured:
+            handler.close()
+
 
 class Logger:
-    """Singleton Logger class with click-style color and same-line updates."""
+    """
+    Singleton Logger class with click-style color and same-line updates.
+    Records are only enqueued on the calling thread, formatting and terminal I/O happen on a
+    background renderer so slow terminals never block a measurement.
+    """
 
     _instance = None
     _logger = None
+    _renderer = None
 
     def __new__(cls):
         if cls._instance is None:
@@ -84,9 +245,26 @@ class Logger:
         formatter = ClickFormatter("%(message)s")
         handler.setFormatter(formatter)
 
+        log_queue = queue.SimpleQueue()
+        self._renderer = LogRenderer(log_queue, handler)
+
         if not self._logger.handlers:
-            self._logger.addHandler(handler)
+            self._logger.addHandler(RecordQueueHandler(log_queue))
+            self._renderer.start()
+            atexit.register(self._renderer.stop)
 
     def get_logger(self):
         """Return logger instance"""
         return self._logger
+
+    def flush(self):
+        """Wait until all records logged so far have been rendered"""
+        self._renderer.flush()
+
+    def enable_event_log(self, path: str) -> None:
+        """Additionally write all records and logged events as JSON lines to the given file"""
+        self._renderer.add_structured_handler(JsonLinesHandler(path, encoding="utf-8"))
+
+    def log_event(self, name: str, event) -> None:
+        """Log a structured event that only ends up in the event log, not on the terminal"""
+        self._logger.debug(name, extra={"event": event, "event_only": True})
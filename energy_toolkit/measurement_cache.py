@@ -0,0 +1,132 @@
+"""
+Measurement cache module.
+Offers a content addressed cache that serves the results of unchanged programs.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Optional
+
+import numpy as np
+
+from energy_toolkit.logger import Logger
+from energy_toolkit.program import FunctionProgram, Program
+from energy_toolkit.util import ToolkitUtil
+
+
+class MeasurementCache:
+    """
+    Cache of measured results keyed by a hash of the executable contents, the arguments, the
+    input file contents, the measurement settings and the host profile. Entries are stored as
+    one .npy file per key. They expire after ttl seconds, and the least recently used entries
+    are evicted once the cache grows beyond max_size bytes.
+    """
+
+    def __init__(self, path: str, ttl: float = None, max_size: int = None):
+        """
+        Create a cache under the given directory. Without ttl entries never expire, without
+        max_size the cache is not limited in size
+        """
+        self._path = path
+        self._ttl = ttl
+        self._max_size = max_size
+        self._logger = Logger().get_logger()
+
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def key(program: Program, parameters: dict) -> str:
+        """
+        Return the cache key of a program measured with the given toolkit parameters. Changes of
+        the executable or the input file change the key even if their paths stay the same.
+        Function programs are keyed by the bytecode of their function
+        """
+        description = program.to_dict()
+        if isinstance(program, FunctionProgram):
+            description["executeable"] = ToolkitUtil.hash_code(program.get_function())
+        else:
+            executeable = shutil.which(program.get_executeable()) or program.get_executeable()
+            description["executeable"] = ToolkitUtil.hash_file(executeable)
+
+        description["input"] = ToolkitUtil.hash_file(program.get_inputfile())
+        description["parameters"] = parameters
+        description["host"] = ToolkitUtil.get_host_profile()
+
+        encoded = json.dumps(description, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _entry(self, key: str) -> str:
+        """Return the path of the entry with the given key"""
+        return os.path.join(self._path, f"{key}.npy")
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Return the cached results of the given key or None if there are no valid results"""
+        entry = self._entry(key)
+
+        try:
+            created = os.stat(entry).st_mtime
+        except FileNotFoundError:
+            return None
+
+        if self._ttl is not None and time.time() - created > self._ttl:
+            self._logger.debug("Cache entry %s expired", key)
+            os.remove(entry)
+            return None
+
+        try:
+            results = np.load(entry, allow_pickle=False)
+        except (OSError, ValueError):
+            self._logger.warning("Cache entry %s is corrupt and will be removed", key)
+            os.remove(entry)
+            return None
+
+        # The access time orders the entries for the size based eviction
+        os.utime(entry, (time.time(), created))
+        return results
+
+    def put(self, key: str, results: np.ndarray) -> None:
+        """Store the results under the given key and evict entries if the cache grew too large"""
+        # Write to a temporary file first, so readers never see partial entries
+        temporary = os.path.join(self._path, f".{key}.{os.getpid()}.npy")
+        np.save(temporary, results, allow_pickle=False)
+        os.replace(temporary, self._entry(key))
+
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove expired entries and the least recently used entries beyond max_size"""
+        now = time.time()
+        entries = []
+
+        for name in os.listdir(self._path):
+            if name.startswith(".") or not name.endswith(".npy"):
+                continue
+
+            entry = os.path.join(self._path, name)
+            stat = os.stat(entry)
+
+            if self._ttl is not None and now - stat.st_mtime > self._ttl:
+                os.remove(entry)
+                continue
+
+            entries.append((stat.st_atime, stat.st_size, entry))
+
+        if self._max_size is None:
+            return
+
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, entry in sorted(entries):
+            if size <= self._max_size:
+                break
+
+            os.remove(entry)
+            size -= entry_size
+
+    def clear(self) -> None:
+        """Remove all entries from the cache"""
+        for name in os.listdir(self._path):
+            if name.endswith(".npy"):
+                os.remove(os.path.join(self._path, name))
@@ -0,0 +1,180 @@
+"""
+Metrics exporter module.
+Offers live instrumentation of a running campaign in the Prometheus text format.
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+from energy_toolkit.energy_toolkit import EnergyToolkit
+from energy_toolkit.events import (
+    DatapointEvent,
+    FailureEvent,
+    ProgramDoneEvent,
+    RepetitionEvent,
+    RetryEvent,
+)
+from energy_toolkit.logger import Logger
+
+
+class MetricsExporter: # pylint: disable=too-many-instance-attributes
+    """
+    Collects campaign metrics through the hooks of an EnergyToolkit and optionally serves them
+    on a local HTTP endpoint that can be scraped by Prometheus
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self, toolkit: EnergyToolkit):
+        """
+        Create a new exporter and register its hooks on the given toolkit
+        """
+        self._toolkit = toolkit
+        self._lock = threading.Lock()
+
+        self._start_time = None
+        self._executions = 0
+        self._retries = 0
+        self._failures: Dict[str, int] = {"failed": 0, "timeout": 0}
+        self._datapoints = 0
+        self._programs_done = 0
+        self._current_program = 0
+        self._mean_power: Dict[int, float] = {}
+
+        self._server = None
+
+        toolkit.register_hook("on_repetition", self._on_repetition)
+        toolkit.register_hook("on_datapoint", self._on_datapoint)
+        toolkit.register_hook("on_program_done", self._on_program_done)
+        toolkit.register_hook("on_retry", self._on_retry)
+        toolkit.register_hook("on_failure", self._on_failure)
+
+    def _on_repetition(self, event: RepetitionEvent) -> None:
+        with self._lock:
+            if self._start_time is None:
+                # Subtract the first execution so the rate is not skewed towards infinity
+                self._start_time = time.monotonic() - event.time
+            self._executions += 1
+            self._current_program = event.program
+
+    def _on_datapoint(self, event: DatapointEvent) -> None:
+        with self._lock:
+            self._datapoints += 1
+            if event.datapoint.time > 0:
+                self._mean_power[event.program] = event.datapoint.energy / event.datapoint.time
+
+    def _on_program_done(self, _event: ProgramDoneEvent) -> None:
+        with self._lock:
+            self._programs_done += 1
+
+    def _on_retry(self, _event: RetryEvent) -> None:
+        with self._lock:
+            self._retries += 1
+
+    def _on_failure(self, event: FailureEvent) -> None:
+        with self._lock:
+            self._failures[event.status] = self._failures.get(event.status, 0) + 1
+
+    def render(self) -> str:
+        """Render the current metrics in the Prometheus text exposition format"""
+        with self._lock:
+            elapsed = 0.0 if self._start_time is None else time.monotonic() - self._start_time
+            throughput = self._executions / elapsed if elapsed > 0 else 0.0
+
+            remaining = max(self._toolkit.get_total_repetitions() - self._executions, 0)
+            eta = remaining / throughput if throughput > 0 else float("nan")
+
+            lines = []
+            self._add_metric(
+                lines, "energy_toolkit_executions", "counter",
+                "Valid repetitions recorded since the start of the campaign", self._executions
+            )
+            self._add_metric(
+                lines, "energy_toolkit_retries", "counter",
+                "Repetitions that were discarded and measured again", self._retries
+            )
+            self._add_metric(
+                lines, "energy_toolkit_datapoints", "counter",
+                "Datapoints recorded since the start of the campaign", self._datapoints
+            )
+            self._add_metric(
+                lines, "energy_toolkit_programs_done", "counter",
+                "Programs that have been measured completely", self._programs_done
+            )
+            self._add_metric(
+                lines, "energy_toolkit_executions_per_second", "gauge",
+                "Average number of valid repetitions per second", throughput
+            )
+            self._add_metric(
+                lines, "energy_toolkit_eta_seconds", "gauge",
+                "Estimated time until the campaign is finished", eta
+            )
+            self._add_metric(
+                lines, "energy_toolkit_current_program", "gauge",
+                "Program id that is currently measured", self._current_program
+            )
+
+            lines.append(
+                "# HELP energy_toolkit_failures_total Executions that failed or timed out"
+            )
+            lines.append("# TYPE energy_toolkit_failures_total counter")
+            for status, count in sorted(self._failures.items()):
+                lines.append(f'energy_toolkit_failures_total{{status="{status}"}} {float(count)!r}')
+
+            lines.append("# HELP energy_toolkit_mean_power_watts Mean power of the last datapoint")
+            lines.append("# TYPE energy_toolkit_mean_power_watts gauge")
+            for pid, power in sorted(self._mean_power.items()):
+                lines.append(f'energy_toolkit_mean_power_watts{{program="{pid}"}} {power!r}')
+
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _add_metric(lines, name, kind, description, value) -> None: # pylint: disable=too-many-arguments,too-many-positional-arguments
+        """Append a single unlabeled metric to the given list of lines"""
+        sample_name = f"{name}_total" if kind == "counter" else name
+
+        lines.append(f"# HELP {sample_name} {description}")
+        lines.append(f"# TYPE {sample_name} {kind}")
+        lines.append(f"{sample_name} {float(value)!r}")
+
+    def start(self, port=9464, host="127.0.0.1") -> None:
+        """Serve the metrics on http://host:port/metrics in a background thread"""
+        exporter = self
+
+        class _MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self): # pylint: disable=invalid-name
+                """Answer scrapes of the metrics endpoint"""
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", MetricsExporter.CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args): # pylint: disable=redefined-builtin
+                # Scrapes should not interfere with the progress output
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+        Logger().get_logger().info(
+            "Serving metrics on http://%s:%d/metrics", host, self._server.server_port
+        )
+
+    def get_port(self) -> int:
+        """Return the port the exporter is listening on"""
+        return self._server.server_port if self._server is not None else 0
+
+    def stop(self) -> None:
+        """Shut the metrics endpoint down"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
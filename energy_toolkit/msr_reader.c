@@ -16,6 +16,17 @@
 #include <sys/mman.h>
 #include <stdio.h>
 #include <sys/stat.h>
+#include <sys/ioctl.h>
+#include <sys/syscall.h>
+#include <string.h>
+#include <errno.h>
+#include <math.h>
+#include <sched.h>
+#include <signal.h>
+#include <stdlib.h>
+#include <time.h>
+#include <sys/wait.h>
+#include <linux/perf_event.h>
 
 /**
  * \brief Read the given msr register file and read at the given offset
@@ -111,9 +122,391 @@ static PyObject* py_read_amd_msr(PyObject* self, PyObject* args) {
     return Py_BuildValue("d", read_val);
 }
 
+/**
+ * \brief Python method to read the raw value of a register of the given msr file
+ *
+ * \param self Python object
+ * \param args Python arguments (registerpath, offset)
+ * \return PyObject* Python integer with the register value
+ */
+static PyObject* py_read_msr(PyObject* self, PyObject* args) {
+    const char *registerpath;
+    uint32_t offset;
+
+    if (!PyArg_ParseTuple(args, "sI", &registerpath, &offset)) {
+        return NULL;
+    }
+
+    uint64_t value = read_msr(registerpath, offset);
+    if (PyErr_Occurred()) {
+        return NULL;
+    }
+
+    return PyLong_FromUnsignedLongLong(value);
+}
+
+/**
+ * \brief Python method to write the raw value of a register of the given msr file. The msr
+ * driver rejects writes to registers that are locked or read only
+ *
+ * \param self Python object
+ * \param args Python arguments (registerpath, offset, value)
+ * \return PyObject* None
+ */
+static PyObject* py_write_msr(PyObject* self, PyObject* args) {
+    const char *registerpath;
+    uint32_t offset;
+    unsigned long long value;
+
+    if (!PyArg_ParseTuple(args, "sIK", &registerpath, &offset, &value)) {
+        return NULL;
+    }
+
+    int fd = open(registerpath, O_WRONLY);
+    if (fd < 0) {
+        return PyErr_SetFromErrnoWithFilename(PyExc_OSError, registerpath);
+    }
+
+    uint64_t raw = value;
+    if (pwrite(fd, &raw, sizeof(raw), offset) != sizeof(raw)) {
+        int error = errno != 0 ? errno : EIO;
+        close(fd);
+        errno = error;
+        return PyErr_SetFromErrnoWithFilename(PyExc_OSError, registerpath);
+    }
+
+    close(fd);
+    Py_RETURN_NONE;
+}
+
+/**
+ * \brief Python method to open a perf event counter for a process and all children it creates
+ * afterwards. Counters of the calling thread (pid 0) start counting immediately, counters of
+ * another process can be held back until that process calls exec.
+ * 
+ * \param self Python object
+ * \param args Python arguments (type, config, group_fd, exclude_kernel, pid, enable_on_exec)
+ * \return PyObject* Python integer with the file descriptor of the counter
+ */
+static PyObject* py_perf_open(PyObject* self, PyObject* args) {
+    unsigned int type;
+    unsigned long long config;
+    int group_fd = -1;
+    int exclude_kernel = 0;
+    int pid = 0;
+    int enable_on_exec = 0;
+
+    if (!PyArg_ParseTuple(args, "IK|ipip", &type, &config, &group_fd, &exclude_kernel, &pid,
+                          &enable_on_exec)) {
+        return NULL;
+    }
+
+    struct perf_event_attr attr;
+    memset(&attr, 0, sizeof(attr));
+    attr.size = sizeof(attr);
+    attr.type = type;
+    attr.config = config;
+    // Children inherit the counter, their counts are added once they are reaped
+    attr.inherit = 1;
+    attr.exclude_hv = 1;
+    attr.exclude_kernel = exclude_kernel;
+    // Count only the executed program, not the launcher that forked it
+    attr.disabled = enable_on_exec;
+    attr.enable_on_exec = enable_on_exec;
+    attr.read_format = PERF_FORMAT_TOTAL_TIME_ENABLED | PERF_FORMAT_TOTAL_TIME_RUNNING;
+
+    int fd = (int)syscall(__NR_perf_event_open, &attr, pid, -1, group_fd, 0);
+    if (fd < 0) {
+        PyErr_SetFromErrno(PyExc_OSError);
+        return NULL;
+    }
+
+    return Py_BuildValue("i", fd);
+}
+
+/**
+ * \brief Python method to read a counter opened with perf_open
+ * 
+ * \param self Python object
+ * \param args Python arguments (fd)
+ * \return PyObject* Tuple of the counter value, time enabled and time running
+ */
+static PyObject* py_perf_read(PyObject* self, PyObject* args) {
+    int fd;
+    uint64_t values[3] = {0, 0, 0};
+
+    if (!PyArg_ParseTuple(args, "i", &fd)) {
+        return NULL;
+    }
+
+    if (read(fd, values, sizeof(values)) != sizeof(values)) {
+        PyErr_SetString(PyExc_OSError, "Failed to read perf event counter");
+        return NULL;
+    }
+
+    return Py_BuildValue("(KKK)", (unsigned long long)values[0],
+                         (unsigned long long)values[1], (unsigned long long)values[2]);
+}
+
+/**
+ * \brief Return the current CLOCK_MONOTONIC_RAW time in seconds
+ */
+static inline double monotonic_raw(void) {
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC_RAW, &ts);
+    return (double)ts.tv_sec + (double)ts.tv_nsec * 1e-9;
+}
+
+/**
+ * \brief Read a register from an already opened msr file
+ *
+ * \param fd File descriptor of the msr file
+ * \param offset Offset defining the register that should be read
+ * \param value Read register value
+ * \return int 0 on success, -1 with errno set otherwise
+ */
+static inline int pread_msr(int fd, uint32_t offset, uint64_t *value) {
+    if (pread(fd, value, sizeof(*value), offset) != sizeof(*value)) {
+        if (errno == 0) {
+            errno = EIO;
+        }
+        return -1;
+    }
+    return 0;
+}
+
+/**
+ * \brief Free a NULL terminated argument vector
+ */
+static void free_argv(char **argv) {
+    if (argv == NULL) {
+        return;
+    }
+    for (char **arg = argv; *arg != NULL; arg++) {
+        free(*arg);
+    }
+    free(argv);
+}
+
+/**
+ * \brief Copy a Python sequence of strings into a NULL terminated argument vector. The copy stays
+ * valid while the GIL is released
+ */
+static char **copy_argv(PyObject *sequence) {
+    PyObject *items = PySequence_Fast(sequence, "argv has to be a sequence of strings");
+    if (items == NULL) {
+        return NULL;
+    }
+
+    Py_ssize_t count = PySequence_Fast_GET_SIZE(items);
+    char **argv = calloc(count + 1, sizeof(char *));
+    if (argv == NULL) {
+        Py_DECREF(items);
+        PyErr_NoMemory();
+        return NULL;
+    }
+
+    for (Py_ssize_t i = 0; i < count; i++) {
+        const char *arg = PyUnicode_AsUTF8(PySequence_Fast_GET_ITEM(items, i));
+        if (arg == NULL || (argv[i] = strdup(arg)) == NULL) {
+            if (arg != NULL) {
+                PyErr_NoMemory();
+            }
+            Py_DECREF(items);
+            free_argv(argv);
+            return NULL;
+        }
+    }
+
+    Py_DECREF(items);
+    return argv;
+}
+
+/**
+ * \brief Python method to measure repeated executions of a program without returning to Python.
+ * Each repetition reads CLOCK_MONOTONIC_RAW and the energy register back-to-back, spawns the
+ * program pinned to the core and reaps it natively. The msr file stays open for all repetitions.
+ * Repetitions without a change of the energy register are measured again, a counter wrap between
+ * both reads is corrected. The GIL is released while measuring.
+ *
+ * \param self Python object
+ * \param args Python arguments (registerpath, energyreg, unitreg, path, argv, core, inputfile,
+ * energies, times). energies and times are writable buffers of doubles, one value per repetition
+ * \return PyObject* Tuple of the measured repetitions, the exit code of the failed execution that
+ * stopped the measurement (0 if all repetitions were measured) and the number of retries
+ */
+static PyObject* py_measure_exec(PyObject* self, PyObject* args) {
+    const char *registerpath;
+    unsigned int energyreg;
+    unsigned int unitreg;
+    const char *path;
+    PyObject *argv_obj;
+    int core;
+    const char *inputfile;
+    Py_buffer energies;
+    Py_buffer times;
+
+    if (!PyArg_ParseTuple(args, "sIIsOisw*w*", &registerpath, &energyreg, &unitreg, &path,
+                          &argv_obj, &core, &inputfile, &energies, &times)) {
+        return NULL;
+    }
+
+    PyObject *result = NULL;
+    char **argv = NULL;
+    int msr_fd = -1;
+    int in_fd = -1;
+    int null_fd = -1;
+
+    if (energies.itemsize != sizeof(double) || times.itemsize != sizeof(double)) {
+        PyErr_SetString(PyExc_ValueError, "energies and times have to be buffers of doubles");
+        goto cleanup;
+    }
+
+    argv = copy_argv(argv_obj);
+    if (argv == NULL) {
+        goto cleanup;
+    }
+
+    // The measured programs must not inherit the msr descriptor. The input is dup2'd onto
+    // stdin and closed by the child itself
+    msr_fd = open(registerpath, O_RDONLY | O_CLOEXEC);
+    null_fd = open("/dev/null", O_RDWR | O_CLOEXEC);
+    in_fd = inputfile[0] != '\0' ? open(inputfile, O_RDONLY) : dup(null_fd);
+    if (msr_fd < 0 || null_fd < 0 || in_fd < 0) {
+        PyErr_SetFromErrno(PyExc_OSError);
+        goto cleanup;
+    }
+
+    uint64_t unit;
+    if (pread_msr(msr_fd, unitreg, &unit) < 0) {
+        PyErr_SetFromErrno(PyExc_OSError);
+        goto cleanup;
+    }
+    double joule_per_unit = pow(0.5, (unit >> 8) & 0x1F);
+
+    Py_ssize_t count = energies.len / (Py_ssize_t)sizeof(double);
+    if (times.len / (Py_ssize_t)sizeof(double) < count) {
+        count = times.len / (Py_ssize_t)sizeof(double);
+    }
+    double *energy_out = energies.buf;
+    double *time_out = times.buf;
+
+    cpu_set_t mask;
+    CPU_ZERO(&mask);
+    CPU_SET(core, &mask);
+
+    Py_ssize_t measured = 0;
+    unsigned long retries = 0;
+    int returncode = 0;
+    int error = 0;
+
+    Py_BEGIN_ALLOW_THREADS
+
+    // Block signals while the child shares our memory, the child restores the mask
+    sigset_t all, previous;
+    sigfillset(&all);
+    pthread_sigmask(SIG_SETMASK, &all, &previous);
+
+    while (measured < count) {
+        uint64_t energy_before, energy_after;
+        int status;
+
+        if (inputfile[0] != '\0' && lseek(in_fd, 0, SEEK_SET) < 0) {
+            error = errno;
+            break;
+        }
+
+        double time_before = monotonic_raw();
+        if (pread_msr(msr_fd, energyreg, &energy_before) < 0) {
+            error = errno;
+            break;
+        }
+
+        pid_t pid = vfork();
+        if (pid == 0) {
+            // Only async-signal-safe calls until the exec
+            sigprocmask(SIG_SETMASK, &previous, NULL);
+            sched_setaffinity(0, sizeof(mask), &mask);
+            dup2(in_fd, STDIN_FILENO);
+            dup2(null_fd, STDOUT_FILENO);
+            dup2(null_fd, STDERR_FILENO);
+            if (in_fd > STDERR_FILENO) {
+                close(in_fd);
+            }
+            // dup2 onto itself keeps the close-on-exec flag
+            if (null_fd <= STDERR_FILENO) {
+                fcntl(null_fd, F_SETFD, 0);
+            }
+            execv(path, argv);
+            _exit(127);
+        }
+        if (pid < 0) {
+            error = errno;
+            break;
+        }
+
+        while (waitpid(pid, &status, 0) < 0 && errno == EINTR) {
+        }
+
+        if (pread_msr(msr_fd, energyreg, &energy_after) < 0) {
+            error = errno;
+            break;
+        }
+        double time_after = monotonic_raw();
+
+        if (!WIFEXITED(status) || WEXITSTATUS(status) != 0) {
+            returncode = WIFEXITED(status) ? WEXITSTATUS(status) : -WTERMSIG(status);
+            break;
+        }
+
+        // The energy status registers are 32 bit wide
+        uint64_t delta = (energy_after - energy_before) & 0xFFFFFFFFULL;
+        if (delta == 0) {
+            retries++;
+            continue;
+        }
+
+        energy_out[measured] = (double)delta * joule_per_unit;
+        time_out[measured] = time_after - time_before;
+        measured++;
+    }
+
+    pthread_sigmask(SIG_SETMASK, &previous, NULL);
+
+    Py_END_ALLOW_THREADS
+
+    if (error != 0) {
+        errno = error;
+        PyErr_SetFromErrno(PyExc_OSError);
+        goto cleanup;
+    }
+
+    result = Py_BuildValue("(nik)", measured, returncode, retries);
+
+cleanup:
+    if (msr_fd >= 0) {
+        close(msr_fd);
+    }
+    if (in_fd >= 0) {
+        close(in_fd);
+    }
+    if (null_fd >= 0) {
+        close(null_fd);
+    }
+    free_argv(argv);
+    PyBuffer_Release(&energies);
+    PyBuffer_Release(&times);
+    return result;
+}
+
 static PyMethodDef MsrMethods[] = {
     {"read_amd_msr", py_read_amd_msr, METH_VARARGS, "Read AMD MSR values"},
     {"read_intel_msr", py_read_intel_msr, METH_VARARGS, "Read AMD MSR values"},
+    {"read_msr", py_read_msr, METH_VARARGS, "Read the raw value of an MSR"},
+    {"write_msr", py_write_msr, METH_VARARGS, "Write the raw value of an MSR"},
+    {"perf_open", py_perf_open, METH_VARARGS, "Open an inherited perf event counter of a process"},
+    {"perf_read", py_perf_read, METH_VARARGS, "Read a perf event counter"},
+    {"measure_exec", py_measure_exec, METH_VARARGS, "Measure repeated program executions"},
     {NULL, NULL, 0, NULL}
 };
 
@@ -0,0 +1,124 @@
+"""
+Performance counter module.
+Offers access to perf_event counters of the measured programs.
+"""
+
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from energy_toolkit import msr_reader
+from energy_toolkit.logger import Logger
+
+# Event types and configs from linux/perf_event.h
+PERF_TYPE_HARDWARE = 0
+PERF_TYPE_SOFTWARE = 1
+
+
+class PerfCounters:
+    """
+    Set of perf_event counters of a single execution, inherited by every child the measured
+    process starts. Hardware events are opened as one group, so they are always scheduled
+    together. Events that are not available on the system (e.g. hardware events inside a VM) are
+    skipped, the software events act as fallback.
+
+    Counters of a started child are opened before it executes the program and only start
+    counting with the exec, like perf stat does. The toolkit, the fork and the launcher are
+    therefore not counted. Counters of the calling thread (pid 0) count immediately.
+    """
+
+    # Supported events: name -> (type, config)
+    EVENTS: Dict[str, Tuple[int, int]] = {
+        "instructions": (PERF_TYPE_HARDWARE, 1),
+        "cycles": (PERF_TYPE_HARDWARE, 0),
+        "task_clock": (PERF_TYPE_SOFTWARE, 1),
+        "context_switches": (PERF_TYPE_SOFTWARE, 3),
+        "cpu_migrations": (PERF_TYPE_SOFTWARE, 4),
+    }
+
+    # Events that failed to open, they are not tried again for later executions
+    _unavailable = set()
+
+    def __init__(self, events: List[str] = None, pid: int = 0):
+        """
+        Open the given events for the process with the given pid, which has not executed the
+        measured program yet, or for the calling thread. If no events are given all supported
+        events are opened
+        """
+        self._names: List[str] = []
+        self._fds: List[int] = []
+
+        leader = -1
+        for name in events if events is not None else list(self.EVENTS):
+            if name not in self.EVENTS:
+                raise ValueError(f"Unknown perf event '{name}'")
+
+            if name in PerfCounters._unavailable:
+                continue
+
+            event_type, config = self.EVENTS[name]
+            group_fd = leader if event_type == PERF_TYPE_HARDWARE else -1
+
+            try:
+                fd = self._open(event_type, config, group_fd, pid)
+            except OSError as e:
+                Logger().get_logger().debug("Perf event %s not available: %s", name, e)
+                PerfCounters._unavailable.add(name)
+                continue
+
+            if event_type == PERF_TYPE_HARDWARE and leader == -1:
+                leader = fd
+
+            self._names.append(name)
+            self._fds.append(fd)
+
+    @staticmethod
+    def _open(event_type: int, config: int, group_fd: int, pid: int) -> int:
+        """Open a counter, fall back to user space only counting if kernel counting is denied"""
+        try:
+            return msr_reader.perf_open(event_type, config, group_fd, False, pid, pid != 0)
+        except PermissionError:
+            return msr_reader.perf_open(event_type, config, group_fd, True, pid, pid != 0)
+
+    def get_names(self) -> List[str]:
+        """Return the names of the successfully opened events"""
+        return self._names
+
+    def read(self) -> np.ndarray:
+        """
+        Read all counters. Returns an array of shape (events, 3) holding the raw value,
+        the time enabled and the time running of each counter
+        """
+        counts = [msr_reader.perf_read(fd) for fd in self._fds]
+        return np.array(counts, dtype=float).reshape(-1, 3)
+
+    @staticmethod
+    def delta(before: np.ndarray, after: np.ndarray) -> np.ndarray:
+        """
+        Calculate the counts between two reads. Counts are scaled up if the kernel had to
+        multiplex the counters in between
+        """
+        diff = after - before
+        enabled = diff[:, 1]
+        running = diff[:, 2]
+
+        scale = np.divide(enabled, running, out=np.ones_like(enabled), where=running > 0)
+        return diff[:, 0] * np.maximum(scale, 1.0)
+
+    def metrics(self, before: np.ndarray, after: np.ndarray) -> Dict[str, float]:
+        """Return the counts between two reads keyed by the event names"""
+        return dict(zip(self._names, self.delta(before, after).tolist()))
+
+    def counts(self) -> Dict[str, float]:
+        """Return the counts since the counters were enabled keyed by the event names"""
+        after = self.read()
+        return self.metrics(np.zeros_like(after), after)
+
+    def close(self) -> None:
+        """Close all opened counters"""
+        for fd in self._fds:
+            os.close(fd)
+
+        self._fds = []
+        self._names = []
@@ -2,18 +2,24 @@
 Plotter module to plot data recorded with the energy-toolkit application
 """
 
-from typing import Dict, List
+from typing import Dict, List, Tuple
+import asyncio
 import csv
 import os
 from pathlib import Path
 from datetime import datetime
 
 import click
+import kaleido
 import numpy as np
 import plotly.graph_objects as go
+from plotly.colors import DEFAULT_PLOTLY_COLORS
 from plotly.subplots import make_subplots
 
 from energy_toolkit.logger import Logger
+from energy_toolkit.profiler import EnergyProfile
+from energy_toolkit.result_store import StoredRun
+from energy_toolkit.scaling import ScalingAnalysis, ScalingFit
 from energy_toolkit.util import PlotMode
 
 
@@ -29,6 +35,13 @@ class Plotter:
     # Mode to handle bar/line chart plotting
     _mode: PlotMode
 
+    # Optional labels of the programs, e.g. of runs queried from a result store
+    _labels: List[str] = None
+
+    # Size of exported figures in pixels
+    WIDTH = 1000
+    HEIGHT = 520
+
     # Class logger
     _logger = Logger().get_logger()
 
@@ -54,6 +67,37 @@ class Plotter:
                 " folders that each at least contain a results.csv"
             )
 
+    @classmethod
+    def from_runs(cls, runs: List[StoredRun], mode: PlotMode) -> "Plotter":
+        """
+        Create a plotter for runs queried from a result store instead of a result folder
+        """
+        if mode is PlotMode.UNDEFINED:
+            raise click.ClickException("Mode is undefined!")
+        if not runs:
+            raise click.ClickException("The query did not match any stored runs.")
+
+        # Use the column names of a parsed results.csv file
+        return cls.from_data(
+            [{"# Time": run.columns["time"], "Energy": run.columns["energy"]} for run in runs],
+            mode,
+            [run.get_label() for run in runs],
+        )
+
+    @classmethod
+    def from_data(
+        cls, data: List[Dict[str, np.ndarray]], mode: PlotMode, labels: List[str] = None
+    ) -> "Plotter":
+        """
+        Create a plotter for already parsed data. Each entry holds the "# Time" and "Energy"
+        columns of one program
+        """
+        plotter = cls.__new__(cls)
+        plotter._mode = mode
+        plotter.data = data
+        plotter._labels = labels
+        return plotter
+
     def _read_data(self, base_path: str) -> List[Dict[str, np.ndarray]]:
         """
         Read the results data from the given path
@@ -67,7 +111,7 @@ class Plotter:
             results_file = os.path.join(subfolder, "results.csv")
 
             # Filter out folders not meeting our requirements
-            if not os.path.isdir(subfolder):
+            if not entry.isdigit() or not os.path.isdir(subfolder):
                 continue
             if not os.path.exists(results_file):
                 continue
@@ -98,6 +142,7 @@ class Plotter:
 
         - There should be a folder for each executed program
         - Each folder should contain a results.csv file
+        - Other folders, e.g. exported figures, are ignored
 
         E.g:
         ├── 0
@@ -115,49 +160,132 @@ class Plotter:
             return False
 
         # Check directory not empty (has at least one item)
-        subdirs = [p for p in base.iterdir() if p.is_dir()]
+        subdirs = [p for p in base.iterdir() if p.is_dir() and p.name.isdigit()]
         if not subdirs:
             return False
 
-        # Every subdir must contain at least one result.csv file
+        # Every subdir must contain at least one result.csv file. Skipped programs only leave
+        # their outcomes.csv behind and are ignored
         for sd in subdirs:
             # Check exactly one level deep
-            if not (sd / "results.csv").exists():
+            if not (sd / "results.csv").exists() and not (sd / "outcomes.csv").exists():
                 return False
 
-        return True
+        return any((sd / "results.csv").exists() for sd in subdirs)
 
     def plot(self, path="results", headless=False):
         """
         Plot the data stored in the object. If headless is true the plot will be saved as .pdf file,
-        otherwise plotlys web rendering is used.
+        otherwise plotlys web rendering is used. Files are written to the given path.
         """
 
-        fig = None
-
-        # Check the mode stored in the object and call the respective plotting function
-        if self._mode == PlotMode.BARCHART:
-            fig = self._plot_bars(self.data)
-        elif self._mode == PlotMode.LINECHART:
-            fig = self._plot_lines(self.data)
-        else:
-            raise click.ClickException("Mode is undefined!")
+        fig = self.create_figure(self._mode)
 
         # If headless is true safe as pdf file. Otherwise just call show()
+        current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
         if headless:
-            current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-            fig.write_image(f"figure_{current_time}.pdf", width=1000, height=520)
+            filename = os.path.join(path, f"figure_{current_time}.pdf")
+            fig.write_image(filename, width=self.WIDTH, height=self.HEIGHT)
         else:
-            current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{path}/figure_{current_time}.html"
+            filename = os.path.join(path, f"figure_{current_time}.html")
             fig.write_html(filename)
 
+    def create_figure(self, mode: PlotMode) -> go.Figure:
+        """Create the figure of the given mode for the data stored in the object"""
+        # Check the mode and call the respective plotting function
+        if mode == PlotMode.BARCHART:
+            return self._plot_bars(self.data)
+        if mode == PlotMode.LINECHART:
+            return self._plot_lines(self.data)
+        if mode == PlotMode.HISTOGRAM:
+            return self._plot_histograms(self.data)
+        if mode == PlotMode.ECDF:
+            return self._plot_ecdfs(self.data)
+        if mode == PlotMode.VIOLIN:
+            return self._plot_violins(self.data)
+
+        raise click.ClickException("Mode is undefined!")
+
+    def _select(self, index: int) -> "Plotter":
+        """Return a plotter holding only the program at the given index"""
+        labels = self._labels or [f"Program {i+1}" for i in range(len(self.data))]
+
+        return Plotter.from_data([self.data[index]], self._mode, [labels[index]])
+
+    def export( # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        path: str,
+        modes: List[PlotMode] = None,
+        formats: List[str] = None,
+        per_program=False,
+        parallel=1,
+    ) -> List[str]:
+        """
+        Export figures of several chart modes in several formats (pdf, svg, png) into the given
+        folder. With per_program an additional figure is exported for every single program.
+        All figures are rendered by one kaleido session with parallel browser tabs, so the browser
+        startup is only paid once. Returns the paths of the written files
+        """
+        modes = modes or [self._mode]
+        formats = formats or ["pdf"]
+
+        if any(mode is PlotMode.UNDEFINED for mode in modes):
+            raise click.ClickException("Mode is undefined!")
+
+        os.makedirs(path, exist_ok=True)
+
+        # Figures are named <mode>_all.<format> and <mode>_<program>.<format>
+        selections = [("all", self)]
+        if per_program:
+            selections += [(str(i), self._select(i)) for i in range(len(self.data))]
+
+        jobs = []
+        for mode in modes:
+            for name, plotter in selections:
+                fig = plotter.create_figure(mode).to_dict()
+                for fmt in formats:
+                    jobs.append(
+                        {
+                            "fig": fig,
+                            "path": os.path.join(path, f"{mode.name.lower()}_{name}.{fmt}"),
+                            "opts": {"format": fmt, "width": self.WIDTH, "height": self.HEIGHT},
+                        }
+                    )
+
+        # Kaleido does not tell which figure an error belongs to, so failed figures are found
+        # by their missing files
+        for job in jobs:
+            if os.path.exists(job["path"]):
+                os.remove(job["path"])
+
+        self._logger.debug("Exporting %d figures...", len(jobs))
+        errors = asyncio.run(self._render(jobs, parallel))
+
+        if errors:
+            failed = [job["path"] for job in jobs if not os.path.exists(job["path"])]
+            raise click.ClickException(
+                f"{len(errors)} of {len(jobs)} figures could not be exported "
+                f"({', '.join(failed)}): {errors[0]}"
+            )
+
+        return [job["path"] for job in jobs]
+
+    @staticmethod
+    async def _render(jobs: List[dict], parallel: int) -> tuple:
+        """Render all export jobs in one kaleido session. Returns the errors of failed jobs"""
+        try:
+            async with kaleido.Kaleido(n=parallel) as session:
+                return await session.write_fig_from_object(jobs, cancel_on_error=False)
+        except RuntimeError as e:
+            # Raised by kaleido if no Chrome or Chromium installation could be found
+            raise click.ClickException(f"Exporting figures failed: {e}") from e
+
     def _plot_lines(self, data) -> go.Figure:
         """
         Function to create a figure object that shows the raw data of each programs energy and time
         as line chart respectively.
         """
-        labels = [f"PID {i+1}" for i in range(len(data))]
+        labels = self._labels or [f"PID {i+1}" for i in range(len(data))]
 
         # One figure, two subplots stacked vertically
         fig = make_subplots(
@@ -196,7 +324,7 @@ class Plotter:
         Function to create a figure object that shows the mean of each program's 
         energy and time as bar charts, with standard deviation error bars.
         """
-        labels = [f"Program {i+1}" for i in range(len(data))]
+        labels = self._labels or [f"Program {i+1}" for i in range(len(data))]
 
         avg_times = [float(np.mean(d["# Time"])) for d in data]
         avg_energy = [float(np.mean(d["Energy"])) for d in data]
@@ -244,3 +372,340 @@ class Plotter:
         fig.update_yaxes(title_text="Energy", row=1, col=2)
 
         return fig
+
+    @staticmethod
+    def _histogram(values: np.ndarray, bins: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Bin the values into equally wide bins. Returns the bin centers and the density of each
+        bin. Constant values end up in a single bin
+        """
+        low, high = float(np.min(values)), float(np.max(values))
+        if low == high:
+            return np.array([low]), np.array([1.0])
+
+        density, edges = np.histogram(values, bins=bins, range=(low, high), density=True)
+        return (edges[:-1] + edges[1:]) / 2.0, density
+
+    @staticmethod
+    def _kde(values: np.ndarray, grid_size=256) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Binned Gaussian kernel density estimate. The values are binned onto a regular grid first
+        and the bin counts are convolved with the kernel, so the cost grows with the grid size
+        instead of the number of samples. Uses Silverman's rule of thumb as bandwidth
+        """
+        n = len(values)
+        q25, q75 = np.percentile(values, [25, 75])
+        spread = min(float(np.std(values)), float(q75 - q25) / 1.34) or float(np.std(values))
+        bandwidth = 0.9 * spread * n ** (-0.2)
+
+        if bandwidth <= 0:
+            return Plotter._histogram(values, 1)
+
+        # Extend the grid by three bandwidths, so the tails of the kernel are not cut off
+        low = float(np.min(values)) - 3 * bandwidth
+        high = float(np.max(values)) + 3 * bandwidth
+        counts, edges = np.histogram(values, bins=grid_size, range=(low, high))
+        step = edges[1] - edges[0]
+
+        reach = min(int(np.ceil(4 * bandwidth / step)), grid_size - 1)
+        offsets = np.arange(-reach, reach + 1) * step
+        kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2)
+
+        density = np.convolve(counts, kernel, mode="same") / (n * bandwidth * np.sqrt(2 * np.pi))
+        return (edges[:-1] + edges[1:]) / 2.0, density
+
+    @staticmethod
+    def _ecdf(values: np.ndarray, bins=512) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Empirical cumulative distribution function evaluated at the upper edges of fine bins
+        """
+        low, high = float(np.min(values)), float(np.max(values))
+        if low == high:
+            return np.array([low]), np.array([1.0])
+
+        counts, edges = np.histogram(values, bins=bins, range=(low, high))
+        cumulative = np.cumsum(counts) / len(values)
+        return np.concatenate(([low], edges[1:])), np.concatenate(([0.0], cumulative))
+
+    def _distribution_figure(self, data) -> Tuple[go.Figure, List[str], List[str]]:
+        """
+        Create the shared energy/time subplot figure of the distribution charts. Returns the
+        figure, the program labels and one color per program
+        """
+        labels = self._labels or [f"Program {i+1}" for i in range(len(data))]
+        colors = [
+            DEFAULT_PLOTLY_COLORS[i % len(DEFAULT_PLOTLY_COLORS)] for i in range(len(data))
+        ]
+
+        fig = make_subplots(
+            rows=1, cols=2, subplot_titles=("Energy distribution", "Time distribution")
+        )
+        fig.update_layout(
+            showlegend=True, autosize=True, margin={"l": 20, "r": 20, "t": 40, "b": 20}
+        )
+
+        return fig, labels, colors
+
+    def _plot_histograms(self, data, bins=100) -> go.Figure:
+        """
+        Function to create a figure object that shows the binned distribution of each program's
+        energy and time as histogram with a kernel density estimate on top
+        """
+        fig, labels, colors = self._distribution_figure(data)
+
+        for i, d in enumerate(data):
+            for col, column in enumerate(("Energy", "# Time"), start=1):
+                centers, density = self._histogram(d[column], bins)
+                grid, kde = self._kde(d[column])
+                width = centers[1] - centers[0] if len(centers) > 1 else None
+
+                fig.add_trace(
+                    go.Bar(
+                        x=centers,
+                        y=density,
+                        width=width,
+                        name=labels[i],
+                        legendgroup=labels[i],
+                        showlegend=col == 1,
+                        marker={"color": colors[i]},
+                        opacity=0.5,
+                    ),
+                    row=1,
+                    col=col,
+                )
+                fig.add_trace(
+                    go.Scatter(
+                        x=grid,
+                        y=kde,
+                        mode="lines",
+                        name=f"{labels[i]} KDE",
+                        legendgroup=labels[i],
+                        showlegend=False,
+                        line={"color": colors[i]},
+                    ),
+                    row=1,
+                    col=col,
+                )
+
+        fig.update_layout(barmode="overlay", bargap=0)
+        fig.update_xaxes(title_text="Energy", row=1, col=1)
+        fig.update_xaxes(title_text="Time", row=1, col=2)
+        fig.update_yaxes(title_text="Density")
+
+        return fig
+
+    def _plot_ecdfs(self, data) -> go.Figure:
+        """
+        Function to create a figure object that shows the empirical cumulative distribution of
+        each program's energy and time
+        """
+        fig, labels, colors = self._distribution_figure(data)
+
+        for i, d in enumerate(data):
+            for col, column in enumerate(("Energy", "# Time"), start=1):
+                x, cumulative = self._ecdf(d[column])
+
+                fig.add_trace(
+                    go.Scatter(
+                        x=x,
+                        y=cumulative,
+                        mode="lines",
+                        line={"shape": "hv", "color": colors[i]},
+                        name=labels[i],
+                        legendgroup=labels[i],
+                        showlegend=col == 1,
+                    ),
+                    row=1,
+                    col=col,
+                )
+
+        fig.update_xaxes(title_text="Energy", row=1, col=1)
+        fig.update_xaxes(title_text="Time", row=1, col=2)
+        fig.update_yaxes(title_text="Cumulative share", range=[0, 1])
+
+        return fig
+
+    def _plot_violins(self, data) -> go.Figure:
+        """
+        Function to create a figure object that shows violins of each program's energy and time.
+        The outlines are drawn from the kernel density estimate and the quartiles are marked,
+        so no raw samples are sent to plotly
+        """
+        fig, labels, colors = self._distribution_figure(data)
+
+        for i, d in enumerate(data):
+            for col, column in enumerate(("Energy", "# Time"), start=1):
+                grid, density = self._kde(d[column])
+                quartiles = np.percentile(d[column], [25, 50, 75])
+
+                # Each violin is half a unit wide on both sides of its position
+                half_width = 0.4 * density / density.max()
+
+                fig.add_trace(
+                    go.Scatter(
+                        x=np.concatenate((i - half_width, (i + half_width)[::-1])),
+                        y=np.concatenate((grid, grid[::-1])),
+                        fill="toself",
+                        mode="lines",
+                        line={"color": colors[i]},
+                        name=labels[i],
+                        legendgroup=labels[i],
+                        showlegend=col == 1,
+                    ),
+                    row=1,
+                    col=col,
+                )
+                fig.add_trace(
+                    go.Scatter(
+                        x=[i, i, i],
+                        y=quartiles,
+                        mode="markers",
+                        marker={"color": "white", "line": {"color": colors[i], "width": 1}},
+                        name=f"{labels[i]} quartiles",
+                        legendgroup=labels[i],
+                        showlegend=False,
+                    ),
+                    row=1,
+                    col=col,
+                )
+
+        fig.update_xaxes(tickmode="array", tickvals=list(range(len(data))), ticktext=labels)
+        fig.update_yaxes(title_text="Energy", row=1, col=1)
+        fig.update_yaxes(title_text="Time", row=1, col=2)
+
+        return fig
+
+    @staticmethod
+    def create_scaling_figure(
+        sizes: np.ndarray, values: Dict[str, np.ndarray], fits: Dict[str, List[ScalingFit]]
+    ) -> go.Figure:
+        """
+        Create a figure showing the measured values of each metric over the input size on
+        logarithmic axes, the fitted models and the prediction of the best model with its
+        bootstrap interval. A second row shows the measured value per input element
+        """
+        metrics = list(values)
+        units = {"energy": "J", "time": "s"}
+        fig = make_subplots(
+            rows=2,
+            cols=len(metrics),
+            subplot_titles=[f"{m.capitalize()} over input size" for m in metrics]
+            + [f"{m.capitalize()} per element" for m in metrics],
+        )
+
+        for col, metric in enumerate(metrics, start=1):
+            best = fits[metric][0]
+            unit = units.get(metric, "")
+            grid = np.geomspace(np.min(sizes), best.size, 200)
+
+            fig.add_trace(
+                go.Scatter(
+                    x=sizes,
+                    y=values[metric],
+                    mode="markers",
+                    marker={"color": DEFAULT_PLOTLY_COLORS[0], "opacity": 0.5},
+                    name="Measured",
+                    showlegend=col == 1,
+                ),
+                row=1,
+                col=col,
+            )
+
+            for i, fit in enumerate(fits[metric]):
+                fig.add_trace(
+                    go.Scatter(
+                        x=grid,
+                        y=fit.evaluate(grid),
+                        mode="lines",
+                        line={
+                            "color": DEFAULT_PLOTLY_COLORS[(i + 1) % len(DEFAULT_PLOTLY_COLORS)],
+                            "dash": "solid" if fit is best else "dot",
+                        },
+                        name=f"{fit.model} (R² {fit.r_squared:.3f})",
+                        legendgroup=fit.model,
+                        showlegend=col == 1,
+                    ),
+                    row=1,
+                    col=col,
+                )
+
+            fig.add_trace(
+                go.Scatter(
+                    x=[best.size],
+                    y=[best.prediction],
+                    mode="markers",
+                    marker={"symbol": "diamond", "size": 10, "color": "black"},
+                    error_y={
+                        "type": "data",
+                        "symmetric": False,
+                        "array": [best.ci_high - best.prediction],
+                        "arrayminus": [best.prediction - best.ci_low],
+                    },
+                    name=f"Prediction at n={best.size}",
+                    showlegend=col == 1,
+                ),
+                row=1,
+                col=col,
+            )
+
+            distinct, per_element = ScalingAnalysis.per_element(sizes, values[metric])
+            fig.add_trace(
+                go.Scatter(
+                    x=distinct,
+                    y=per_element,
+                    mode="lines+markers",
+                    line={"color": DEFAULT_PLOTLY_COLORS[0]},
+                    name="Per element",
+                    showlegend=col == 1,
+                ),
+                row=2,
+                col=col,
+            )
+
+            fig.update_yaxes(title_text=f"{metric.capitalize()} in {unit}", row=1, col=col)
+            fig.update_yaxes(title_text=f"{unit} per element", row=2, col=col)
+
+        fig.update_xaxes(type="log", title_text="Input size n")
+        fig.update_yaxes(type="log")
+        fig.update_layout(
+            showlegend=True, autosize=True, margin={"l": 20, "r": 20, "t": 40, "b": 20}
+        )
+
+        return fig
+
+    @staticmethod
+    def create_flame_graph(profile: EnergyProfile) -> go.Figure:
+        """
+        Create an icicle flame graph of the energy profile. Each box is a function on the stack,
+        its width the energy in Joule spent while it was on the stack below its parent
+        """
+        energy = {}
+        for stack, value in profile.energy.items():
+            for depth in range(1, len(stack) + 1):
+                energy[stack[:depth]] = energy.get(stack[:depth], 0.0) + value
+
+        nodes = sorted(energy)
+        ids = [";".join(map(EnergyProfile.frame_name, node)) for node in nodes]
+        parents = [";".join(map(EnergyProfile.frame_name, node[:-1])) for node in nodes]
+        values = [energy[node] for node in nodes]
+
+        fig = go.Figure(
+            go.Icicle(
+                ids=ids,
+                labels=[node[-1][0] for node in nodes],
+                parents=parents,
+                values=values,
+                branchvalues="total",
+                customdata=[EnergyProfile.frame_name(node[-1]) for node in nodes],
+                hovertemplate="%{customdata}<br>%{value:.5e} J<br>"
+                "%{percentRoot:.1%} of the profile<extra></extra>",
+                tiling={"orientation": "v", "flip": "y"},
+                root={"color": "lightgrey"},
+            )
+        )
+        fig.update_layout(
+            title=f"Energy profile: {profile.total_energy:.5e} J in {profile.duration:.3f} s",
+            margin={"l": 20, "r": 20, "t": 40, "b": 20},
+        )
+
+        return fig
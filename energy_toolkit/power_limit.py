@@ -0,0 +1,256 @@
+"""
+Power limit module.
+Offers control of the RAPL package power limit and a sweep of a campaign over power caps.
+"""
+
+import atexit
+import contextlib
+import os
+import signal
+import threading
+from typing import Callable, Iterable, List
+
+from energy_toolkit import msr_reader
+from energy_toolkit.energy_toolkit import EnergyToolkit
+from energy_toolkit.logger import Logger
+from energy_toolkit.rapl_interface import RAPLInterface
+from energy_toolkit.util import CPU_TYPE
+
+
+class PowerLimit:
+    """
+    Context manager that caps the package power of Intel CPUs through the MSR_PKG_POWER_LIMIT
+    register. The long term limit (PL1) gets a short time window and the short term limit (PL2)
+    the same power, so turbo bursts cannot exceed the cap. The original register value is
+    restored on exit, at interpreter exit and on SIGTERM. Requires root rights, limits locked by
+    the firmware cannot be changed.
+    """
+
+    REGISTER = 0x610
+    UNIT_REGISTER = 0x606
+
+    # PL1 power in power units, its enable and clamp bits and the lock of the whole register
+    POWER_MASK = 0x7FFF
+    ENABLE = 1 << 15
+    CLAMP = 1 << 16
+    LOCK = 1 << 63
+
+    # PL1 time window of 2^Y * (1 + Z/4) time units, Y in bits 17-21 and Z in bits 22-23
+    WINDOW_SHIFT = 17
+    WINDOW_MASK = 0x7F << WINDOW_SHIFT
+    # Shortest PL1 time window in seconds that is set with a cap
+    TIME_WINDOW = 0.01
+
+    # PL2 power in bits 32-46 and its enable and clamp bits
+    PL2_SHIFT = 32
+    PL2_ENABLE = 1 << 47
+    PL2_CLAMP = 1 << 48
+
+    def __init__(self, core=0):
+        """Create a new power limit of the package the given core belongs to"""
+        self._core = core
+        self._path = RAPLInterface.msr_path(core)
+        self._original = None
+        self._previous_sigterm = None
+
+    def _read(self, register: int) -> int:
+        return msr_reader.read_msr(self._path, register)
+
+    def get_unit(self) -> float:
+        """Return the power unit of the package in Watt"""
+        return 0.5 ** (self._read(self.UNIT_REGISTER) & 0xF)
+
+    def get_time_unit(self) -> float:
+        """Return the time unit of the package in seconds"""
+        return 0.5 ** ((self._read(self.UNIT_REGISTER) >> 16) & 0xF)
+
+    def _encode_window(self, seconds: float) -> int:
+        """Return the time window field of the shortest window not shorter than seconds"""
+        unit = self.get_time_unit()
+        windows = [
+            ((2 ** y) * (1 + z / 4) * unit, (z << 5) | y) for y in range(32) for z in range(4)
+        ]
+        fitting = [window for window in windows if window[0] >= seconds]
+        return min(fitting or [max(windows)])[1]
+
+    def get_limit(self) -> float:
+        """Return the current PL1 power limit in Watt"""
+        return (self._read(self.REGISTER) & self.POWER_MASK) * self.get_unit()
+
+    def is_locked(self) -> bool:
+        """Return whether the firmware locked the power limit register"""
+        return bool(self._read(self.REGISTER) & self.LOCK)
+
+    def set_limit(self, watts: float) -> None:
+        """Enable and clamp the PL1 and PL2 power limits to the given number of Watt"""
+        value = self._read(self.REGISTER)
+        if value & self.LOCK:
+            raise PermissionError(f"Power limit of core {self._core} is locked by the firmware")
+
+        units = round(watts / self.get_unit())
+        if not 0 < units <= self.POWER_MASK:
+            raise ValueError(f"Power limit of {watts} W is out of range")
+
+        if self._original is None:
+            self._original = value
+
+        value &= ~(self.POWER_MASK | self.WINDOW_MASK | self.POWER_MASK << self.PL2_SHIFT)
+        value |= units | self.ENABLE | self.CLAMP
+        value |= self._encode_window(self.TIME_WINDOW) << self.WINDOW_SHIFT
+        value |= units << self.PL2_SHIFT | self.PL2_ENABLE | self.PL2_CLAMP
+        msr_reader.write_msr(self._path, self.REGISTER, value)
+
+    def __enter__(self) -> "PowerLimit":
+        # Restore even if the toolkit is terminated or exits without leaving the context
+        atexit.register(self.restore)
+        if threading.current_thread() is threading.main_thread():
+            self._previous_sigterm = signal.signal(signal.SIGTERM, self._on_sigterm)
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.restore()
+
+    def _on_sigterm(self, signum, frame):
+        """Restore the power limit before the toolkit terminates"""
+        previous = self._previous_sigterm
+        try:
+            self.restore()
+        finally:
+            # Give an earlier handler, e.g. of a core isolation, the chance to restore as well
+            if callable(previous):
+                previous(signum, frame)
+        raise SystemExit(128 + signum)
+
+    def restore(self) -> None:
+        """Restore the original power limit. Safe to call repeatedly"""
+        if self._original is not None:
+            try:
+                msr_reader.write_msr(self._path, self.REGISTER, self._original)
+                self._original = None
+            except OSError as e:
+                Logger().get_logger().error(
+                    "Power limit of core %d could not be restored: %s", self._core, e
+                )
+
+        if self._previous_sigterm is not None:
+            signal.signal(signal.SIGTERM, self._previous_sigterm)
+            self._previous_sigterm = None
+
+
+class CapResult:
+    """Data class holding the measurement of one program under one power cap"""
+
+    cap: float = 0.0
+    pid: int = 0
+    label: str = ""
+    energy: float = 0.0
+    time: float = 0.0
+    energy_optimal: bool = False
+    edp_optimal: bool = False
+
+    def __init__(self, cap, pid, label, energy, time): # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self.cap = cap
+        self.pid = pid
+        self.label = label
+        self.energy = energy
+        self.time = time
+
+    def get_edp(self) -> float:
+        """Return the energy-delay product in Joule seconds"""
+        return self.energy * self.time
+
+
+class PowerCapSweep:
+    """
+    Measures a campaign once under each of a series of package power caps. The caps are set on
+    every package covering the measurement cores and the original limits are always restored.
+    For each program the cap with the lowest energy and the cap with the lowest energy-delay
+    product are marked as optimal.
+    """
+
+    def __init__(self, caps: Iterable[float], cores):
+        """Create a new sweep over the given caps in Watt for the given core or set of cores"""
+        self._caps = list(caps)
+        cores = {cores} if isinstance(cores, int) else set(cores)
+        # Power limits are set per package
+        self._packages = sorted(RAPLInterface.domains(CPU_TYPE.INTEL, cores).values())
+
+    def run(self, create_toolkit: Callable[[float], EnergyToolkit]) -> List[CapResult]:
+        """
+        Measure the campaign of a fresh toolkit under each cap. create_toolkit returns the
+        toolkit of the given cap, its results and statistics are written afterwards
+        """
+        results = []
+        with contextlib.ExitStack() as stack:
+            limits = [stack.enter_context(PowerLimit(package)) for package in self._packages]
+
+            for cap in self._caps:
+                for limit in limits:
+                    limit.set_limit(cap)
+                Logger().get_logger().info("Measuring with a power cap of %g W", cap)
+
+                toolkit = create_toolkit(cap)
+                toolkit.measure()
+                toolkit.write_results()
+                toolkit.write_statistics()
+
+                for pid, statistics in toolkit.get_statistics().items():
+                    program = toolkit.get_programs()[pid]
+                    results.append(
+                        CapResult(
+                            cap,
+                            pid,
+                            " ".join([program.get_executeable()] + program.get_arguments()),
+                            float(statistics["energy"]["mean"]),
+                            float(statistics["time"]["mean"]),
+                        )
+                    )
+
+        self.mark_optimum(results)
+        return results
+
+    @staticmethod
+    def mark_optimum(results: List[CapResult]) -> None:
+        """Mark the caps with the lowest energy and the lowest energy-delay product per program"""
+        programs = {}
+        for result in results:
+            programs.setdefault(result.pid, []).append(result)
+
+        for program_results in programs.values():
+            min(program_results, key=lambda result: result.energy).energy_optimal = True
+            min(program_results, key=lambda result: result.get_edp()).edp_optimal = True
+
+    @staticmethod
+    def format(results: List[CapResult]) -> str:
+        """Format the results as table per program, optimal caps are marked"""
+        lines = []
+        for pid in sorted({result.pid for result in results}):
+            program_results = [result for result in results if result.pid == pid]
+            lines.append(f"Program {pid}: {program_results[0].label}")
+            lines.append(f"  {'Cap (W)':>8} {'Energy (J)':>12} {'Time (s)':>12} {'EDP (J s)':>12}")
+
+            for result in program_results:
+                marks = []
+                if result.energy_optimal:
+                    marks.append("energy optimum")
+                if result.edp_optimal:
+                    marks.append("EDP optimum")
+
+                lines.append(
+                    f"  {result.cap:>8g} {result.energy:>12.5e} {result.time:>12.5e} "
+                    f"{result.get_edp():>12.5e}" + (f"  <- {', '.join(marks)}" if marks else "")
+                )
+
+        return "\n".join(lines)
+
+    @staticmethod
+    def write(path: str, results: List[CapResult]) -> None:
+        """Write the results to sweep.csv in the given folder"""
+        with open(os.path.join(path, "sweep.csv"), "w", encoding="utf-8") as f:
+            f.write("# Cap,Pid,Energy,Time,Edp,Energy_optimal,Edp_optimal\n")
+            for result in results:
+                f.write(
+                    f"{result.cap},{result.pid},{result.energy},{result.time},{result.get_edp()},"
+                    f"{int(result.energy_optimal)},{int(result.edp_optimal)}\n"
+                )
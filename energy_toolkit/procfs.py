@@ -0,0 +1,430 @@
+"""
+Procfs module.
+Offers helpers to read /proc and a manager that isolates the measurement core.
+"""
+
+import atexit
+import os
+import signal
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from energy_toolkit.logger import Logger
+
+
+class ProcFS:
+    """Helper class to read and write the kernel interfaces under /proc"""
+
+    @staticmethod
+    def parse_cpu_list(cpulist: str) -> Set[int]:
+        """Parse a cpu list of the form 0-3,8,10-11 into a set of cpu numbers"""
+        cpus = set()
+        for part in cpulist.strip().split(","):
+            if not part:
+                continue
+
+            if "-" in part:
+                first, last = part.split("-", 1)
+                cpus.update(range(int(first), int(last) + 1))
+            else:
+                cpus.add(int(part))
+
+        return cpus
+
+    @staticmethod
+    def format_cpu_list(cpus: Set[int]) -> str:
+        """Format a set of cpu numbers as compact cpu list, e.g. 0-3,8"""
+        ranges = []
+        for cpu in sorted(cpus):
+            if ranges and ranges[-1][1] == cpu - 1:
+                ranges[-1][1] = cpu
+            else:
+                ranges.append([cpu, cpu])
+
+        return ",".join(
+            str(first) if first == last else f"{first}-{last}" for first, last in ranges
+        )
+
+    @staticmethod
+    def read_cpu_busy_time(core: int) -> float:
+        """Return the time in seconds the given core spent outside of idle and iowait"""
+        return ProcFS.read_cpus_busy_time({core})
+
+    @staticmethod
+    def read_cpus_busy_time(cores: Set[int]) -> float:
+        """Return the summed time in seconds the given cores spent outside of idle and iowait"""
+        busy = 0
+        found = set()
+        with open("/proc/stat", "r", encoding="utf-8") as f:
+            for line in f:
+                name, _, rest = line.partition(" ")
+                if not name.startswith("cpu") or not name[3:].isdigit():
+                    continue
+                if int(name[3:]) not in cores:
+                    continue
+
+                # user nice system idle iowait irq softirq steal ...
+                values = [int(value) for value in rest.split()]
+                busy += sum(values[:8]) - values[3] - values[4]
+                found.add(int(name[3:]))
+
+        if found != set(cores):
+            raise ValueError(f"Cores {sorted(set(cores) - found)} not found in /proc/stat")
+
+        return busy / os.sysconf("SC_CLK_TCK")
+
+    @staticmethod
+    def read_topology(core: int, name: str) -> Set[int]:
+        """
+        Return the cpus sharing a topology level with the given core, e.g. package_cpus_list or
+        core_cpus_list. Returns only the core itself if the topology is not available
+        """
+        try:
+            with open(
+                f"/sys/devices/system/cpu/cpu{core}/topology/{name}", "r", encoding="utf-8"
+            ) as f:
+                return ProcFS.parse_cpu_list(f.read())
+        except OSError:
+            return {core}
+
+    @staticmethod
+    def read_topology_id(core: int, name: str) -> int:
+        """
+        Return a topology id of the given core, e.g. physical_package_id or core_id. Returns 0 if
+        the topology is not available
+        """
+        try:
+            with open(
+                f"/sys/devices/system/cpu/cpu{core}/topology/{name}", "r", encoding="utf-8"
+            ) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return 0
+
+    @staticmethod
+    def read_process_times() -> Dict[int, Tuple[int, float]]:
+        """
+        Return the parent pid and the cpu time in seconds of every process. The cpu time
+        includes all threads and all children the process already waited for
+        """
+        ticks = os.sysconf("SC_CLK_TCK")
+        processes = {}
+        for pid in os.listdir("/proc"):
+            if not pid.isdigit():
+                continue
+
+            try:
+                with open(f"/proc/{pid}/stat", "r", encoding="utf-8") as f:
+                    stat = f.read()
+            except OSError:
+                continue
+
+            # The command name may contain spaces and parentheses, fields follow the last ")"
+            fields = stat[stat.rfind(")") + 2:].split()
+            # utime stime cutime cstime
+            cpu_time = sum(int(value) for value in fields[11:15]) / ticks
+            processes[int(pid)] = (int(fields[1]), cpu_time)
+
+        return processes
+
+    @staticmethod
+    def read_descendants_cpu_time(pid: int) -> float:
+        """Return the cpu time in seconds of all living descendants of the given process"""
+        processes = ProcFS.read_process_times()
+
+        children: Dict[int, List[int]] = {}
+        for child, (parent, _) in processes.items():
+            children.setdefault(parent, []).append(child)
+
+        cpu_time = 0.0
+        pending = list(children.get(pid, []))
+        while pending:
+            child = pending.pop()
+            cpu_time += processes[child][1]
+            pending += children.get(child, [])
+
+        return cpu_time
+
+    @staticmethod
+    def read_interrupt_count(core: int) -> int:
+        """Return the number of interrupts that were delivered to the given core"""
+        return ProcFS.read_cores_interrupt_count({core})
+
+    @staticmethod
+    def read_cores_interrupt_count(cores: Set[int]) -> int:
+        """Return the summed number of interrupts that were delivered to the given cores"""
+        with open("/proc/interrupts", "r", encoding="utf-8") as f:
+            header = f.readline().split()
+            columns = [
+                header.index(f"CPU{core}") + 1 for core in cores if f"CPU{core}" in header
+            ]
+
+            count = 0
+            for line in f:
+                fields = line.split()
+                for column in columns:
+                    # Summary lines like ERR: only hold a single value
+                    if len(fields) > column and fields[column].isdigit():
+                        count += int(fields[column])
+
+        return count
+
+    @staticmethod
+    def read_schedstat(cores: Set[int]) -> Optional[Tuple[float, float]]:
+        """
+        Return the summed time in seconds tasks ran on the given cores and the time they waited
+        in the run queues of the cores. Returns None if the kernel has no schedstats
+        """
+        run_time = 0
+        run_delay = 0
+        found = set()
+        try:
+            with open("/proc/schedstat", "r", encoding="utf-8") as f:
+                for line in f:
+                    name, _, rest = line.partition(" ")
+                    if not name.startswith("cpu") or not name[3:].isdigit():
+                        continue
+                    if int(name[3:]) not in cores:
+                        continue
+
+                    # yld_count 0 sched_count sched_goidle ttwu_count ttwu_local rq_cpu_time
+                    # run_delay pcount, times in nanoseconds
+                    values = [int(value) for value in rest.split()]
+                    run_time += values[6]
+                    run_delay += values[7]
+                    found.add(int(name[3:]))
+        except (OSError, ValueError, IndexError):
+            return None
+
+        if found != set(cores):
+            return None
+
+        return run_time / 1e9, run_delay / 1e9
+
+    @staticmethod
+    def list_tasks() -> List[int]:
+        """Return the ids of all threads of all processes"""
+        tasks = []
+        for pid in os.listdir("/proc"):
+            if not pid.isdigit():
+                continue
+
+            try:
+                tasks += [int(tid) for tid in os.listdir(f"/proc/{pid}/task")]
+            except OSError:
+                # The process exited in between
+                continue
+
+        return tasks
+
+    @staticmethod
+    def list_irqs() -> List[str]:
+        """Return the numbers of all interrupts with a configurable affinity"""
+        return [
+            irq
+            for irq in os.listdir("/proc/irq")
+            if irq.isdigit() and os.path.exists(f"/proc/irq/{irq}/smp_affinity_list")
+        ]
+
+
+class IsolationReport:
+    """Data class summarizing the isolation of the measurement core and the activity seen on it"""
+
+    moved_tasks: int = 0
+    pinned_tasks: int = 0
+    moved_irqs: int = 0
+    pinned_irqs: int = 0
+    busy_time: float = 0.0
+    foreign_time: float = 0.0
+    interrupts: int = 0
+
+    def __init__(self, moved_tasks=0, pinned_tasks=0, moved_irqs=0, pinned_irqs=0):
+        self.moved_tasks = moved_tasks
+        self.pinned_tasks = pinned_tasks
+        self.moved_irqs = moved_irqs
+        self.pinned_irqs = pinned_irqs
+
+    def __str__(self):
+        return (
+            f"moved {self.moved_tasks} tasks ({self.pinned_tasks} pinned) and "
+            f"{self.moved_irqs} irqs ({self.pinned_irqs} pinned), "
+            f"core busy {self.busy_time:.2f} s, foreign activity {self.foreign_time:.2f} s, "
+            f"{self.interrupts} interrupts"
+        )
+
+
+class CoreIsolation: # pylint: disable=too-many-instance-attributes
+    """
+    Context manager that keeps foreign work off the measurement core while it is active.
+    It moves the affinity of all other tasks off the core, steers movable interrupts to the
+    remaining cores and optionally raises the scheduling priority of the toolkit, which is
+    inherited by the measured programs. Everything is restored on exit, at interpreter exit and
+    on SIGTERM. Requires root rights, tasks and interrupts bound to the core by the kernel stay.
+
+    Busy time of the core that is not caused by programs started from the toolkit is reported as
+    foreign activity.
+    """
+
+    # Supported priorities: realtime uses SCHED_FIFO, high the lowest nice value
+    PRIORITIES = ("realtime", "high")
+
+    def __init__(self, core, tasks=True, irqs=True, priority: str = None):
+        """Isolate the given core or set of cores"""
+        if priority is not None and priority not in self.PRIORITIES:
+            raise ValueError(
+                f"Unknown priority '{priority}'. Valid priorities are {', '.join(self.PRIORITIES)}"
+            )
+
+        self._cores = {core} if isinstance(core, int) else set(core)
+        self._tasks = tasks
+        self._irqs = irqs
+        self._priority = priority
+        self._logger = Logger().get_logger()
+
+        # Original settings, restored on exit
+        self._affinities: Dict[int, Set[int]] = {}
+        self._irq_affinities: Dict[str, str] = {}
+        self._scheduler: Tuple[int, int, int] = None
+        self._previous_sigterm = None
+
+        self._report = IsolationReport()
+        self._start: Tuple[float, float, int] = None
+
+    def get_report(self) -> IsolationReport:
+        """Return the report of the isolation, complete once the context is left"""
+        return self._report
+
+    def __enter__(self) -> "CoreIsolation":
+        # Restore even if the toolkit is terminated or exits without leaving the context
+        atexit.register(self.restore)
+        if threading.current_thread() is threading.main_thread():
+            self._previous_sigterm = signal.signal(signal.SIGTERM, self._on_sigterm)
+
+        if self._tasks:
+            self._move_tasks()
+        if self._irqs:
+            self._move_irqs()
+        if self._priority is not None:
+            self._raise_priority()
+
+        self._start = self._sample()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = self._sample()
+
+        self._report.busy_time = end[0] - self._start[0]
+        self._report.foreign_time = max(self._report.busy_time - (end[1] - self._start[1]), 0.0)
+        self._report.interrupts = end[2] - self._start[2]
+
+        self.restore()
+        self._logger.info("Core isolation: %s", self._report)
+
+    def _sample(self) -> Tuple[float, float, int]:
+        """Sample the busy time and interrupts of the core and the cpu time of reaped children"""
+        times = os.times()
+        return (
+            ProcFS.read_cpus_busy_time(self._cores),
+            times.children_user + times.children_system,
+            ProcFS.read_cores_interrupt_count(self._cores),
+        )
+
+    def _on_sigterm(self, signum, frame):
+        """Restore the system settings before the toolkit terminates"""
+        previous = self._previous_sigterm
+        self.restore()
+
+        if callable(previous):
+            previous(signum, frame)
+        raise SystemExit(128 + signum)
+
+    def _move_tasks(self) -> None:
+        """
+        Remove the measurement core from the affinity of all tasks that may run elsewhere.
+        This includes the threads of the toolkit itself on purpose, the measured programs are
+        pinned to the core when they are started
+        """
+        for tid in ProcFS.list_tasks():
+            try:
+                affinity = os.sched_getaffinity(tid)
+                if not affinity & self._cores:
+                    continue
+                if affinity <= self._cores:
+                    self._report.pinned_tasks += 1
+                    continue
+
+                os.sched_setaffinity(tid, affinity - self._cores)
+                self._affinities[tid] = affinity
+                self._report.moved_tasks += 1
+            except ProcessLookupError:
+                continue
+            except OSError:
+                # Per-cpu kernel threads can not be moved
+                self._report.pinned_tasks += 1
+
+    def _move_irqs(self) -> None:
+        """Steer all movable interrupts to the remaining cores"""
+        for irq in ProcFS.list_irqs():
+            path = f"/proc/irq/{irq}/smp_affinity_list"
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    original = f.read().strip()
+
+                cpus = ProcFS.parse_cpu_list(original)
+                if not cpus & self._cores:
+                    continue
+                if cpus <= self._cores:
+                    self._report.pinned_irqs += 1
+                    continue
+
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(ProcFS.format_cpu_list(cpus - self._cores))
+                self._irq_affinities[irq] = original
+                self._report.moved_irqs += 1
+            except OSError:
+                # Managed interrupts reject affinity changes
+                self._report.pinned_irqs += 1
+
+    def _raise_priority(self) -> None:
+        """Raise the scheduling priority of the toolkit, children inherit it"""
+        self._scheduler = (
+            os.sched_getscheduler(0),
+            os.sched_getparam(0).sched_priority,
+            os.getpriority(os.PRIO_PROCESS, 0),
+        )
+
+        if self._priority == "realtime":
+            priority = os.sched_get_priority_max(os.SCHED_FIFO)
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+        else:
+            os.setpriority(os.PRIO_PROCESS, 0, -20)
+
+    def restore(self) -> None:
+        """Restore all changed affinities and the scheduling priority. Safe to call repeatedly"""
+        for tid, affinity in self._affinities.items():
+            try:
+                os.sched_setaffinity(tid, affinity)
+            except OSError:
+                # The task exited in the meantime
+                continue
+        self._affinities = {}
+
+        for irq, original in self._irq_affinities.items():
+            try:
+                with open(f"/proc/irq/{irq}/smp_affinity_list", "w", encoding="utf-8") as f:
+                    f.write(original)
+            except OSError:
+                self._logger.warning("Affinity of irq %s could not be restored", irq)
+        self._irq_affinities = {}
+
+        if self._scheduler is not None:
+            policy, priority, nice = self._scheduler
+            os.sched_setscheduler(0, policy, os.sched_param(priority))
+            os.setpriority(os.PRIO_PROCESS, 0, nice)
+            self._scheduler = None
+
+        if self._previous_sigterm is not None:
+            signal.signal(signal.SIGTERM, self._previous_sigterm)
+            self._previous_sigterm = None
+
+        atexit.unregister(self.restore)
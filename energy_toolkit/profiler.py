@@ -0,0 +1,271 @@
+"""
+Profiler module.
+Offers a sampling profiler that attributes the energy of Python code to its functions.
+"""
+
+import builtins
+import json
+import os
+import sys
+import threading
+import time
+from types import FrameType
+from typing import Dict, List, Optional, Tuple
+
+from energy_toolkit.logger import Logger
+from energy_toolkit.rapl_interface import RAPLInterface
+from energy_toolkit.util import ToolkitUtil
+
+# A frame of a sampled stack: function name, file and first line of the function
+Frame = Tuple[str, str, int]
+
+
+class EnergyProfile:
+    """
+    Data class holding the energy in Joule and the number of samples attributed to each sampled
+    stack. Stacks are tuples of frames, outermost first
+    """
+
+    energy: Dict[Tuple[Frame, ...], float] = None
+    samples: Dict[Tuple[Frame, ...], int] = None
+    total_energy: float = 0.0
+    duration: float = 0.0
+    interval: float = 0.0
+    overhead: float = 0.0
+    dropped: int = 0
+
+    def __init__(self, energy, samples, total_energy, duration, interval): # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self.energy = energy
+        self.samples = samples
+        self.total_energy = total_energy
+        self.duration = duration
+        self.interval = interval
+
+    @staticmethod
+    def frame_name(frame: Frame) -> str:
+        """Return the name of a frame as shown in the collapsed stacks and the flame graph"""
+        name, filename, line = frame
+        return f"{name} ({os.path.basename(filename)}:{line})"
+
+    def get_functions(self) -> Dict[Frame, Tuple[float, float]]:
+        """
+        Return the self and the inclusive energy of each function. Recursive functions count
+        once per stack for the inclusive energy
+        """
+        functions = {}
+        for stack, energy in self.energy.items():
+            for frame in set(stack):
+                own, inclusive = functions.get(frame, (0.0, 0.0))
+                functions[frame] = (own, inclusive + energy)
+
+            own, inclusive = functions[stack[-1]]
+            functions[stack[-1]] = (own + energy, inclusive)
+
+        return functions
+
+    def to_collapsed(self) -> str:
+        """
+        Return the stacks in the collapsed format of flamegraph.pl, weighted in microjoules:
+        one line per stack of semicolon separated frames and its weight
+        """
+        lines = []
+        for stack, energy in sorted(self.energy.items()):
+            weight = round(energy * 1e6)
+            if weight > 0:
+                lines.append(f"{';'.join(map(self.frame_name, stack))} {weight}")
+
+        return "\n".join(lines) + "\n"
+
+    def to_speedscope(self, name: str = "energy") -> dict:
+        """Return the stacks as sampled profile in the speedscope file format, weighted in Joule"""
+        frames = {}
+        samples = []
+        weights = []
+        for stack, energy in sorted(self.energy.items()):
+            samples.append([frames.setdefault(frame, len(frames)) for frame in stack])
+            weights.append(energy)
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {
+                "frames": [
+                    {"name": frame[0], "file": frame[1], "line": frame[2]} for frame in frames
+                ]
+            },
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": f"{name} in J",
+                    "unit": "none",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+            "name": name,
+            "exporter": "energy-toolkit",
+        }
+
+    def write(self, path: str, name: str = "profile") -> None:
+        """Write the profile to <name>.collapsed and <name>.speedscope.json in the given folder"""
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, f"{name}.collapsed"), "w", encoding="utf-8") as f:
+            f.write(self.to_collapsed())
+        with open(os.path.join(path, f"{name}.speedscope.json"), "w", encoding="utf-8") as f:
+            json.dump(self.to_speedscope(name), f)
+
+
+class EnergyProfiler:
+    """
+    Sampling energy profiler for Python code. A background thread wakes up every interval,
+    reads the energy counters of the domains covering the given cores and captures the Python
+    stack of the profiled thread. The energy of each interval is attributed to the stack sampled
+    at its end, so functions accumulate energy in proportion to the time they are on the stack.
+
+    Energy counters are updated roughly every millisecond, intervals should be a few times
+    longer. Each sample costs a few microseconds of cpu time, which the profile reports as
+    overhead. Intervals in which a counter overflowed are dropped.
+    """
+
+    def __init__(self, cores=0, interval: float = 0.005):
+        """Create a new profiler reading the energy domains of the given core or set of cores"""
+        cores = {cores} if isinstance(cores, int) else set(cores)
+        self._vendor = ToolkitUtil.get_cpu_vendor()
+        self._domains = RAPLInterface.domains(self._vendor, cores)
+        self._interval = interval
+        # The sampler runs off the profiled cores, the caller may pin itself to them later on
+        self._affinity = (os.sched_getaffinity(0) - cores) or os.sched_getaffinity(0)
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._target = None
+        self._boundary = None
+        self._start = None
+        self._profile: Optional[EnergyProfile] = None
+
+    def _read_energy(self) -> float:
+        """Read the summed energy counters of all domains covering the cores"""
+        return sum(RAPLInterface.read(self._vendor, reader) for reader in self._domains.values())
+
+    def _collapse(self, frame: FrameType) -> Tuple[Frame, ...]:
+        """
+        Return the stack of the given frame, outermost first and cut at the boundary frame.
+        Stacks of the profiler itself, e.g. while it is stopped, are empty
+        """
+        stack = []
+        while frame is not None and frame is not self._boundary:
+            code = frame.f_code
+            if code.co_filename == __file__:
+                return ()
+            stack.append((getattr(code, "co_qualname", code.co_name), code.co_filename,
+                          code.co_firstlineno))
+            frame = frame.f_back
+
+        return tuple(reversed(stack))
+
+    def start(self, boundary: FrameType = None) -> None:
+        """
+        Start profiling the calling thread. Frames above the function calling start are left
+        out, unless another boundary frame is given
+        """
+        if self._thread is not None:
+            raise RuntimeError("Profiler is already running")
+
+        self._target = threading.get_ident()
+        self._boundary = boundary if boundary is not None else sys._getframe(1).f_back # pylint: disable=protected-access
+        self._profile = EnergyProfile({}, {}, 0.0, 0.0, self._interval)
+        self._stop.clear()
+
+        self._start = (time.perf_counter(), self._read_energy())
+        self._thread = threading.Thread(target=self._sample, name="energy-profiler", daemon=True)
+        self._thread.start()
+        os.sched_setaffinity(self._thread.native_id, self._affinity)
+
+    def _sample(self) -> None:
+        """Sampling loop of the background thread"""
+        profile = self._profile
+        cpu_start = time.thread_time()
+        previous = self._start[1]
+
+        while not self._stop.wait(self._interval):
+            energy = self._read_energy()
+            frame = sys._current_frames().get(self._target) # pylint: disable=protected-access
+            delta = energy - previous
+            previous = energy
+
+            if frame is None:
+                continue
+            if delta < 0:
+                profile.dropped += 1
+                continue
+
+            stack = self._collapse(frame)
+            del frame
+            if not stack:
+                continue
+
+            profile.energy[stack] = profile.energy.get(stack, 0.0) + delta
+            profile.samples[stack] = profile.samples.get(stack, 0) + 1
+
+        profile.overhead = time.thread_time() - cpu_start
+
+    def stop(self) -> EnergyProfile:
+        """Stop profiling and return the profile"""
+        if self._thread is None:
+            raise RuntimeError("Profiler is not running")
+
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+        profile = self._profile
+        profile.duration = time.perf_counter() - self._start[0]
+        profile.total_energy = self._read_energy() - self._start[1]
+        if profile.duration > 0:
+            profile.overhead /= profile.duration
+
+        if profile.dropped:
+            Logger().get_logger().warning(
+                "Dropped %d profiler samples due to energy counter overflows", profile.dropped
+            )
+
+        return profile
+
+    def get_profile(self) -> Optional[EnergyProfile]:
+        """Return the profile of the last profiling run"""
+        return self._profile
+
+    def __enter__(self) -> "EnergyProfiler":
+        # Keep the frame containing the with statement as outermost frame
+        self.start(sys._getframe(1).f_back) # pylint: disable=protected-access
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def run_script(self, path: str, args: List[str] = None) -> Tuple[EnergyProfile, int]:
+        """
+        Profile the Python script at path as __main__ with the given arguments. Returns the
+        profile and the exit code of the script
+        """
+        with open(path, "rb") as f:
+            code = compile(f.read(), path, "exec")
+
+        namespace = {"__name__": "__main__", "__file__": path, "__builtins__": builtins}
+        argv, syspath = sys.argv, list(sys.path)
+        sys.argv = [path] + list(args or [])
+        sys.path.insert(0, os.path.dirname(os.path.abspath(path)))
+
+        exitcode = 0
+        # The module frame of the script is the outermost frame of every stack
+        self.start(sys._getframe()) # pylint: disable=protected-access
+        try:
+            exec(code, namespace) # pylint: disable=exec-used
+        except SystemExit as e:
+            exitcode = e.code if isinstance(e.code, int) else int(e.code is not None)
+        finally:
+            profile = self.stop()
+            sys.argv, sys.path[:] = argv, syspath
+
+        return profile, exitcode
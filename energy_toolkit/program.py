@@ -1,23 +1,102 @@
 """
 Program abstraction
 """
+import asyncio
+import concurrent.futures
 import os
+import resource
+import select
+import shutil
+import signal
 import subprocess
+import time
+from typing import List, Optional, Tuple
 
 from energy_toolkit.logger import Logger
+from energy_toolkit.perf_counters import PerfCounters
+from energy_toolkit.procfs import ProcFS
+from energy_toolkit.roi import RegionMarkers
+from energy_toolkit.util import CacheMode, ExecutionStatus, ToolkitUtil
+
+
+class ExecutionResult:
+    """
+    Outcome of a single program execution. Holds the exit code, the execution status, the
+    resource usage of the reaped child (user/sys time in s, max RSS in KiB, page faults and
+    context switches) and the perf_event counts of the execution if requested
+    """
+
+    # Mapping of the recorded usage values to the fields of os.wait4's rusage
+    USAGE_FIELDS = {
+        "user_time": "ru_utime",
+        "sys_time": "ru_stime",
+        "max_rss": "ru_maxrss",
+        "minor_faults": "ru_minflt",
+        "major_faults": "ru_majflt",
+        "voluntary_ctx_switches": "ru_nvcsw",
+        "involuntary_ctx_switches": "ru_nivcsw",
+    }
+
+    returncode: int = 0
+    usage: dict = None
+    status: ExecutionStatus = ExecutionStatus.OK
+    counters: dict = None
+
+    def __init__(
+        self,
+        returncode: int,
+        usage: dict = None,
+        status: ExecutionStatus = ExecutionStatus.OK,
+        counters: dict = None,
+    ):
+        self.returncode = returncode
+        self.usage = usage if usage is not None else {}
+        self.status = status
+        self.counters = counters if counters is not None else {}
+
+    @classmethod
+    def usage_from_rusage(cls, rusage) -> dict:
+        """Convert a resource.struct_rusage to the recorded usage values"""
+        return {name: float(getattr(rusage, field)) for name, field in cls.USAGE_FIELDS.items()}
+
 
 class Program:
     """
     Program abstraction class, that models a program that can be executed.
     """
 
+    # Shell started instead of the program if perf counters are recorded. It waits for the gate
+    # on its stderr, so the counters can be opened before it executes the program with the
+    # original stderr
+    GATE = 'read _ <&2 && exec "$0" "$@" 2>/dev/null'
+
+    # Shared executor reaping children on kernels without pidfds, created on first use
+    _reaper_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
     _executeable = None
     _arguments = None
     _inputfile = None
 
-    def __init__(self, exe: str, args: list[str] = None, inpfile: str = ""):
+    _warmup = 0
+    _warmup_time = 0.0
+    _cache_mode = CacheMode.WARM
+    _timeout = None
+
+    def __init__( # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        exe: str,
+        args: list[str] = None,
+        inpfile: str = "",
+        warmup: int = 0,
+        warmup_time: float = 0.0,
+        cache_mode: CacheMode = CacheMode.WARM,
+        timeout: float = None,
+    ):
         """
-        Create a new Program object
+        Create a new Program object. Before the measurement the program is executed warmup
+        times and afterwards until warmup_time seconds have passed. The cache mode defines the
+        page cache state each repetition starts in. Executions taking longer than timeout
+        seconds are killed
         """
         self._executeable = exe
 
@@ -28,32 +107,332 @@ class Program:
 
         self._inputfile = inpfile
 
-    def execute(self, core=0):
+        self._warmup = warmup
+        self._warmup_time = warmup_time
+        self._cache_mode = cache_mode
+        self._timeout = timeout
+
+    def execute( # pylint: disable=too-many-locals,too-many-statements,too-many-branches
+        self,
+        core=0,
+        timeout: float = None,
+        markers: RegionMarkers = None,
+        perf_events: List[str] = None,
+    ) -> "ExecutionResult":
         """
-        Execute the program on a specific core
+        Execute the program on a specific core or set of cores. The child is reaped with
+        os.wait4, so its resource usage is available without any additional system call. The
+        program runs in its own process group, which is killed as a whole once timeout seconds
+        have passed. Region markers sent by the program are answered while it runs. The given
+        perf events are counted from the exec of the program on
         """
+        fin = None
+        gate = None
+        counters = None
+        returncode = -1
+        usage = {}
+        counts = {}
+        status = ExecutionStatus.FAILED
+        cores = self.cpu_set(core)
         try:
             if self._inputfile != "":
-                with open(self._inputfile, "r", encoding="utf-8") as fin:
-                    subprocess.run(
-                        ["taskset", "-c", str(core), self._executeable] + self._arguments,
-                        stdin=fin,
-                        stdout=subprocess.DEVNULL,
-                        stderr=subprocess.DEVNULL,
-                        preexec_fn=lambda: os.sched_setaffinity(0, {core}),
-                        check=True
-                    )
+                fin = open(self._inputfile, "r", encoding="utf-8") # pylint: disable=consider-using-with
+
+            if markers is not None:
+                markers.open()
+
+            if perf_events is not None:
+                gate = os.pipe()
+
+            # The preexec function only issues a single system call and takes no locks
+            with subprocess.Popen( # pylint: disable=subprocess-popen-preexec-fn
+                self._command(cores, gate is not None),
+                stdin=fin,
+                stdout=subprocess.DEVNULL,
+                stderr=gate[0] if gate is not None else subprocess.DEVNULL,
+                preexec_fn=lambda: os.sched_setaffinity(0, cores),
+                start_new_session=True,
+                pass_fds=(markers.child_fd(),) if markers is not None else (),
+                env=markers.environment() if markers is not None else None,
+            ) as process:
+                if markers is not None:
+                    markers.close_child()
+                if gate is not None:
+                    counters = self._open_counters(process.pid, perf_events, gate)
+                    gate = None
+
+                timed_out = not self._wait_for_exit(process.pid, timeout, markers)
+                if timed_out:
+                    self._kill_group(process.pid)
+
+                _, wait_status, rusage = os.wait4(process.pid, 0)
+
+                # The child is already reaped, let the Popen object know about it
+                returncode = os.waitstatus_to_exitcode(wait_status)
+                process.returncode = returncode
+
+            usage = ExecutionResult.usage_from_rusage(rusage)
+            if counters is not None:
+                counts = counters.counts()
+
+            if timed_out:
+                status = ExecutionStatus.TIMEOUT
+                Logger().get_logger().warning(
+                    "%s exceeded its timeout of %.2f s and was killed", self._executeable, timeout
+                )
+            elif returncode != 0:
+                raise subprocess.CalledProcessError(
+                    returncode, [self._executeable] + self._arguments
+                )
             else:
-                subprocess.run(
-                        ["taskset", "-c", str(core), self._executeable] + self._arguments,
-                        stdout=subprocess.DEVNULL,
-                        stderr=subprocess.DEVNULL,
-                        preexec_fn=lambda: os.sched_setaffinity(0, {core}),
-                        check=True
+                status = ExecutionStatus.OK
+
+        except Exception as e: # pylint: disable=broad-exception-caught
+            Logger().get_logger().error(e)
+        finally:
+            if fin is not None:
+                fin.close()
+            if markers is not None:
+                markers.close()
+            self._close_counters(gate, counters)
+
+        return ExecutionResult(returncode, usage, status, counts)
+
+    def _command(self, cores: set, gated: bool) -> List[str]:
+        """
+        Return the command line of an execution. Gated executions are pinned by the preexec
+        function only, so no launcher runs after the gate
+        """
+        if gated:
+            return ["sh", "-c", self.GATE, self._executeable] + self._arguments
+
+        return ["taskset", "-c", ProcFS.format_cpu_list(cores), self._executeable] + self._arguments
+
+    @staticmethod
+    def _open_counters(pid: int, perf_events: List[str], gate: Tuple[int, int]) -> PerfCounters:
+        """Open the perf counters of the gated child, then let it execute the program"""
+        read_end, write_end = gate
+        os.close(read_end)
+        try:
+            return PerfCounters(perf_events, pid)
+        finally:
+            os.write(write_end, b"\n")
+            os.close(write_end)
+
+    @staticmethod
+    def _close_counters(gate: Optional[Tuple[int, int]], counters: Optional[PerfCounters]):
+        """Close the gate of a child that was never started and the counters of an execution"""
+        if gate is not None:
+            for fd in gate:
+                os.close(fd)
+        if counters is not None:
+            counters.close()
+
+    @staticmethod
+    def cpu_set(core) -> set:
+        """Return the set of cores a program is pinned to, core is a single core or a set"""
+        return {core} if isinstance(core, int) else set(core)
+
+    @staticmethod
+    def _wait_for_exit(pid: int, timeout: float = None, markers: RegionMarkers = None) -> bool:
+        """
+        Wait until the child exited without reaping it and answer its region markers meanwhile.
+        Returns False if the timeout passed first. Uses a pidfd where available, so no thread
+        or busy loop is needed
+        """
+        if timeout is None and markers is None:
+            return True
+
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        poller = select.poll()
+        if markers is not None:
+            poller.register(markers.fileno(), select.POLLIN)
+
+        try:
+            pidfd = os.pidfd_open(pid)
+            poller.register(pidfd, select.POLLIN)
+        except (AttributeError, OSError):
+            # Kernels before 5.3: check the child without reaping it in short intervals
+            pidfd = None
+
+        try:
+            while True:
+                if pidfd is None and os.waitid(
+                    os.P_PID, pid, os.WEXITED | os.WNOHANG | os.WNOWAIT
+                ) is not None:
+                    break
+
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+
+                # Without a pidfd the poll only waits for markers until the next check
+                wait = remaining * 1000 if remaining is not None else None
+                if pidfd is None:
+                    wait = 1 if wait is None else min(wait, 1)
+
+                events = poller.poll(wait)
+                if any(fd == pidfd for fd, _ in events):
+                    break
+                if events and not markers.handle():
+                    # The program closed its end, only the exit is left to wait for
+                    poller.unregister(markers.fileno())
+        finally:
+            if pidfd is not None:
+                os.close(pidfd)
+
+        if markers is not None:
+            markers.drain()
+        return True
+
+    @staticmethod
+    def _kill_group(pid: int) -> None:
+        """Kill the process group of the given child, including all programs it started"""
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    @staticmethod
+    async def _wait4(pid: int) -> Tuple[int, int, resource.struct_rusage]:
+        """
+        Wait for the child to exit and reap it with os.wait4. Its pidfd becomes readable once it
+        exited, so no thread is blocked while it runs. Kernels without pidfds wait in the
+        reaper threads, one per cpu as at most one program runs per measurement core
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            pidfd = os.pidfd_open(pid)
+        except (AttributeError, OSError):
+            return await loop.run_in_executor(Program._reaper(), os.wait4, pid, 0)
+
+        try:
+            exited = loop.create_future()
+            loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+            try:
+                await exited
+            finally:
+                loop.remove_reader(pidfd)
+        finally:
+            os.close(pidfd)
+
+        return os.wait4(pid, 0)
+
+    @staticmethod
+    def _reaper() -> concurrent.futures.ThreadPoolExecutor:
+        """Return the executor reaping children on kernels without pidfds"""
+        if Program._reaper_executor is None:
+            Program._reaper_executor = concurrent.futures.ThreadPoolExecutor(
+                os.cpu_count(), thread_name_prefix="energy-toolkit-reaper"
+            )
+        return Program._reaper_executor
+
+    async def execute_async( # pylint: disable=too-many-locals,too-many-statements,too-many-branches
+        self,
+        core=0,
+        timeout: float = None,
+        markers: RegionMarkers = None,
+        perf_events: List[str] = None,
+    ) -> "ExecutionResult":
+        """
+        Execute the program on a specific core or set of cores without blocking the event loop.
+        If the awaiting task gets cancelled or the timeout passes, the process group of the
+        running child is killed. Asyncio's child watchers reap with waitpid and drop the
+        resource usage, so the child is started with Popen and reaped by _wait4 instead.
+        Region markers are answered from the event loop
+        """
+        fin = None
+        gate = None
+        counters = None
+        returncode = -1
+        usage = {}
+        counts = {}
+        status = ExecutionStatus.FAILED
+        cores = self.cpu_set(core)
+        loop = asyncio.get_running_loop()
+        try:
+            if self._inputfile != "":
+                fin = open(self._inputfile, "r", encoding="utf-8") # pylint: disable=consider-using-with
+
+            if markers is not None:
+                markers.open()
+
+            if perf_events is not None:
+                gate = os.pipe()
+
+            # Spawning blocks until the exec like in asyncio's own subprocess transport
+            with subprocess.Popen( # pylint: disable=subprocess-popen-preexec-fn
+                self._command(cores, gate is not None),
+                stdin=fin,
+                stdout=subprocess.DEVNULL,
+                stderr=gate[0] if gate is not None else subprocess.DEVNULL,
+                preexec_fn=lambda: os.sched_setaffinity(0, cores),
+                start_new_session=True,
+                pass_fds=(markers.child_fd(),) if markers is not None else (),
+                env=markers.environment() if markers is not None else None,
+            ) as process:
+                if gate is not None:
+                    counters = self._open_counters(process.pid, perf_events, gate)
+                    gate = None
+                if markers is not None:
+                    markers.close_child()
+                    loop.add_reader(markers.fileno(), self._on_marker, loop, markers)
+
+                # The shielded reaper survives timeouts and cancellation, so the killed child
+                # is always reaped before returning
+                reaper = asyncio.ensure_future(self._wait4(process.pid))
+                try:
+                    _, wait_status, rusage = await asyncio.wait_for(
+                        asyncio.shield(reaper), timeout
+                    )
+                except asyncio.TimeoutError:
+                    self._kill_group(process.pid)
+                    _, wait_status, rusage = await reaper
+                    status = ExecutionStatus.TIMEOUT
+                    Logger().get_logger().warning(
+                        "%s exceeded its timeout of %.2f s and was killed", self._executeable,
+                        timeout,
+                    )
+                except asyncio.CancelledError:
+                    # Do not leave an orphaned benchmark running on the measurement core
+                    self._kill_group(process.pid)
+                    _, wait_status, _ = await reaper
+                    process.returncode = os.waitstatus_to_exitcode(wait_status)
+                    raise
+
+                # The child is already reaped, let the Popen object know about it
+                returncode = os.waitstatus_to_exitcode(wait_status)
+                process.returncode = returncode
+
+            usage = ExecutionResult.usage_from_rusage(rusage)
+            if counters is not None:
+                counts = counters.counts()
+
+            if status != ExecutionStatus.TIMEOUT:
+                if returncode != 0:
+                    raise subprocess.CalledProcessError(
+                        returncode, [self._executeable] + self._arguments
                     )
+                status = ExecutionStatus.OK
 
         except Exception as e: # pylint: disable=broad-exception-caught
             Logger().get_logger().error(e)
+        finally:
+            if fin is not None:
+                fin.close()
+            if markers is not None and markers.is_open():
+                loop.remove_reader(markers.fileno())
+                markers.drain()
+                markers.close()
+            self._close_counters(gate, counters)
+
+        return ExecutionResult(returncode, usage, status, counts)
+
+    @staticmethod
+    def _on_marker(loop: asyncio.AbstractEventLoop, markers: RegionMarkers) -> None:
+        """Answer a region marker, stop watching the socket once the program closed its end"""
+        if not markers.handle():
+            loop.remove_reader(markers.fileno())
 
     def get_executeable(self):
         """Return the executeable attribute"""
@@ -66,3 +445,140 @@ class Program:
     def get_inputfile(self):
         """Return the inputfile attribute"""
         return self._inputfile
+
+    def get_warmup(self):
+        """Return the number of warm-up executions"""
+        return self._warmup
+
+    def get_warmup_time(self):
+        """Return the minimal warm-up time in seconds"""
+        return self._warmup_time
+
+    def get_cache_mode(self):
+        """Return the cache mode attribute"""
+        return self._cache_mode
+
+    def get_timeout(self):
+        """Return the timeout of a single execution in seconds or None"""
+        return self._timeout
+
+    def evict_cache(self) -> None:
+        """
+        Evict the executable and the input file of the program from the page cache.
+        Shared libraries used by the program are not evicted
+        """
+        executeable = shutil.which(self._executeable) or self._executeable
+
+        for path in (executeable, self._inputfile):
+            if not path:
+                continue
+
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+
+    def prepare_cache(self) -> None:
+        """Bring the page cache into the state defined by the cache mode"""
+        if self._cache_mode == CacheMode.DROP:
+            ToolkitUtil.drop_page_cache()
+        elif self._cache_mode == CacheMode.EVICT:
+            self.evict_cache()
+
+    def to_dict(self) -> dict:
+        """Return a description of the program and its measurement settings"""
+        return {
+            "executeable": self._executeable,
+            "args": list(self._arguments),
+            "input": self._inputfile,
+            "warmup": self._warmup,
+            "warmup_time": self._warmup_time,
+            "cache_mode": self._cache_mode.name.lower(),
+            "timeout": self._timeout,
+        }
+
+
+class FunctionProgram(Program):
+    """
+    Program that calls a Python callable in the toolkit's process instead of starting an
+    executable. The calling thread is pinned to the measurement cores while the callable runs
+    and its resource usage is recorded. Timeouts and region markers are not supported
+    """
+
+    def __init__( # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        function,
+        args: tuple = (),
+        kwargs: dict = None,
+        warmup: int = 0,
+        warmup_time: float = 0.0,
+    ):
+        """Create a new program calling function(*args, **kwargs)"""
+        super().__init__(
+            f"{function.__module__}.{function.__qualname__}",
+            [repr(arg) for arg in args]
+            + [f"{name}={value!r}" for name, value in (kwargs or {}).items()],
+            warmup=warmup,
+            warmup_time=warmup_time,
+        )
+        self._function = function
+        self._function_args = tuple(args)
+        self._function_kwargs = dict(kwargs or {})
+
+    def get_function(self):
+        """Return the called function"""
+        return self._function
+
+    def execute(
+        self,
+        core=0,
+        timeout: float = None,
+        markers: RegionMarkers = None,
+        perf_events: List[str] = None,
+    ) -> "ExecutionResult":
+        """Call the function on a specific core or set of cores"""
+        status = ExecutionStatus.FAILED
+        affinity = os.sched_getaffinity(0)
+        # Counters of the calling thread count immediately, so they are read around the call
+        counters = PerfCounters(perf_events) if perf_events is not None else None
+        counts_before = counters.read() if counters is not None else None
+        before = resource.getrusage(resource.RUSAGE_THREAD)
+        try:
+            # Only the calling thread is moved, the affinity of other threads stays
+            os.sched_setaffinity(0, self.cpu_set(core))
+            self._function(*self._function_args, **self._function_kwargs)
+            status = ExecutionStatus.OK
+        except Exception as e: # pylint: disable=broad-exception-caught
+            Logger().get_logger().error(e)
+        finally:
+            os.sched_setaffinity(0, affinity)
+        after = resource.getrusage(resource.RUSAGE_THREAD)
+
+        counts = {}
+        if counters is not None:
+            counts = counters.metrics(counts_before, counters.read())
+            counters.close()
+
+        usage = ExecutionResult.usage_from_rusage(after)
+        for name, value in ExecutionResult.usage_from_rusage(before).items():
+            # The maximal resident set size is a high-water mark of the whole process
+            if name != "max_rss":
+                usage[name] -= value
+
+        return ExecutionResult(0 if status == ExecutionStatus.OK else 1, usage, status, counts)
+
+    async def execute_async(
+        self,
+        core=0,
+        timeout: float = None,
+        markers: RegionMarkers = None,
+        perf_events: List[str] = None,
+    ) -> "ExecutionResult":
+        """Call the function in a worker thread without blocking the event loop"""
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.execute, core, timeout, markers, perf_events
+        )
+
+    def evict_cache(self) -> None:
+        """A callable has no files that could be evicted"""
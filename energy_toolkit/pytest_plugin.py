@@ -0,0 +1,273 @@
+"""
+Pytest plugin module.
+Offers the energy_benchmark fixture that measures callables and commands with the toolkit.
+
+The plugin is registered through the pytest11 entry point. Benchmarks are measured one after
+another, also across pytest-xdist workers, while the remaining tests run on the other cores:
+
+    def test_sort(energy_benchmark):
+        result = energy_benchmark(sorted, list(range(100000, 0, -1)))
+        assert result.energy > 0
+
+    def test_command(energy_benchmark):
+        energy_benchmark(["./build/bubblesort", "1000"])
+"""
+
+import fcntl
+import os
+import re
+import shutil
+import tempfile
+from typing import List
+
+import numpy as np
+import pytest
+
+from energy_toolkit.compare import Comparator, Comparison
+from energy_toolkit.energy_toolkit import EnergyToolkit
+from energy_toolkit.procfs import ProcFS
+from energy_toolkit.program import FunctionProgram, Program
+from energy_toolkit.rapl_interface import RAPLInterface
+from energy_toolkit.util import CPU_TYPE, ToolkitUtil
+
+
+class BenchmarkResult:
+    """Data class holding the measurement of a single benchmark and its baseline comparison"""
+
+    name: str = ""
+    path: str = ""
+    results: np.ndarray = None
+    statistics: dict = None
+    comparison: Comparison = None
+
+    def __init__(self, name, path, results, statistics):
+        self.name = name
+        self.path = path
+        self.results = results
+        self.statistics = statistics
+
+    @property
+    def energy(self) -> float:
+        """Mean energy of the datapoints in Joule"""
+        return float(self.statistics["energy"]["mean"])
+
+    @property
+    def time(self) -> float:
+        """Mean time of the datapoints in seconds"""
+        return float(self.statistics["time"]["mean"])
+
+
+class BenchmarkLock:
+    """
+    Exclusive lock on a file shared by all pytest processes of the machine, so only a single
+    benchmark is measured at a time
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._fd = None
+
+    def __enter__(self) -> "BenchmarkLock":
+        self._fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o666)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+
+class EnergyBenchmark:
+    """
+    Measures callables and commands of a single test. Each benchmark is written as result tree
+    <results>/<name>/0/ in the toolkit's format and compared against the tree of the same name
+    in the baseline
+    """
+
+    def __init__(self, config: pytest.Config, name: str):
+        self._config = config
+        self._name = name
+        self._calls = 0
+
+    def _option(self, name: str):
+        return self._config.getoption(name)
+
+    def __call__( # pylint: disable=too-many-arguments
+        self,
+        target,
+        *args,
+        datapoints: int = None,
+        repetitions: int = None,
+        warmup: int = 0,
+        name: str = None,
+        threshold: float = None,
+        **kwargs,
+    ) -> BenchmarkResult:
+        """
+        Measure target, a callable called with args and kwargs or a command given as list of
+        strings. Fails the test if the energy regressed against the baseline by more than the
+        threshold
+        """
+        if callable(target):
+            program = FunctionProgram(target, args, kwargs, warmup=warmup)
+        elif isinstance(target, (list, tuple)) and target:
+            program = Program(target[0], [str(arg) for arg in target[1:]], warmup=warmup)
+        else:
+            raise TypeError("energy_benchmark measures a callable or a non empty command list")
+
+        # Later benchmarks of the same test get a running number unless they are named
+        self._calls += 1
+        if name is None:
+            name = self._name if self._calls == 1 else f"{self._name}_{self._calls}"
+        name = re.sub(r"[^\w.-]", "_", name)
+
+        cores = self.get_cores(self._config)
+        if not self.energy_available(cores):
+            pytest.skip("Energy counters are not readable, run the benchmarks with root rights")
+
+        path = os.path.join(self._option("energy_results"), name)
+        toolkit = EnergyToolkit(
+            datapoints or self._option("energy_datapoints"),
+            repetitions or self._option("energy_repetitions"),
+            cores,
+            [program],
+            path,
+        )
+
+        with BenchmarkLock(self._option("energy_lock")):
+            toolkit.measure()
+
+        toolkit.write_results()
+        toolkit.write_statistics()
+
+        # Programs whose executions kept failing are skipped and have no results
+        outcomes = toolkit.get_outcomes()[0]
+        if outcomes["skipped"]:
+            pytest.fail(
+                f"Benchmark {name} could not be measured: {outcomes['failed']} failed, "
+                f"{outcomes['timeout']} timed out and {outcomes['skipped']} skipped program"
+            )
+
+        result = BenchmarkResult(name, path, toolkit.get_results()[0], toolkit.get_statistics()[0])
+        self._check_baseline(result, threshold)
+        return result
+
+    def _check_baseline(self, result: BenchmarkResult, threshold: float) -> None:
+        """Save the result as new baseline or fail the test if it regressed against it"""
+        baseline = self._option("energy_baseline")
+        if baseline is None:
+            return
+
+        base_path = os.path.join(baseline, result.name)
+        if self._option("energy_save_baseline"):
+            shutil.copytree(result.path, base_path, dirs_exist_ok=True)
+            return
+
+        if not os.path.isdir(base_path):
+            return
+
+        comparator = Comparator(
+            "energy",
+            alpha=self._option("energy_alpha"),
+            threshold=threshold if threshold is not None else self._option("energy_threshold"),
+        )
+        comparisons = comparator.compare_paths(base_path, result.path)
+        if not comparisons:
+            return
+
+        result.comparison = comparisons[0]
+        if result.comparison.regression:
+            pytest.fail(
+                f"Energy regression of {result.name}: median "
+                f"{result.comparison.base_median:.5e} J -> {result.comparison.new_median:.5e} J "
+                f"({100 * result.comparison.get_relative_change():+.1f} %, "
+                f"q = {result.comparison.q_value:.3g})"
+            )
+
+    @staticmethod
+    def get_cores(config: pytest.Config) -> List[int]:
+        """Return the cores benchmarks are measured on, core 0 if none were configured"""
+        cores = config.getoption("energy_core")
+        return sorted(ProcFS.parse_cpu_list(cores)) if cores is not None else [0]
+
+    @staticmethod
+    def energy_available(cores: List[int]) -> bool:
+        """Check whether the energy counters of the cores can be read"""
+        vendor = ToolkitUtil.get_cpu_vendor()
+        if vendor not in (CPU_TYPE.INTEL, CPU_TYPE.AMD):
+            return False
+
+        try:
+            for reader in RAPLInterface.domains(vendor, cores).values():
+                RAPLInterface.read(vendor, reader)
+        except (OSError, SystemError):
+            return False
+
+        return True
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    """Add the options of the energy benchmarks"""
+    group = parser.getgroup("energy-toolkit", "energy benchmarks")
+    group.addoption(
+        "--energy-core",
+        default=None,
+        help="Core or set of cores benchmarks are measured on, e.g. 2 or 0-3. All other tests "
+        "are moved to the remaining cores. Benchmarks run on core 0 if not given.",
+    )
+    group.addoption(
+        "--energy-datapoints", type=int, default=10, help="Datapoints of each benchmark."
+    )
+    group.addoption(
+        "--energy-repetitions",
+        type=int,
+        default=10,
+        help="Repetitions averaged into each datapoint.",
+    )
+    group.addoption(
+        "--energy-results",
+        default=".energy_benchmarks",
+        help="Directory the result trees of the benchmarks are written to.",
+    )
+    group.addoption(
+        "--energy-baseline", default=None, help="Directory holding the baseline result trees."
+    )
+    group.addoption(
+        "--energy-save-baseline",
+        action="store_true",
+        help="Save the benchmarks as new baseline instead of comparing against it.",
+    )
+    group.addoption(
+        "--energy-threshold",
+        type=float,
+        default=0.05,
+        help="Relative increase of the median energy that fails a benchmark.",
+    )
+    group.addoption(
+        "--energy-alpha",
+        type=float,
+        default=0.05,
+        help="Significance level of the comparison against the baseline.",
+    )
+    group.addoption(
+        "--energy-lock",
+        default=os.path.join(tempfile.gettempdir(), "energy-toolkit-benchmarks.lock"),
+        help="Lock file that keeps benchmarks of parallel pytest processes apart.",
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    """Keep the tests of this process off the benchmark cores if cores were configured"""
+    if config.getoption("energy_core", None) is None:
+        return
+
+    others = os.sched_getaffinity(0) - set(EnergyBenchmark.get_cores(config))
+    if others:
+        os.sched_setaffinity(0, others)
+
+
+@pytest.fixture
+def energy_benchmark(request: pytest.FixtureRequest) -> EnergyBenchmark:
+    """Measure callables or commands with the energy-toolkit"""
+    return EnergyBenchmark(request.config, request.node.nodeid)
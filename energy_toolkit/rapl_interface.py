@@ -4,6 +4,12 @@ Offers a singel method to read the energy values of the current system.
 Selects different method depending on the present CPU vendor.
 """
 
+import os
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from energy_toolkit.procfs import ProcFS
 from energy_toolkit.util import CPU_TYPE
 from energy_toolkit import msr_reader
 
@@ -11,11 +17,26 @@ from energy_toolkit import msr_reader
 class RAPLInterface:
     """RAPL register reader abstraction class"""
 
+    # Energy status and unit register of each vendor
+    REGISTERS = {
+        CPU_TYPE.INTEL: (0x639, 0x606),
+        CPU_TYPE.AMD: (0xC001029A, 0xC0010299),
+    }
+
+    # Msr device of each core. ENERGY_TOOLKIT_MSR_PATH redirects all reads and writes, e.g. to
+    # an emulated msr file in tests
+    MSR_PATH = os.environ.get("ENERGY_TOOLKIT_MSR_PATH", "/dev/cpu/{core}/msr")
+
+    @staticmethod
+    def msr_path(core: int) -> str:
+        """Return the path of the msr device of the given core"""
+        return RAPLInterface.MSR_PATH.format(core=core)
+
     @staticmethod
     def read(vendor, core=0):
         """Reads the given core energy counter and returns it"""
         energy = None
-        registerpath = f"/dev/cpu/{core}/msr"
+        registerpath = RAPLInterface.msr_path(core)
 
         if vendor == CPU_TYPE.AMD:
             energy = msr_reader.read_amd_msr(registerpath)
@@ -26,6 +47,59 @@ class RAPLInterface:
 
         return energy
 
+    @staticmethod
+    def domains(vendor, cores: Iterable[int]) -> Dict[str, int]:
+        """
+        Return the energy domains covering the given cores, mapped to the core whose msr device
+        reads the domain. AMD CPUs count per physical core, so hardware threads share a domain.
+        Intel counters cover the whole package
+        """
+        domains = {}
+        for core in sorted(cores):
+            if vendor == CPU_TYPE.AMD:
+                reader = min(ProcFS.read_topology(core, "core_cpus_list"))
+                name = f"core{reader}"
+            elif vendor == CPU_TYPE.INTEL:
+                reader = min(ProcFS.read_topology(core, "package_cpus_list"))
+                name = f"package{ProcFS.read_topology_id(core, 'physical_package_id')}"
+            else:
+                return {f"core{core}": core}
+
+            domains.setdefault(name, reader)
+
+        return domains
+
+    @staticmethod
+    def measure_exec( # pylint: disable=too-many-arguments,too-many-positional-arguments
+        vendor,
+        core: int,
+        path: str,
+        argv: List[str],
+        inputfile: str,
+        energies: np.ndarray,
+        times: np.ndarray,
+    ) -> Tuple[int, int, int]:
+        """
+        Measure executions of the program at path natively until the energies and times arrays
+        are filled or an execution fails. Returns the number of measured repetitions, the exit
+        code of the failed execution (0 if there was none) and the number of overflow retries
+        """
+        if vendor not in RAPLInterface.REGISTERS:
+            raise ValueError(f"Native measurements are not supported on {vendor.name} CPUs")
+
+        energyreg, unitreg = RAPLInterface.REGISTERS[vendor]
+        return msr_reader.measure_exec(
+            RAPLInterface.msr_path(core),
+            energyreg,
+            unitreg,
+            path,
+            argv,
+            core,
+            inputfile,
+            energies,
+            times,
+        )
+
     @staticmethod
     def _read_armsilicon():
         """Dummy function to provide values for apple silicon devices"""
@@ -0,0 +1,95 @@
+"""
+Result reader module.
+Offers methods to read the result trees written by the energy-toolkit.
+"""
+
+import os
+from typing import Dict, List
+
+import click
+import numpy as np
+import yaml
+
+
+class ProgramResult:
+    """Data class for the results of a single program read from a result tree"""
+
+    pid: int = 0
+    columns: Dict[str, np.ndarray] = None
+    program: dict = None
+
+    def __init__(self, pid, columns, program):
+        self.pid = pid
+        self.columns = columns
+        self.program = program
+
+    def get_label(self) -> str:
+        """Return a short human readable label of the program"""
+        if not self.program:
+            return f"PID {self.pid}"
+
+        label = os.path.basename(self.program.get("executeable", ""))
+        args = self.program.get("args") or []
+        if args:
+            label += " " + " ".join(str(arg) for arg in args)
+
+        return label
+
+
+class ResultReader:
+    """
+    Reader for result trees of the form <path>/<pid>/results.csv. Column names are returned
+    in lower case, e.g. "time" and "energy"
+    """
+
+    @staticmethod
+    def read_results_file(path: str) -> Dict[str, np.ndarray]:
+        """Read a single results.csv file into a dict of columns"""
+        with open(path, "r", encoding="utf-8") as f:
+            header = f.readline().lstrip("#").strip()
+            names = [name.strip().lower() for name in header.split(",")]
+
+            data = np.loadtxt(f, delimiter=",", ndmin=2)
+
+        if data.size == 0:
+            data = np.empty((0, len(names)))
+
+        return {name: data[:, i] for i, name in enumerate(names)}
+
+    @staticmethod
+    def read_program(folder: str) -> dict:
+        """Read the program description of a result folder. Returns an empty dict if missing"""
+        path = os.path.join(folder, "program.yaml")
+        if not os.path.exists(path):
+            return {}
+
+        with open(path, "r", encoding="utf-8") as f:
+            return yaml.safe_load(f) or {}
+
+    @staticmethod
+    def read_tree(path: str) -> List[ProgramResult]:
+        """Read all program results under the given path, ordered by their pid"""
+        if not os.path.isdir(path):
+            raise click.ClickException(f"Result path {path} is not a directory.")
+
+        results = []
+        for entry in os.listdir(path):
+            folder = os.path.join(path, entry)
+            results_file = os.path.join(folder, "results.csv")
+
+            # Only numbered folders containing results are part of the tree
+            if not entry.isdigit() or not os.path.exists(results_file):
+                continue
+
+            results.append(
+                ProgramResult(
+                    int(entry),
+                    ResultReader.read_results_file(results_file),
+                    ResultReader.read_program(folder),
+                )
+            )
+
+        if not results:
+            raise click.ClickException(f"No results found under {path}.")
+
+        return sorted(results, key=lambda result: result.pid)
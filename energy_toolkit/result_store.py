@@ -0,0 +1,247 @@
+"""
+Result store module.
+Offers an indexed SQLite database to store and query the results of many campaigns.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from energy_toolkit.util import ToolkitUtil
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hosts (
+    id INTEGER PRIMARY KEY,
+    hostname TEXT NOT NULL,
+    cpu TEXT NOT NULL,
+    kernel TEXT NOT NULL,
+    UNIQUE (hostname, cpu, kernel)
+);
+CREATE TABLE IF NOT EXISTS programs (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    executeable TEXT NOT NULL,
+    args TEXT NOT NULL,
+    input_hash TEXT NOT NULL,
+    UNIQUE (executeable, args, input_hash)
+);
+CREATE TABLE IF NOT EXISTS campaigns (
+    id INTEGER PRIMARY KEY,
+    host_id INTEGER NOT NULL REFERENCES hosts (id),
+    started REAL NOT NULL,
+    datapoints INTEGER NOT NULL,
+    repetitions INTEGER NOT NULL,
+    core TEXT NOT NULL,
+    label TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    campaign_id INTEGER NOT NULL REFERENCES campaigns (id),
+    program_id INTEGER NOT NULL REFERENCES programs (id),
+    pid INTEGER NOT NULL,
+    settings TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS datapoints (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    idx INTEGER NOT NULL,
+    energy REAL NOT NULL,
+    time REAL NOT NULL,
+    metrics TEXT NOT NULL,
+    PRIMARY KEY (run_id, idx)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_programs_name ON programs (name);
+CREATE INDEX IF NOT EXISTS idx_campaigns_host ON campaigns (host_id, started);
+CREATE INDEX IF NOT EXISTS idx_campaigns_started ON campaigns (started);
+CREATE INDEX IF NOT EXISTS idx_runs_program ON runs (program_id, campaign_id);
+CREATE INDEX IF NOT EXISTS idx_runs_campaign ON runs (campaign_id);
+"""
+
+
+class StoredRun:
+    """Data class for the results of one program in one campaign read from the store"""
+
+    campaign: int = 0
+    started: float = 0.0
+    hostname: str = ""
+    label: str = ""
+    executeable: str = ""
+    args: list = None
+    pid: int = 0
+    columns: Dict[str, np.ndarray] = None
+
+    def __init__(self, row, columns):
+        (
+            self.campaign, self.started, self.hostname, self.label,
+            self.executeable, args, self.pid,
+        ) = row
+        self.args = json.loads(args)
+        self.columns = columns
+
+    def get_label(self) -> str:
+        """Return a short human readable label of the run"""
+        started = time.strftime("%Y-%m-%d %H:%M", time.localtime(self.started))
+        return f"{os.path.basename(self.executeable)} #{self.campaign} ({started})"
+
+
+class ResultStore:
+    """
+    SQLite backed store for campaigns, programs, hosts and datapoints. Only uses the sqlite3
+    module of the standard library
+    """
+
+    def __init__(self, path: str):
+        """Open (and if necessary create) the store at the given path"""
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """Close the underlying database connection"""
+        self._connection.close()
+
+    def _get_or_create(self, table: str, values: Dict[str, str]) -> int:
+        """Return the id of the row with the given unique values, insert it if missing"""
+        names = ", ".join(values)
+        placeholders = ", ".join("?" for _ in values)
+        condition = " AND ".join(f"{name} = ?" for name in values)
+
+        self._connection.execute(
+            f"INSERT OR IGNORE INTO {table} ({names}) VALUES ({placeholders})",
+            tuple(values.values()),
+        )
+        return self._connection.execute(
+            f"SELECT id FROM {table} WHERE {condition}", tuple(values.values())
+        ).fetchone()[0]
+
+    def add_campaign( # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+        self,
+        programs: List[dict],
+        results: Dict[int, np.ndarray],
+        datapoints: int,
+        repetitions: int,
+        core,
+        label: str = "",
+    ) -> int:
+        """
+        Store a finished campaign. Programs are given as dicts (see Program.to_dict) and results
+        as the structured arrays of the toolkit. Returns the id of the new campaign
+        """
+        host = ToolkitUtil.get_host_profile()
+
+        with self._connection:
+            host_id = self._get_or_create("hosts", host)
+
+            campaign_id = self._connection.execute(
+                "INSERT INTO campaigns (host_id, started, datapoints, repetitions, core, label) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (host_id, time.time(), datapoints, repetitions, str(core), label),
+            ).lastrowid
+
+            for pid, result in results.items():
+                program = programs[pid]
+                program_id = self._get_or_create(
+                    "programs",
+                    {
+                        "name": os.path.basename(program["executeable"]),
+                        "executeable": program["executeable"],
+                        "args": json.dumps(program["args"]),
+                        "input_hash": ToolkitUtil.hash_file(program["input"]),
+                    },
+                )
+
+                run_id = self._connection.execute(
+                    "INSERT INTO runs (campaign_id, program_id, pid, settings) VALUES (?, ?, ?, ?)",
+                    (campaign_id, program_id, pid, json.dumps(program)),
+                ).lastrowid
+
+                extra = [name for name in result.dtype.names if name not in ("energy", "time")]
+                self._connection.executemany(
+                    "INSERT INTO datapoints (run_id, idx, energy, time, metrics) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (
+                        (
+                            run_id,
+                            idx,
+                            float(row["energy"]),
+                            float(row["time"]),
+                            json.dumps({name: float(row[name]) for name in extra}),
+                        )
+                        for idx, row in enumerate(result)
+                    ),
+                )
+
+        return campaign_id
+
+    def query(
+        self, program: str = None, host: str = None, last: int = None, label: str = None
+    ) -> List[StoredRun]:
+        """
+        Query stored runs, newest campaign first. Programs match by their executable path or
+        name, hosts by their hostname. last limits the result to the newest N runs
+        """
+        conditions = []
+        parameters = []
+        if program is not None:
+            conditions.append("(programs.executeable = ? OR programs.name = ?)")
+            parameters += [program, program]
+        if host is not None:
+            conditions.append("hosts.hostname = ?")
+            parameters.append(host)
+        if label is not None:
+            conditions.append("campaigns.label = ?")
+            parameters.append(label)
+
+        statement = (
+            "SELECT runs.id, campaigns.id, campaigns.started, hosts.hostname, campaigns.label, "
+            "programs.executeable, programs.args, runs.pid FROM runs "
+            "JOIN campaigns ON campaigns.id = runs.campaign_id "
+            "JOIN hosts ON hosts.id = campaigns.host_id "
+            "JOIN programs ON programs.id = runs.program_id"
+        )
+        if conditions:
+            statement += " WHERE " + " AND ".join(conditions)
+        statement += " ORDER BY campaigns.started DESC, campaigns.id DESC, runs.pid"
+        if last is not None:
+            statement += " LIMIT ?"
+            parameters.append(last)
+
+        rows = self._connection.execute(statement, parameters).fetchall()
+        columns = self._read_datapoints([row[0] for row in rows])
+        return [StoredRun(row[1:], columns[row[0]]) for row in rows]
+
+    def _read_datapoints(self, run_ids: List[int]) -> Dict[int, Dict[str, np.ndarray]]:
+        """Read the datapoints of the given runs in one pass into a dict of columns per run"""
+        datapoints: Dict[int, list] = {run_id: [] for run_id in run_ids}
+
+        # Stay below the host parameter limit of older SQLite versions
+        for start in range(0, len(run_ids), 900):
+            chunk = run_ids[start:start + 900]
+            placeholders = ", ".join("?" for _ in chunk)
+            for row in self._connection.execute(
+                "SELECT run_id, energy, time, metrics FROM datapoints "
+                f"WHERE run_id IN ({placeholders}) ORDER BY run_id, idx",
+                chunk,
+            ):
+                datapoints[row[0]].append(row[1:])
+
+        return {run_id: self._to_columns(rows) for run_id, rows in datapoints.items()}
+
+    @staticmethod
+    def _to_columns(rows: list) -> Dict[str, np.ndarray]:
+        """Convert datapoint rows of a single run into a dict of columns"""
+        columns = {
+            "time": np.array([row[1] for row in rows], dtype=float),
+            "energy": np.array([row[0] for row in rows], dtype=float),
+        }
+
+        # Metrics that only some datapoints recorded are nan in the other ones
+        metrics = [json.loads(row[2]) for row in rows]
+        for name in dict.fromkeys(name for m in metrics for name in m):
+            columns[name] = np.array([m.get(name, np.nan) for m in metrics], dtype=float)
+
+        return columns
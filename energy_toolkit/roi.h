@@ -0,0 +1,91 @@
+/*
+ * Region of interest markers for programs measured with the energy-toolkit.
+ *
+ * Header only, include it and mark the regions that should be measured:
+ *
+ *     #include "roi.h"
+ *
+ *     etk_roi_begin("kernel");
+ *     compute();
+ *     etk_roi_end("kernel");
+ *
+ * The toolkit passes a socket in the ENERGY_TOOLKIT_MARKER_FD environment variable. Each marker
+ * is sent as a single packet "B<name>" or "E<name>" and the call returns once the toolkit took
+ * its readings. Without the variable, e.g. when the program runs standalone, all markers are
+ * ignored. The location of this header is printed by
+ * python -c "import energy_toolkit, os; print(os.path.dirname(energy_toolkit.__file__))"
+ */
+
+#ifndef ENERGY_TOOLKIT_ROI_H
+#define ENERGY_TOOLKIT_ROI_H
+
+#include <errno.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/socket.h>
+#include <sys/types.h>
+
+#define ETK_ROI_MAX_NAME 255
+
+/* Return the marker socket, -1 if the program was not started by the toolkit */
+static inline int etk_roi_fd(void)
+{
+    static int fd = -2;
+
+    if (fd == -2) {
+        const char *env = getenv("ENERGY_TOOLKIT_MARKER_FD");
+        char *end = NULL;
+        long value = env != NULL ? strtol(env, &end, 10) : -1;
+
+        fd = (env != NULL && *env != '\0' && *end == '\0' && value >= 0) ? (int)value : -1;
+    }
+
+    return fd;
+}
+
+/* Send a marker and wait until the toolkit took its readings */
+static inline void etk_roi_mark(char kind, const char *name)
+{
+    char message[ETK_ROI_MAX_NAME + 1];
+    size_t length = strlen(name);
+    ssize_t result;
+    char ack;
+    int fd = etk_roi_fd();
+
+    if (fd < 0) {
+        return;
+    }
+
+    if (length > ETK_ROI_MAX_NAME) {
+        length = ETK_ROI_MAX_NAME;
+    }
+
+    message[0] = kind;
+    memcpy(message + 1, name, length);
+
+    do {
+        result = send(fd, message, length + 1, MSG_NOSIGNAL);
+    } while (result < 0 && errno == EINTR);
+
+    if (result < 0) {
+        return;
+    }
+
+    do {
+        result = recv(fd, &ack, 1, 0);
+    } while (result < 0 && errno == EINTR);
+}
+
+/* Mark the beginning of the named region */
+static inline void etk_roi_begin(const char *name)
+{
+    etk_roi_mark('B', name);
+}
+
+/* Mark the end of the named region */
+static inline void etk_roi_end(const char *name)
+{
+    etk_roi_mark('E', name);
+}
+
+#endif /* ENERGY_TOOLKIT_ROI_H */
@@ -0,0 +1,200 @@
+"""
+Region of interest module.
+Offers the marker protocol that lets measured programs report named regions to the toolkit.
+
+The toolkit passes one end of a local socket pair to the measured program and names its file
+descriptor in the ENERGY_TOOLKIT_MARKER_FD environment variable. Each marker is a single packet
+of the form b"B<name>" or b"E<name>". The toolkit takes its energy and time readings and answers
+with a single ACK byte, so the program only continues once the reading was taken. Programs that
+are not started by the toolkit run unchanged, all markers are ignored.
+
+Python programs use the client functions of this module:
+
+    from energy_toolkit import roi
+
+    with roi.region("kernel"):
+        compute()
+
+C programs include roi.h, which implements the same protocol.
+"""
+
+import contextlib
+import os
+import re
+import socket
+import time
+from typing import Callable, Dict, List, Tuple
+
+# Environment variable naming the file descriptor of the marker socket
+MARKER_FD = "ENERGY_TOOLKIT_MARKER_FD"
+
+BEGIN = b"B"
+END = b"E"
+ACK = b"\x06"
+
+# Longest region name in bytes, longer names are truncated
+MAX_NAME = 255
+
+_client: socket.socket = None # pylint: disable=invalid-name
+
+
+def _connect() -> socket.socket:
+    """Return the marker socket passed by the toolkit or None if the program runs standalone"""
+    global _client # pylint: disable=global-statement
+
+    if _client is None and MARKER_FD in os.environ:
+        try:
+            _client = socket.socket(fileno=int(os.environ[MARKER_FD]))
+        except (ValueError, OSError):
+            # Not started by the toolkit or the descriptor was closed, markers stay disabled
+            del os.environ[MARKER_FD]
+
+    return _client
+
+
+def _mark(kind: bytes, name: str) -> None:
+    """Send a marker and wait until the toolkit took its readings"""
+    client = _connect()
+    if client is None:
+        return
+
+    client.sendall(kind + name.encode("utf-8")[:MAX_NAME])
+    client.recv(1)
+
+
+def begin(name: str) -> None:
+    """Mark the beginning of the named region"""
+    _mark(BEGIN, name)
+
+
+def end(name: str) -> None:
+    """Mark the end of the named region"""
+    _mark(END, name)
+
+
+@contextlib.contextmanager
+def region(name: str):
+    """Context manager marking the enclosed code as the named region"""
+    begin(name)
+    try:
+        yield
+    finally:
+        end(name)
+
+
+class RegionMarkers:
+    """
+    Toolkit side of the marker protocol. Records the energy and the time spent in each named
+    region of a single execution. Regions may be nested and entered repeatedly, the values of
+    repeated entries are summed up
+    """
+
+    def __init__(self, read_energy: Callable[[], float]):
+        """Create the markers, read_energy returns the current energy counter in Joule"""
+        self._read_energy = read_energy
+        self._socket: socket.socket = None
+        self._child: socket.socket = None
+
+        # Readings at the beginning of the currently open regions
+        self._open: Dict[str, List[Tuple[float, float]]] = {}
+        # Energy, time and number of entries of the finished regions
+        self._regions: Dict[str, List[float]] = {}
+
+    def open(self) -> None:
+        """Create the socket pair of a new execution and reset the recorded regions"""
+        self._socket, self._child = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self._child.set_inheritable(True)
+
+        self._open = {}
+        self._regions = {}
+
+    def child_fd(self) -> int:
+        """Return the file descriptor to pass to the measured program"""
+        return self._child.fileno()
+
+    def environment(self) -> Dict[str, str]:
+        """Return the environment of the measured program"""
+        return dict(os.environ, **{MARKER_FD: str(self.child_fd())})
+
+    def close_child(self) -> None:
+        """Close the toolkit's copy of the child end once the program was started"""
+        if self._child is not None:
+            self._child.close()
+            self._child = None
+
+    def close(self) -> None:
+        """Close the socket pair of the current execution"""
+        self.close_child()
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def is_open(self) -> bool:
+        """Return whether the socket pair of an execution is open"""
+        return self._socket is not None
+
+    def fileno(self) -> int:
+        """Return the file descriptor to wait on for markers"""
+        return self._socket.fileno()
+
+    def handle(self, block=True) -> bool:
+        """
+        Receive and answer a single marker. Returns False once the program closed its end or
+        no marker is pending without blocking
+        """
+        try:
+            message = self._socket.recv(MAX_NAME + 1, 0 if block else socket.MSG_DONTWAIT)
+        except (BlockingIOError, ConnectionResetError):
+            return False
+
+        if not message:
+            return False
+
+        # Take the readings before the program may continue
+        energy = self._read_energy()
+        now = time.perf_counter()
+
+        kind, name = message[:1], message[1:].decode("utf-8", "replace")
+        if kind == BEGIN:
+            self._open.setdefault(name, []).append((energy, now))
+        elif kind == END and self._open.get(name):
+            energy_before, time_before = self._open[name].pop()
+            values = self._regions.setdefault(name, [0.0, 0.0, 0])
+            values[0] += energy - energy_before
+            values[1] += now - time_before
+            values[2] += 1
+
+        try:
+            self._socket.send(ACK)
+        except OSError:
+            # The program exited without waiting for the answer
+            pass
+
+        return True
+
+    def drain(self) -> None:
+        """Answer all markers that are still pending after the program exited"""
+        while self.handle(block=False):
+            pass
+
+    def get_regions(self) -> Dict[str, Tuple[float, float, int]]:
+        """Return the energy in Joule, the time in seconds and the entries of each region"""
+        return {name: tuple(values) for name, values in self._regions.items()}
+
+    def get_unclosed(self) -> List[str]:
+        """Return the names of regions that were begun but never ended"""
+        return [name for name, entries in self._open.items() if entries]
+
+    def metrics(self) -> Dict[str, float]:
+        """Return the energy and time of each region as additional repetition values"""
+        metrics = {}
+        for name, (energy, duration, _) in self._regions.items():
+            column = re.sub(r"\W", "_", name).lower()
+            metrics[f"region_{column}_energy"] = energy
+            metrics[f"region_{column}_time"] = duration
+
+        return metrics
+
+    def valid(self) -> bool:
+        """Return whether no region saw a negative energy delta (a counter overflow)"""
+        return all(values[0] >= 0 for values in self._regions.values())
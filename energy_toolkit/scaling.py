@@ -0,0 +1,207 @@
+"""
+Scaling module.
+Offers the fit of complexity models to energy and time measured across input sizes.
+"""
+
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from energy_toolkit.program import Program
+
+
+class ScalingFit:
+    """Data class holding a complexity model fitted to one metric"""
+
+    model: str = ""
+    intercept: float = 0.0
+    slope: float = 0.0
+    r_squared: float = 0.0
+    rss: float = 0.0
+    size: int = 0
+    prediction: float = 0.0
+    ci_low: float = 0.0
+    ci_high: float = 0.0
+
+    def __init__(self, model, intercept, slope):
+        self.model = model
+        self.intercept = intercept
+        self.slope = slope
+
+    def evaluate(self, sizes: np.ndarray) -> np.ndarray:
+        """Return the values the model predicts for the given sizes"""
+        return ScalingAnalysis.evaluate(
+            self.model, np.array(self.intercept), np.array(self.slope), np.asarray(sizes, float)
+        )
+
+    def get_per_element(self) -> float:
+        """Return the predicted value per input element at the prediction size"""
+        return self.prediction / self.size if self.size else float("nan")
+
+    def __str__(self):
+        if self.model == "power law":
+            return f"{np.exp(self.intercept):.4e} * n^{self.slope:.3f}"
+        return f"{self.intercept:.4e} + {self.slope:.4e} * {self.model}"
+
+
+class ScalingAnalysis:
+    """
+    Fits complexity models to values measured across input sizes. Every model has the form
+    y = a + b * f(n) with f(n) = n, n log n or n^2, the power law y = a * n^b is fitted in log
+    space. All models and all bootstrap resamples are fitted in one vectorized least squares
+    pass. As every model has two parameters, the residual sum of squares selects the best one.
+    """
+
+    MODELS = ("n", "n log n", "n^2", "power law")
+
+    def __init__(self, resamples=1000, alpha=0.05, seed=None):
+        self._resamples = resamples
+        self._alpha = alpha
+        self._rng = np.random.default_rng(seed)
+
+    @staticmethod
+    def expand_arguments(arguments: List[str], size: int) -> List[str]:
+        """Replace the {n} placeholder in each argument with the given size"""
+        return [argument.replace("{n}", str(size)) for argument in arguments]
+
+    @staticmethod
+    def create_programs(
+        executeable: str, arguments: List[str], inputfile: str, sizes: List[int], **settings
+    ) -> List[Program]:
+        """Create one program per size from argument and input file templates"""
+        return [
+            Program(
+                executeable,
+                ScalingAnalysis.expand_arguments(arguments, size),
+                inputfile.replace("{n}", str(size)),
+                **settings,
+            )
+            for size in sizes
+        ]
+
+    @staticmethod
+    def features(model: str, sizes: np.ndarray) -> np.ndarray:
+        """Return f(n) of the given model, log n for the power law"""
+        if model == "n":
+            return sizes
+        if model == "n log n":
+            return sizes * np.log(sizes)
+        if model == "n^2":
+            return sizes ** 2
+        if model == "power law":
+            return np.log(sizes)
+
+        raise ValueError(f"Unknown model '{model}'")
+
+    @staticmethod
+    def evaluate(
+        model: str, intercept: np.ndarray, slope: np.ndarray, sizes: np.ndarray
+    ) -> np.ndarray:
+        """Evaluate the model for broadcastable coefficients and sizes"""
+        if model == "power law":
+            return np.exp(intercept) * sizes ** slope
+        return intercept + slope * ScalingAnalysis.features(model, sizes)
+
+    @staticmethod
+    def least_squares(x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Closed form least squares of y = a + b * x along the last axis. Returns a and b with the
+        shape of the leading axes, nan where x is constant
+        """
+        x_mean = x.mean(axis=-1, keepdims=True)
+        y_mean = y.mean(axis=-1, keepdims=True)
+        dx = x - x_mean
+
+        variance = (dx ** 2).sum(axis=-1)
+        covariance = (dx * (y - y_mean)).sum(axis=-1)
+
+        slope = np.divide(
+            covariance, variance, out=np.full(variance.shape, np.nan), where=variance > 0
+        )
+        intercept = y_mean[..., 0] - slope * x_mean[..., 0]
+        return intercept, slope
+
+    def fit(self, sizes: np.ndarray, values: np.ndarray, predict_size: int) -> List[ScalingFit]:
+        """
+        Fit all models to the values measured at the given sizes and predict the value at
+        predict_size. Returns the fits ordered from best to worst
+        """
+        sizes = np.asarray(sizes, dtype=float)
+        values = np.asarray(values, dtype=float)
+
+        if len(np.unique(sizes)) < 3:
+            raise ValueError("At least three different sizes are needed to fit a model")
+
+        # The power law can only be fitted to positive values
+        models = [m for m in self.MODELS if m != "power law" or np.all(values > 0)]
+        x = np.stack([self.features(m, sizes) for m in models])
+        y = np.stack([np.log(values) if m == "power law" else values for m in models])
+
+        intercept, slope = self.least_squares(x, y)
+
+        # Resample the values within each size, shape (models, resamples, pairs)
+        indices = self._resample_within_sizes(sizes)
+        boot_intercept, boot_slope = self.least_squares(x[:, indices], y[:, indices])
+
+        total = ((values - values.mean()) ** 2).sum()
+        fits = []
+        for i, model in enumerate(models):
+            fit = ScalingFit(model, float(intercept[i]), float(slope[i]))
+
+            # Residuals in the original scale keep the power law comparable
+            fit.rss = float(((values - fit.evaluate(sizes)) ** 2).sum())
+            fit.r_squared = 1.0 - fit.rss / total if total > 0 else 1.0
+
+            fit.size = predict_size
+            fit.prediction = float(fit.evaluate(predict_size))
+            predictions = self.evaluate(
+                model, boot_intercept[i], boot_slope[i], float(predict_size)
+            )
+            fit.ci_low, fit.ci_high = (
+                float(v)
+                for v in np.nanpercentile(
+                    predictions, [100 * self._alpha / 2, 100 * (1 - self._alpha / 2)]
+                )
+            )
+            fits.append(fit)
+
+        return sorted(fits, key=lambda fit: fit.rss)
+
+    def _resample_within_sizes(self, sizes: np.ndarray) -> np.ndarray:
+        """
+        Draw bootstrap indices that keep the number of values measured at each size, so every
+        resample covers all sizes
+        """
+        order = np.argsort(sizes, kind="stable")
+        _, starts, counts = np.unique(sizes[order], return_index=True, return_counts=True)
+
+        # Group of every position in the sorted order
+        groups = np.repeat(np.arange(len(counts)), counts)
+        draws = self._rng.random((self._resamples, len(sizes)))
+        positions = starts[groups] + (draws * counts[groups]).astype(int)
+
+        return order[positions]
+
+    @staticmethod
+    def per_element(sizes: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the distinct sizes and the mean value per input element at each size"""
+        distinct, inverse = np.unique(sizes, return_inverse=True)
+        means = np.bincount(inverse, weights=values) / np.bincount(inverse)
+        return distinct, means / distinct
+
+    @staticmethod
+    def write(path: str, fits: Dict[str, List[ScalingFit]]) -> None:
+        """Write the fits of all metrics to scaling.csv in the given folder, best fits first"""
+        with open(os.path.join(path, "scaling.csv"), "w", encoding="utf-8") as f:
+            f.write(
+                "# Metric,Model,Intercept,Slope,R_squared,Size,Prediction,Ci_low,Ci_high,"
+                "Per_element\n"
+            )
+            for metric, metric_fits in fits.items():
+                for fit in metric_fits:
+                    f.write(
+                        f"{metric},{fit.model},{fit.intercept},{fit.slope},{fit.r_squared},"
+                        f"{fit.size},{fit.prediction},{fit.ci_low},{fit.ci_high},"
+                        f"{fit.get_per_element()}\n"
+                    )
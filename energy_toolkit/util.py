@@ -3,20 +3,29 @@ Util module that offers several helper classes and functions
 """
 
 from enum import Enum
+from typing import Dict
+import functools
+import hashlib
+import inspect
+import os
 import platform
+import socket
 import cpuinfo
 
 
 class Datapoint:
     """Data class for managing measurement values inside the toolkit. 
-    Each datapoint stores the recorded energy and the duration of the execution"""
+    Each datapoint stores the recorded energy and the duration of the execution.
+    Additional averaged per-repetition values (e.g. performance counters) are kept in metrics"""
 
     energy: float = 0.0
     time: float = 0.0
+    metrics: Dict[str, float] = None
 
-    def __init__(self, eng, t):
+    def __init__(self, eng, t, metrics=None):
         self.energy = eng
         self.time = t
+        self.metrics = metrics if metrics is not None else {}
 
 
 class OS_TYPE(Enum): # pylint: disable=invalid-name
@@ -72,6 +81,94 @@ class ToolkitUtil:
 
         return CPU_TYPE.UNSUPPORTED
 
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def get_host_profile() -> Dict[str, str]:
+        """Returns a description of the executing host used to tell measurements apart"""
+        info = cpuinfo.get_cpu_info()
+
+        return {
+            "hostname": socket.gethostname(),
+            "cpu": info.get("brand_raw", ""),
+            "kernel": platform.release(),
+        }
+
+    @staticmethod
+    def hash_file(path: str) -> str:
+        """Returns the sha256 hex digest of the given file or an empty string if there is none"""
+        if not path or not os.path.isfile(path):
+            return ""
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+
+        return digest.hexdigest()
+
+    @staticmethod
+    def hash_code(function) -> str:
+        """
+        Returns the sha256 hex digest of the bytecode of the given function, including nested
+        functions, or an empty string if it has no Python code. Functions it calls are not hashed
+        """
+        while isinstance(function, functools.partial):
+            function = function.func
+        code = getattr(inspect.unwrap(function), "__code__", None)
+        if code is None:
+            return ""
+
+        digest = hashlib.sha256()
+
+        def update(code) -> None:
+            digest.update(getattr(code, "co_qualname", code.co_name).encode("utf-8"))
+            digest.update(code.co_code)
+            digest.update(repr(code.co_names).encode("utf-8"))
+            for const in code.co_consts:
+                if inspect.iscode(const):
+                    update(const)
+                elif isinstance(const, frozenset):
+                    # The order of sets of strings changes with the hash seed of the process
+                    digest.update(repr(sorted(map(repr, const))).encode("utf-8"))
+                else:
+                    digest.update(repr(const).encode("utf-8"))
+
+        update(code)
+        return digest.hexdigest()
+
+    @staticmethod
+    def drop_page_cache() -> None:
+        """Write back dirty pages and drop the clean page cache of the whole system"""
+        os.sync()
+        with open("/proc/sys/vm/drop_caches", "w", encoding="utf-8") as f:
+            f.write("1\n")
+
+
+class CacheMode(Enum):
+    """
+    Enum to distinguish the page cache state programs are measured in
+    """
+    WARM = 0  # Leave the page cache untouched
+    DROP = 1  # Drop the whole page cache before each repetition
+    EVICT = 2  # Evict the program's executable and input file before each repetition
+    UNDEFINED = 3
+
+    @classmethod
+    def str_to_cachemode(cls, modestr: str):
+        """
+        Converts a given string to a CacheMode entry
+        """
+        if modestr == "warm":
+            return CacheMode.WARM
+
+        if modestr == "drop":
+            return CacheMode.DROP
+
+        if modestr == "evict":
+            return CacheMode.EVICT
+
+        return CacheMode.UNDEFINED
+
 
 class PlotMode(Enum):
     """
@@ -80,6 +177,9 @@ class PlotMode(Enum):
     LINECHART = 0
     BARCHART = 1
     UNDEFINED = 2
+    HISTOGRAM = 3
+    ECDF = 4
+    VIOLIN = 5
 
     @classmethod
     def str_to_plotmode(cls, modestr: str):
@@ -92,4 +192,75 @@ class PlotMode(Enum):
         if modestr == "line":
             return PlotMode.LINECHART
 
+        if modestr == "histogram":
+            return PlotMode.HISTOGRAM
+
+        if modestr == "ecdf":
+            return PlotMode.ECDF
+
+        if modestr == "violin":
+            return PlotMode.VIOLIN
+
         return PlotMode.UNDEFINED
+
+
+class ExecutionStatus(Enum):
+    """
+    Enum to distinguish the outcome of a single program execution
+    """
+    OK = 0
+    FAILED = 1  # Nonzero exit code or the program could not be started
+    TIMEOUT = 2  # Killed after exceeding its timeout
+
+
+class FailurePolicy(Enum):
+    """
+    Enum to distinguish how failed or timed out repetitions are handled
+    """
+    RETRY = 0  # Measure the repetition again, skip the program once the retries are exhausted
+    SKIP = 1  # Skip the remaining measurements of the program
+    ABORT = 2  # Abort the whole campaign
+    UNDEFINED = 3
+
+    @classmethod
+    def str_to_failurepolicy(cls, policystr: str):
+        """
+        Converts a given string to a FailurePolicy entry
+        """
+        if policystr == "retry":
+            return FailurePolicy.RETRY
+
+        if policystr == "skip":
+            return FailurePolicy.SKIP
+
+        if policystr == "abort":
+            return FailurePolicy.ABORT
+
+        return FailurePolicy.UNDEFINED
+
+
+class InterferencePolicy(Enum):
+    """
+    Enum to distinguish how repetitions disturbed by foreign activity on the measurement cores
+    are handled
+    """
+    OFF = 0  # Do not monitor foreign activity
+    FLAG = 1  # Keep disturbed repetitions and count them
+    REMEASURE = 2  # Measure disturbed repetitions again, keep them once the retries are exhausted
+    UNDEFINED = 3
+
+    @classmethod
+    def str_to_interferencepolicy(cls, policystr: str):
+        """
+        Converts a given string to an InterferencePolicy entry
+        """
+        if policystr == "off":
+            return InterferencePolicy.OFF
+
+        if policystr == "flag":
+            return InterferencePolicy.FLAG
+
+        if policystr == "remeasure":
+            return InterferencePolicy.REMEASURE
+
+        return InterferencePolicy.UNDEFINED
@@ -19,10 +19,12 @@ void insertionsort(std::vector<int> v) {
     }
 }
 
-int main(){
+int main(int argc, char** argv){
+    // The list length can be passed as first argument, e.g. for scaling analyses
+    const int length = argc > 1 ? std::atoi(argv[1]) : LISTLENGTH;
     std::vector<int> numberlist;
 
-    for (int i = LISTLENGTH - 1; i >= 0 ; i--) {
+    for (int i = length - 1; i >= 0 ; i--) {
         numberlist.push_back(i);
     }
 
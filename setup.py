@@ -7,6 +7,8 @@ setup(
     name="energy_toolkit",
     version="1.0.8",
     packages=find_packages(),
+    # Header of the region of interest markers for measured C programs
+    package_data={"energy_toolkit": ["roi.h"]},
     description="Provides functionality to benchmark a program and measure time and energy during execution.",
     long_description=open("README.md").read(),
     long_description_content_type="text/markdown",
@@ -26,10 +28,17 @@ setup(
         "plotly>=6.3.1",
         "kaleido>=1.1.0"
     ],
+    extras_require={
+        "pytest": ["pytest>=7.0"],
+    },
     entry_points={
         "console_scripts": [
             "energy-toolkit = energy_toolkit.cli:cli",
         ],
+        # Provides the energy_benchmark fixture
+        "pytest11": [
+            "energy_toolkit = energy_toolkit.pytest_plugin",
+        ],
     },
     ext_modules=[msr_extension]
 )
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+from energy_toolkit.attribution import EnergyAttribution
+from energy_toolkit.energy_toolkit import EnergyToolkit
+from energy_toolkit.procfs import ProcFS
+from energy_toolkit.program import Program
+from energy_toolkit.util import CPU_TYPE
+
+BUSY_LOOP = "import time\nend = time.time() + 0.3\nwhile time.time() < end: pass"
+
+
+class TestAttribution(unittest.TestCase):
+
+    def test_descendants_cpu_time(self):
+        """Living children of the toolkit are found with their cpu time"""
+        seen = 0.0
+        child = subprocess.Popen([sys.executable, "-c", BUSY_LOOP])
+        try:
+            # The child needs a few ticks before its cpu time shows up
+            while child.poll() is None and seen == 0:
+                seen = ProcFS.read_descendants_cpu_time(os.getpid())
+        finally:
+            child.wait()
+
+        self.assertGreater(seen, 0.0)
+        # Reaped children are no longer part of the tree
+        self.assertEqual(ProcFS.read_descendants_cpu_time(os.getpid()), 0.0)
+
+    def test_attributed_share(self):
+        """The attributed energy never exceeds the energy of the domain"""
+        core = min(os.sched_getaffinity(0))
+        attribution = EnergyAttribution(CPU_TYPE.UNSUPPORTED, core, interval=0.01)
+        self.assertEqual(attribution.get_domain(), {core})
+
+        # The sampler reads a counter rising by one joule per read
+        readings = iter(range(1, 1000))
+        with mock.patch(
+            "energy_toolkit.attribution.RAPLInterface.read", side_effect=lambda *_: next(readings)
+        ):
+            attribution.prepare()
+            attribution.start(0.0)
+            subprocess.run([sys.executable, "-c", BUSY_LOOP], check=True)
+            attributed = attribution.stop(1000.0)
+
+        self.assertGreater(attributed, 0.0)
+        self.assertLessEqual(attributed, 1000.0)
+
+    def test_sampler_affinity(self):
+        """The sampler thread runs off the measurement core if there are other cores"""
+        available = os.sched_getaffinity(0)
+        core = min(available)
+        attribution = EnergyAttribution(CPU_TYPE.UNSUPPORTED, core)
+
+        self.assertEqual(
+            os.sched_getaffinity(attribution._thread.native_id), (available - {core}) or available
+        )
+        # The toolkit itself keeps its affinity
+        self.assertEqual(os.sched_getaffinity(0), available)
+
+    def test_baseline_outside_timer(self):
+        """The baselines of the attribution are taken before the timed section starts"""
+        toolkit = EnergyToolkit(1, 1, programs=[Program("true")])
+        trace = []
+        readings = iter(range(1, 100))
+
+        def read_energy():
+            trace.append("energy")
+            return [next(readings)]
+
+        def perf_counter():
+            trace.append("time")
+            return 0.0
+
+        toolkit._attribution = mock.Mock()
+        toolkit._attribution.prepare.side_effect = lambda: trace.append("prepare")
+        toolkit._attribution.start.side_effect = lambda _: trace.append("start")
+        toolkit._attribution.stop.side_effect = lambda _: trace.append("stop") or 0.0
+
+        runs = (toolkit.measure, lambda: asyncio.run(toolkit.run_async()))
+        for run in runs:
+            trace.clear()
+            with mock.patch.object(toolkit, "_read_energy", side_effect=read_energy), \
+                    mock.patch("energy_toolkit.energy_toolkit.time.perf_counter", perf_counter):
+                run()
+
+            measured = trace[trace.index("prepare"):]
+            self.assertEqual(
+                measured[:7], ["prepare", "time", "energy", "start", "energy", "time", "stop"]
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
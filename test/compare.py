@@ -0,0 +1,46 @@
+import math
+import unittest
+
+import numpy as np
+from energy_toolkit.compare import Comparator
+from energy_toolkit.result_reader import ProgramResult
+
+
+class TestComparator(unittest.TestCase):
+
+    def test_mann_whitney(self):
+        """The vectorized test matches the textbook normal approximation"""
+        a = np.array([[1.0, 2.0, 3.0, 4.0, 5.0], [1.0, 1.0, 2.0, 2.0, 3.0]])
+        b = np.array([[6.0, 7.0, 8.0, 9.0, 10.0], [1.0, 1.0, 2.0, 2.0, 3.0]])
+
+        u_stat, p_values = Comparator.mann_whitney(a, b)
+        self.assertEqual(u_stat.tolist(), [25.0, 12.5])
+        self.assertAlmostEqual(p_values[0], 0.01219, places=4)
+        self.assertAlmostEqual(p_values[1], 1.0)
+
+    def test_normal_two_sided(self):
+        """The vectorized normal tail matches erfc, also far out in the tail"""
+        z = np.array([0.0, 0.5, 1.96, 3.0, 6.0, 10.0])
+        expected = [math.erfc(value / math.sqrt(2.0)) for value in z]
+        np.testing.assert_allclose(Comparator.normal_two_sided(z), expected, rtol=2e-7)
+
+    def test_benjamini_hochberg(self):
+        """Adjusted p-values are monotone and capped at one"""
+        q_values = Comparator.benjamini_hochberg(np.array([0.01, 0.04, 0.03, 0.5]))
+        np.testing.assert_allclose(q_values, [0.04, 0.16 / 3, 0.16 / 3, 0.5])
+
+    def test_regression_detected(self):
+        """Only the program with increased energy is reported as regression"""
+        rng = np.random.default_rng(1)
+        base, new = [], []
+        for pid, shift in enumerate([0.0, 0.5, -0.5]):
+            base.append(ProgramResult(pid, {"energy": rng.normal(10, 0.1, 50)}, {}))
+            new.append(ProgramResult(pid, {"energy": rng.normal(10 + shift, 0.1, 50)}, {}))
+
+        comparisons = Comparator(resamples=200, seed=1).compare(base, new)
+        self.assertEqual([c.regression for c in comparisons], [False, True, False])
+        self.assertTrue(comparisons[2].significant)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import unittest
+from unittest import mock
+
+import click
+
+from energy_toolkit.cli import CoreSetType
+from energy_toolkit.procfs import ProcFS
+from energy_toolkit.program import Program
+from energy_toolkit.rapl_interface import RAPLInterface
+from energy_toolkit.util import CPU_TYPE, ExecutionStatus
+
+# Two packages with four physical cores each, cpus n and n + 8 are hardware threads
+TOPOLOGY = {
+    "core_cpus_list": lambda core: {core % 8, core % 8 + 8},
+    "package_cpus_list": lambda core: set(range(core % 8 // 4 * 4, core % 8 // 4 * 4 + 4))
+    | set(range(core % 8 // 4 * 4 + 8, core % 8 // 4 * 4 + 12)),
+}
+
+
+class TestCoreSets(unittest.TestCase):
+
+    def test_core_set_type(self):
+        """Core lists are parsed, unknown cores are rejected"""
+        self.assertEqual(CoreSetType().convert("0", None, None), {0})
+        with self.assertRaises(click.BadParameter):
+            CoreSetType().convert(f"0-{os.cpu_count()}", None, None)
+        with self.assertRaises(click.BadParameter):
+            CoreSetType().convert("a-b", None, None)
+
+    @mock.patch.object(ProcFS, "read_topology", lambda core, name: TOPOLOGY[name](core))
+    @mock.patch.object(ProcFS, "read_topology_id", lambda core, name: core % 8 // 4)
+    def test_domains(self):
+        """AMD sets count every physical core once, Intel sets every covered package"""
+        cores = ProcFS.parse_cpu_list("0-1,8,5")
+
+        self.assertEqual(
+            RAPLInterface.domains(CPU_TYPE.AMD, cores), {"core0": 0, "core1": 1, "core5": 5}
+        )
+        self.assertEqual(
+            RAPLInterface.domains(CPU_TYPE.INTEL, cores), {"package0": 0, "package1": 4}
+        )
+
+    def test_execute_on_set(self):
+        """Programs are pinned to the whole set"""
+        cores = os.sched_getaffinity(0)
+        result = Program("true").execute(cores)
+
+        self.assertEqual(result.status, ExecutionStatus.OK)
+        self.assertEqual(Program.cpu_set(3), {3})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import json
+import os
+import tempfile
+import unittest
+import urllib.request
+from unittest import mock
+
+import numpy as np
+
+from energy_toolkit.dashboard import Dashboard, ResultStreamer, ResultTail, RunningStatistics
+from energy_toolkit.energy_toolkit import EnergyToolkit
+from energy_toolkit.events import DatapointEvent
+from energy_toolkit.program import Program
+from energy_toolkit.util import Datapoint, FailurePolicy
+
+
+class TestDashboard(unittest.TestCase):
+    toolkit: EnergyToolkit = None
+    path: str = ""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.toolkit = EnergyToolkit(
+            datapoints=3, repetitions=1, programs=[Program("prog", ["1"])], resultpath=self.path
+        )
+        ResultStreamer(self.toolkit, self.path)
+
+    def _stream(self, datapoints):
+        for index, datapoint in enumerate(datapoints):
+            self.toolkit._emit("on_datapoint", DatapointEvent(0, index, datapoint))
+
+    def test_running_statistics(self):
+        """Welford's updates match the batch statistics"""
+        values = np.random.default_rng(1).normal(5.0, 2.0, 500)
+        running = RunningStatistics()
+        for value in values:
+            running.update(value)
+
+        self.assertEqual(running.count, 500)
+        self.assertAlmostEqual(running.mean, values.mean())
+        self.assertAlmostEqual(running.get_variance(), values.var(ddof=1))
+        low, high = running.get_interval(0.05)
+        self.assertAlmostEqual(high - low, 2 * 1.959964 * values.std(ddof=1) / np.sqrt(500), 5)
+
+    def test_streamed_results_match_written_results(self):
+        """Streamed rows are identical to the files written after the campaign"""
+        datapoints = [Datapoint(1.5 + i, 0.1 * i, {"cycles": 10.0 * i}) for i in range(3)]
+        self._stream(datapoints)
+
+        with open(os.path.join(self.path, "0", "results.partial.csv"), encoding="utf-8") as f:
+            streamed = f.read()
+
+        self.toolkit._store_results({0: datapoints})
+        self.toolkit.write_results()
+        with open(os.path.join(self.path, "0", "results.csv"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), streamed)
+        # The written results replace the streamed ones
+        self.assertEqual(sorted(os.listdir(os.path.join(self.path, "0"))),
+                         ["program.yaml", "results.csv"])
+
+    def test_tail_reads_appended_rows(self):
+        """Only complete appended lines are read, replaced files are read again"""
+        tail = ResultTail(self.path)
+        self._stream([Datapoint(2.0, 1.0), Datapoint(4.0, 1.0)])
+        tail.poll()
+
+        update = tail.get_update()
+        self.assertEqual(update["programs"]["0"]["columns"]["energy"], [2.0, 4.0])
+        self.assertEqual(update["programs"]["0"]["label"], "prog 1")
+        self.assertEqual(update["programs"]["0"]["statistics"]["energy"]["mean"], 3.0)
+
+        # A partial line is left for the next poll
+        with open(os.path.join(self.path, "0", "results.partial.csv"), "a", encoding="utf-8") as f:
+            f.write("1.0,6")
+        tail.poll()
+        pending = tail.get_update(update["sequence"], 0)
+        self.assertEqual(pending["programs"]["0"]["columns"]["energy"], [])
+
+        with open(os.path.join(self.path, "0", "results.partial.csv"), "a", encoding="utf-8") as f:
+            f.write(".0\n")
+        tail.poll()
+        newer = tail.get_update(update["sequence"], 0)
+        self.assertEqual(newer["programs"]["0"]["start"], 2)
+        self.assertEqual(newer["programs"]["0"]["columns"]["energy"], [6.0])
+        self.assertEqual(newer["programs"]["0"]["statistics"]["energy"]["count"], 3)
+
+        # A new campaign replaces the file and invalidates the rows handed out
+        self._stream([Datapoint(8.0, 1.0)])
+        tail.poll()
+        replaced = tail.get_update(newer["sequence"], 0)
+        self.assertEqual(replaced["generation"], 1)
+        self.assertEqual(replaced["programs"]["0"]["columns"]["energy"], [8.0])
+
+        # The final results replace the partial ones once they are written
+        self.toolkit._store_results({0: [Datapoint(8.0, 1.0)]})
+        self.toolkit.write_results()
+        tail.poll()
+        final = tail.get_update(replaced["sequence"], 1)
+        self.assertEqual(final["generation"], 2)
+        self.assertEqual(final["programs"]["0"]["columns"]["energy"], [8.0])
+        self.assertEqual(final["programs"]["0"]["label"], "prog 1")
+
+    def test_skipped_program(self):
+        """Streamed results of skipped programs are removed right away"""
+        marker = os.path.join(self.path, "marker")
+        # Succeeds for the first datapoint only
+        failing = Program("sh", ["-c", f"test -e {marker} && exit 1; touch {marker}"])
+        toolkit = EnergyToolkit(
+            datapoints=3, repetitions=1, programs=[Program("true"), failing],
+            resultpath=self.path, failure_policy=FailurePolicy.SKIP,
+        )
+        ResultStreamer(toolkit, self.path)
+
+        skipped = []
+        toolkit.register_hook("on_failure", lambda event: skipped.append(
+            os.listdir(os.path.join(self.path, str(event.program)))
+        ))
+        readings = iter(range(1, 100))
+        with mock.patch.object(toolkit, "_read_energy", side_effect=lambda: [next(readings)]):
+            toolkit.measure()
+
+        # The streamer removed the partial files before later hooks ran
+        self.assertEqual(skipped, [[]])
+        self.assertEqual(toolkit.get_outcomes()[1]["skipped"], 1)
+        self.assertTrue(os.path.exists(os.path.join(self.path, "0", "results.partial.csv")))
+
+        toolkit.write_results()
+        toolkit.write_statistics()
+        self.assertEqual(sorted(os.listdir(os.path.join(self.path, "0"))),
+                         ["outcomes.csv", "program.yaml", "results.csv", "statistics.csv"])
+        self.assertEqual(os.listdir(os.path.join(self.path, "1")), ["outcomes.csv"])
+
+    def test_endpoint(self):
+        """The page and the data endpoint are served"""
+        self._stream([Datapoint(2.0, 1.0)])
+        dashboard = Dashboard(self.path)
+        dashboard.start(0)
+        try:
+            url = f"http://127.0.0.1:{dashboard.get_port()}"
+            with urllib.request.urlopen(url + "/") as response:
+                self.assertIn("/plotly.js", response.read().decode("utf-8"))
+            with urllib.request.urlopen(url + "/data?since=0") as response:
+                data = json.loads(response.read())
+        finally:
+            dashboard.stop()
+
+        # Intervals of a single value are not finite and sent as null
+        self.assertEqual(data["programs"]["0"]["columns"]["time"], [1.0])
+        self.assertIsNone(data["programs"]["0"]["statistics"]["energy"]["ci_low"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from energy_toolkit.energy_toolkit import EnergyToolkit
+from energy_toolkit.events import DatapointEvent, ProgramDoneEvent, RepetitionEvent
+from energy_toolkit.program import ExecutionResult, Program
+from energy_toolkit.util import ExecutionStatus
+
+
+def toolkit_with_counter(*args, **kwargs):
+    """Create a toolkit whose energy counter advances by one Joule per read"""
+    toolkit = EnergyToolkit(*args, **kwargs)
+    readings = iter(range(1, 10000))
+    patcher = mock.patch.object(toolkit, "_read_energy", side_effect=lambda: [next(readings)])
+    return toolkit, patcher
+
+
+class TestExecution(unittest.TestCase):
+
+    def test_status(self):
+        """Successful and failing executions are told apart"""
+        self.assertEqual(Program("true").execute().status, ExecutionStatus.OK)
+
+        result = Program("false").execute()
+        self.assertEqual(result.status, ExecutionStatus.FAILED)
+        self.assertEqual(result.returncode, 1)
+
+    def test_timeout_kills_process_group(self):
+        """A hanging program and the children it started are killed after the timeout"""
+        start = time.perf_counter()
+        result = Program("sh", ["-c", "sleep 10 & sleep 10"]).execute(0, 0.2)
+
+        self.assertEqual(result.status, ExecutionStatus.TIMEOUT)
+        self.assertLess(time.perf_counter() - start, 5)
+
+    def test_timeout_async(self):
+        """Asynchronous executions are killed after the timeout as well"""
+        result = asyncio.run(Program("sleep", ["10"]).execute_async(0, 0.2))
+        self.assertEqual(result.status, ExecutionStatus.TIMEOUT)
+
+        result = asyncio.run(Program("true").execute_async(0, 5))
+        self.assertEqual(result.status, ExecutionStatus.OK)
+
+    def test_usage(self):
+        """Synchronous and asynchronous executions record the resource usage of the child"""
+        program = Program("sh", ["-c", "i=0; while [ $i -lt 20000 ]; do i=$((i+1)); done"])
+
+        for result in (program.execute(), asyncio.run(program.execute_async())):
+            self.assertEqual(set(result.usage), set(ExecutionResult.USAGE_FIELDS))
+            self.assertGreater(result.usage["user_time"] + result.usage["sys_time"], 0.0)
+            self.assertGreater(result.usage["max_rss"], 0.0)
+
+    def test_reap_async(self):
+        """Children are reaped through their pidfd without blocking a thread"""
+        program = Program("sh", ["-c", "sleep 0.1"])
+
+        async def execute():
+            loop = asyncio.get_running_loop()
+            with mock.patch.object(loop, "run_in_executor", side_effect=AssertionError):
+                return await program.execute_async()
+
+        result = asyncio.run(execute())
+        self.assertEqual(result.status, ExecutionStatus.OK)
+        self.assertIn("max_rss", result.usage)
+
+        # Kernels without pidfds wait in the reaper threads
+        with mock.patch("os.pidfd_open", side_effect=OSError):
+            result = asyncio.run(program.execute_async(0, 5))
+        self.assertEqual(result.status, ExecutionStatus.OK)
+        self.assertGreater(result.usage["max_rss"], 0.0)
+
+
+class TestAsyncMeasurement(unittest.TestCase):
+
+    def test_measure_async(self):
+        """The events of a campaign are yielded in order and the results are stored"""
+        toolkit, patcher = toolkit_with_counter(
+            datapoints=2, repetitions=2, programs=[Program("true")]
+        )
+
+        async def collect():
+            return [event async for event in toolkit.measure_async()]
+
+        with patcher:
+            events = asyncio.run(collect())
+
+        self.assertEqual(
+            [type(event) for event in events],
+            [RepetitionEvent, RepetitionEvent, DatapointEvent] * 2 + [ProgramDoneEvent],
+        )
+        self.assertEqual(len(toolkit.get_results()[0]), 2)
+        self.assertEqual(toolkit.get_results()[0]["energy"].tolist(), [1.0, 1.0])
+
+    def test_run_async(self):
+        """Toolkits on different cores can be awaited together"""
+        first, first_patcher = toolkit_with_counter(1, 3, programs=[Program("true")])
+        second, second_patcher = toolkit_with_counter(2, 1, programs=[Program("true")])
+
+        async def run_both():
+            return await asyncio.gather(first.run_async(), second.run_async())
+
+        with first_patcher, second_patcher:
+            results = asyncio.run(run_both())
+
+        self.assertEqual(len(results[0][0]), 1)
+        self.assertEqual(len(results[1][0]), 2)
+
+    def test_usage_columns(self):
+        """Both measurement paths write the same usage columns and statistics"""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            columns = []
+            runs = (
+                lambda toolkit: toolkit.measure(),
+                lambda toolkit: asyncio.run(toolkit.run_async()),
+            )
+            for run in runs:
+                toolkit, patcher = toolkit_with_counter(
+                    2, 2, programs=[Program("true")], resultpath=tmpdir
+                )
+                with patcher:
+                    run(toolkit)
+                toolkit.write_results()
+                toolkit.write_statistics()
+
+                with open(os.path.join(tmpdir, "0", "results.csv"), encoding="utf-8") as f:
+                    header = f.readline().lstrip("# ").strip().split(",")
+                with open(os.path.join(tmpdir, "0", "statistics.csv"), encoding="utf-8") as f:
+                    self.assertIn("Max_rss", f.readline())
+
+                self.assertEqual(header[:2], ["Time", "Energy"])
+                self.assertIn("User_time", header)
+                self.assertGreater(toolkit.get_statistics()[0]["max_rss"]["mean"], 0.0)
+                columns.append(header)
+
+            self.assertEqual(columns[0], columns[1])
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_cancel(self):
+        """Cancelling a measurement kills and reaps the running child and stores no results"""
+        tmpdir = tempfile.mkdtemp()
+        pidfile = os.path.join(tmpdir, "pid")
+        program = Program("sh", ["-c", f"echo $$ > {pidfile}; exec sleep 10"])
+        toolkit, patcher = toolkit_with_counter(1, 1, programs=[program])
+
+        async def cancel():
+            task = asyncio.ensure_future(toolkit.run_async())
+            while not os.path.exists(pidfile) or not os.path.getsize(pidfile):
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        try:
+            start = time.perf_counter()
+            with patcher:
+                asyncio.run(cancel())
+
+            with open(pidfile, encoding="utf-8") as f:
+                pid = int(f.read())
+            self.assertLess(time.perf_counter() - start, 5)
+            # A killed but unreaped child would remain as zombie
+            self.assertFalse(os.path.exists(f"/proc/{pid}"))
+            self.assertEqual(toolkit.get_results(), {})
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    unittest.main()
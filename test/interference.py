@@ -0,0 +1,156 @@
+import asyncio
+import resource
+import time
+import unittest
+from unittest import mock
+
+from energy_toolkit.energy_toolkit import EnergyToolkit
+from energy_toolkit.interference import ActivitySnapshot, InterferenceMonitor
+from energy_toolkit.procfs import ProcFS
+from energy_toolkit.program import FunctionProgram, Program
+from energy_toolkit.util import InterferencePolicy
+
+SCHEDSTAT = """version 15
+timestamp 4295000000
+cpu0 0 0 100 50 80 40 2000000000 500000000 90
+domain0 00000003 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0
+cpu1 0 0 100 50 80 40 1000000000 250000000 90
+"""
+
+
+def snapshot(run_time, run_delay=0.0, interrupts=0, thread_time=0.0):
+    return ActivitySnapshot(run_time, run_time, run_delay, interrupts, thread_time)
+
+
+def busy(seconds):
+    end = time.process_time() + seconds
+    while time.process_time() < end:
+        pass
+
+
+def process_run_time(cores):
+    """Run time of cores that only run the toolkit's process and its children"""
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime, 0.0
+
+
+class TestInterference(unittest.TestCase):
+
+    def test_read_schedstat(self):
+        """Run and wait times of the requested cpus are summed, missing cpus give None"""
+        with mock.patch("builtins.open", mock.mock_open(read_data=SCHEDSTAT)):
+            self.assertEqual(ProcFS.read_schedstat({0, 1}), (3.0, 0.75))
+        with mock.patch("builtins.open", mock.mock_open(read_data=SCHEDSTAT)):
+            self.assertIsNone(ProcFS.read_schedstat({2}))
+        with mock.patch("builtins.open", side_effect=FileNotFoundError):
+            self.assertIsNone(ProcFS.read_schedstat({0}))
+
+    @mock.patch.object(ProcFS, "read_schedstat", lambda cores: (0.0, 0.0))
+    def test_thresholds(self):
+        """Foreign run time, waiting and interrupts above the thresholds disturb a repetition"""
+        monitor = InterferenceMonitor({0, 1}, threshold=0.05, interrupt_rate=1000.0)
+        self.assertTrue(monitor.has_schedstat())
+
+        # The measured program itself ran for 0.9 s of the cores' 0.94 s
+        quiet = monitor.metrics(snapshot(0.0), snapshot(0.94, 0.01, 1500, 0.9))
+        self.assertAlmostEqual(quiet["foreign_time"], 0.04)
+        self.assertFalse(monitor.is_disturbed(quiet, 1.0))
+
+        # Children are accounted with the cpu time of their execution
+        child = monitor.metrics(snapshot(0.0), snapshot(0.94, 0.0, 0, 0.1), 0.8)
+        self.assertAlmostEqual(child["foreign_time"], 0.04)
+
+        busy = monitor.metrics(snapshot(0.0), snapshot(1.0, 0.0, 0, 0.9))
+        waiting = monitor.metrics(snapshot(0.0), snapshot(0.9, 0.2, 0, 0.9))
+        interrupted = monitor.metrics(snapshot(0.0), snapshot(0.9, 0.0, 2100, 0.9))
+        for metrics in (busy, waiting, interrupted):
+            self.assertTrue(monitor.is_disturbed(metrics, 1.0))
+
+    @mock.patch.object(ProcFS, "read_schedstat", lambda cores: (0.0, 0.0))
+    def test_thread_elsewhere(self):
+        """The measuring thread's time only counts as own time if it runs on the cores"""
+        monitor = InterferenceMonitor({0}, threshold=0.05)
+        with mock.patch("energy_toolkit.interference.os.sched_getaffinity", return_value={0}):
+            self.assertIsNotNone(monitor.snapshot().thread_time)
+        with mock.patch("energy_toolkit.interference.os.sched_getaffinity", return_value={1}):
+            self.assertIsNone(monitor.snapshot().thread_time)
+
+        # The thread spent 0.5 s on another core while a foreign task ran for 0.5 s
+        elsewhere = monitor.metrics(
+            snapshot(0.0, thread_time=None), snapshot(0.6, thread_time=None), 0.1
+        )
+        self.assertAlmostEqual(elsewhere["foreign_time"], 0.5)
+        self.assertTrue(monitor.is_disturbed(elsewhere, 1.0))
+
+        # A function called in the thread is only subtracted once
+        pinned = monitor.metrics(snapshot(0.0), snapshot(0.6, thread_time=0.55), 0.5, True)
+        self.assertAlmostEqual(pinned["foreign_time"], 0.05)
+
+    def _measure(self, policy, disturbed):
+        """Measure a program whose first disturbed repetitions see one second of foreign time"""
+        toolkit = EnergyToolkit(
+            datapoints=1, repetitions=2, programs=[Program("true")], interference=policy,
+            retries=1,
+        )
+
+        snapshots = []
+        for index in range(8):
+            foreign = 1.0 if index < disturbed else 0.0
+            snapshots += [snapshot(0.0), snapshot(foreign)]
+
+        readings = iter(range(1, 100))
+        with mock.patch.object(toolkit._interference, "snapshot", side_effect=snapshots), \
+                mock.patch.object(toolkit, "_read_energy", side_effect=lambda: [next(readings)]):
+            toolkit.measure()
+
+        return toolkit
+
+    def test_flag(self):
+        """Disturbed repetitions are kept and flagged"""
+        toolkit = self._measure(InterferencePolicy.FLAG, 1)
+
+        self.assertEqual(toolkit.get_outcomes()[0]["ok"], 2)
+        self.assertEqual(toolkit.get_outcomes()[0]["flagged"], 1)
+        self.assertEqual(toolkit.get_results()[0]["flagged"][0], 0.5)
+
+    def test_remeasure(self):
+        """Disturbed repetitions are measured again until the retries are exhausted"""
+        toolkit = self._measure(InterferencePolicy.REMEASURE, 3)
+        outcomes = toolkit.get_outcomes()[0]
+
+        # The first repetition is remeasured once and kept, the second one remeasured once
+        self.assertEqual(outcomes["ok"], 2)
+        self.assertEqual(outcomes["remeasured"], 2)
+        self.assertEqual(outcomes["flagged"], 1)
+        self.assertIn("foreign_time", toolkit.get_statistics()[0])
+
+    @mock.patch.object(ProcFS, "read_schedstat", process_run_time)
+    @mock.patch.object(ProcFS, "read_cores_interrupt_count", lambda cores: 0)
+    def test_own_time(self):
+        """Functions and programs of the toolkit are not foreign, in both measurement paths"""
+        programs = [
+            FunctionProgram(busy, (0.05,)),
+            Program("sh", ["-c", "i=0; while [ $i -lt 20000 ]; do i=$((i+1)); done"]),
+        ]
+        runs = (
+            lambda toolkit: toolkit.measure(),
+            lambda toolkit: asyncio.run(toolkit.run_async()),
+        )
+        for run in runs:
+            toolkit = EnergyToolkit(
+                datapoints=1, repetitions=3, programs=programs,
+                interference=InterferencePolicy.FLAG,
+            )
+            self.assertTrue(toolkit._interference.has_schedstat())
+
+            readings = iter(range(1, 100))
+            with mock.patch.object(toolkit, "_read_energy", side_effect=lambda: [next(readings)]):
+                run(toolkit)
+
+            for pid in (0, 1):
+                self.assertEqual(toolkit.get_outcomes()[pid]["flagged"], 0)
+                self.assertLess(toolkit.get_results()[pid]["foreign_time"][0], 0.005)
+
+
+if __name__ == "__main__":
+    unittest.main()
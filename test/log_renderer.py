@@ -0,0 +1,87 @@
+import logging
+import queue
+import sys
+import unittest
+
+from energy_toolkit.logger import ClickFormatter, LogRenderer, RecordQueueHandler
+
+
+class CaptureHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class TestLogRenderer(unittest.TestCase):
+
+    def _record(self, message, **extra):
+        record = logging.LogRecord("test", logging.DEBUG, __file__, 0, message, None, None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_progress_is_coalesced(self):
+        """Only the newest progress record is rendered before a regular message"""
+        log_queue = queue.SimpleQueue()
+        terminal = CaptureHandler()
+        structured = CaptureHandler()
+
+        renderer = LogRenderer(log_queue, terminal, refresh_rate=0.001)
+        renderer.add_structured_handler(structured)
+        renderer.start()
+
+        for i in range(100):
+            log_queue.put(self._record(f"progress {i}", same_line=True))
+        log_queue.put(self._record("event", event={"a": 1}, event_only=True))
+        log_queue.put(self._record("done"))
+        renderer.stop()
+
+        self.assertLessEqual(len(terminal.messages), 3)
+        self.assertEqual(terminal.messages[-2:], ["progress 99", "done"])
+        self.assertEqual(len(structured.messages), 102)
+
+    def test_records_are_formatted_by_renderer(self):
+        """The calling thread only enqueues records, the renderer formats them"""
+        class Argument:
+            formatted = 0
+
+            def __str__(self):
+                Argument.formatted += 1
+                return "argument"
+
+        log_queue = queue.SimpleQueue()
+        record = self._record("value %s", args=(Argument(),))
+        RecordQueueHandler(log_queue).handle(record)
+
+        queued = log_queue.get_nowait()
+        self.assertIs(queued, record)
+        self.assertEqual(Argument.formatted, 0)
+        self.assertFalse(hasattr(queued, "message"))
+
+        terminal = CaptureHandler()
+        renderer = LogRenderer(log_queue, terminal)
+        log_queue.put(queued)
+        renderer.start()
+        renderer.stop()
+        self.assertEqual(terminal.messages, ["value argument"])
+        self.assertEqual(Argument.formatted, 1)
+
+    def test_exceptions_are_rendered_when_logged(self):
+        """Tracebacks are rendered on the calling thread and not kept alive in the queue"""
+        log_queue = queue.SimpleQueue()
+        try:
+            raise ValueError("broken")
+        except ValueError:
+            record = self._record("failed", exc_info=sys.exc_info())
+        RecordQueueHandler(log_queue).handle(record)
+
+        queued = log_queue.get_nowait()
+        self.assertIsNone(queued.exc_info)
+        self.assertIn("ValueError: broken", queued.exc_text)
+        self.assertIn("ValueError: broken", ClickFormatter("%(message)s").format(queued))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import itertools
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+from energy_toolkit.energy_toolkit import EnergyToolkit
+from energy_toolkit.measurement_cache import MeasurementCache
+from energy_toolkit.program import FunctionProgram, Program
+from energy_toolkit.util import FailurePolicy
+
+
+class TestMeasurementCache(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "cache")
+        self.results = np.array(
+            [(1.0, 0.5, 10.0), (2.0, 0.6, 11.0)],
+            dtype=[("energy", float), ("time", float), ("instructions", float)],
+        )
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_key_follows_contents(self):
+        """Keys change with the input contents and the parameters, not with the call"""
+        inputfile = os.path.join(self.folder.name, "input.txt")
+        with open(inputfile, "w", encoding="utf-8") as f:
+            f.write("a")
+
+        program = Program("true", [], inputfile)
+        key = MeasurementCache.key(program, {"datapoints": 10})
+        self.assertEqual(key, MeasurementCache.key(program, {"datapoints": 10}))
+        self.assertNotEqual(key, MeasurementCache.key(program, {"datapoints": 11}))
+
+        with open(inputfile, "w", encoding="utf-8") as f:
+            f.write("b")
+        self.assertNotEqual(key, MeasurementCache.key(program, {"datapoints": 10}))
+
+    def test_key_follows_function_code(self):
+        """Function programs are keyed by their code, not only by the name of the function"""
+        def define(count):
+            namespace = {}
+            source = f"def work(n):\n    return len({{'a', 'b'}}) if n else list(range({count}))\n"
+            exec(source, namespace) # pylint: disable=exec-used
+            return namespace["work"]
+
+        first, same, changed = define(1), define(1), define(2)
+
+        key = MeasurementCache.key(FunctionProgram(first, (3,)), {"datapoints": 10})
+        self.assertEqual(key, MeasurementCache.key(FunctionProgram(same, (3,)), {"datapoints": 10}))
+        self.assertNotEqual(
+            key, MeasurementCache.key(FunctionProgram(changed, (3,)), {"datapoints": 10})
+        )
+        self.assertNotEqual(
+            key, MeasurementCache.key(FunctionProgram(first, (4,)), {"datapoints": 10})
+        )
+
+    def test_roundtrip(self):
+        """Stored results are returned unchanged"""
+        cache = MeasurementCache(self.path)
+        self.assertIsNone(cache.get("a"))
+
+        cache.put("a", self.results)
+        np.testing.assert_array_equal(cache.get("a"), self.results)
+
+    def test_ttl(self):
+        """Expired entries are not served"""
+        cache = MeasurementCache(self.path, ttl=60)
+        cache.put("a", self.results)
+
+        entry = os.path.join(self.path, "a.npy")
+        os.utime(entry, (time.time() - 120, time.time() - 120))
+        self.assertIsNone(cache.get("a"))
+        self.assertFalse(os.path.exists(entry))
+
+    def test_size_eviction(self):
+        """The least recently used entry is evicted first"""
+        cache = MeasurementCache(self.path)
+        cache.put("a", self.results)
+        cache.put("b", self.results)
+        size = os.path.getsize(os.path.join(self.path, "a.npy"))
+
+        # Use a after b, then add a third entry to a cache that only fits two
+        now = time.time()
+        os.utime(os.path.join(self.path, "b.npy"), (now - 10, now))
+        cache = MeasurementCache(self.path, max_size=2 * size)
+        cache.get("a")
+        cache.put("c", self.results)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_failure_settings(self):
+        """Runs with another timeout, failure policy or number of retries are measured again"""
+        cache = MeasurementCache(self.path)
+        readings = itertools.count(1)
+
+        def measure(**settings):
+            toolkit = EnergyToolkit(1, 1, programs=[Program("true")], cache=cache, **settings)
+            with mock.patch.object(toolkit, "_read_energy", side_effect=lambda: [next(readings)]):
+                toolkit.measure()
+            # Programs served from the cache have no outcomes
+            return 0 in toolkit.get_outcomes()
+
+        self.assertTrue(measure())
+        self.assertFalse(measure())
+        self.assertTrue(measure(timeout=5.0))
+        self.assertTrue(measure(failure_policy=FailurePolicy.SKIP))
+        self.assertTrue(measure(retries=1))
+        self.assertFalse(measure(timeout=5.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+import urllib.request
+
+from energy_toolkit.energy_toolkit import EnergyToolkit
+from energy_toolkit.events import DatapointEvent, RepetitionEvent, RetryEvent
+from energy_toolkit.metrics import MetricsExporter
+from energy_toolkit.util import Datapoint
+
+
+class TestMetricsExporter(unittest.TestCase):
+    toolkit: EnergyToolkit = None
+    exporter: MetricsExporter = None
+
+    def setUp(self):
+        self.toolkit = EnergyToolkit(datapoints=2, repetitions=2, programs=["prog"])
+        self.exporter = MetricsExporter(self.toolkit)
+
+    def test_unknown_hook(self):
+        """Registering an unknown hook fails"""
+        with self.assertRaises(ValueError):
+            self.toolkit.register_hook("on_nothing", print)
+
+    def test_render(self):
+        """Events passed to the hooks show up in the rendered metrics"""
+        self.toolkit._emit("on_repetition", RepetitionEvent(0, 0, 0, 2.0, 0.5))
+        self.toolkit._emit("on_retry", RetryEvent(0, 0, 1, "overflow"))
+        self.toolkit._emit("on_repetition", RepetitionEvent(0, 0, 1, 2.0, 0.5))
+        self.toolkit._emit("on_datapoint", DatapointEvent(0, 0, Datapoint(2.0, 0.5)))
+
+        output = self.exporter.render()
+        self.assertIn("energy_toolkit_executions_total 2.0", output)
+        self.assertIn("energy_toolkit_retries_total 1.0", output)
+        self.assertIn("energy_toolkit_datapoints_total 1.0", output)
+        self.assertIn('energy_toolkit_mean_power_watts{program="0"} 4.0', output)
+
+    def test_endpoint(self):
+        """The HTTP endpoint serves the rendered metrics"""
+        self.exporter.start(0)
+        try:
+            url = f"http://127.0.0.1:{self.exporter.get_port()}/metrics"
+            with urllib.request.urlopen(url) as response:
+                body = response.read().decode("utf-8")
+        finally:
+            self.exporter.stop()
+
+        self.assertIn("energy_toolkit_eta_seconds", body)
+
+
+if __name__ == "__main__":
+    unittest.main()
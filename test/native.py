@@ -0,0 +1,99 @@
+import os
+import struct
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+from energy_toolkit import msr_reader
+
+ENERGY_REG = 0x639
+UNIT_REG = 0x606
+
+# Adds 0x200 energy units to the emulated energy status register
+INCREMENT = """
+import struct, sys
+with open(sys.argv[1], "r+b") as f:
+    f.seek({reg})
+    value = struct.unpack("<Q", f.read(8))[0]
+    f.seek({reg})
+    f.write(struct.pack("<Q", (value + 0x200) & 0xFFFFFFFF))
+""".format(reg=ENERGY_REG)
+
+
+class TestNativeMeasurement(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.msr = os.path.join(self.tmp.name, "msr")
+
+        # Emulated msr file with an energy unit of 2^-14 J and a counter right before its wrap
+        with open(self.msr, "wb") as f:
+            f.write(bytes(0x700))
+            f.seek(UNIT_REG)
+            f.write(struct.pack("<Q", 14 << 8))
+            f.seek(ENERGY_REG)
+            f.write(struct.pack("<Q", 0xFFFFFF00))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def measure(self, path, argv, count=5):
+        energies = np.zeros(count)
+        times = np.zeros(count)
+        result = msr_reader.measure_exec(
+            self.msr, ENERGY_REG, UNIT_REG, path, argv, 0, "", energies, times
+        )
+        return result, energies, times
+
+    def test_fills_buffers(self):
+        """All repetitions are measured and the counter wrap is corrected"""
+        argv = [sys.executable, "-c", INCREMENT, self.msr]
+        (measured, returncode, _), energies, times = self.measure(sys.executable, argv)
+
+        self.assertEqual((measured, returncode), (5, 0))
+        np.testing.assert_allclose(energies, 0x200 * 0.5 ** 14)
+        self.assertTrue(np.all(times > 0))
+
+    def test_failure_returns(self):
+        """A failed execution stops the measurement and reports its exit code"""
+        (measured, returncode, _), _, _ = self.measure("/bin/sh", ["sh", "-c", "exit 3"])
+        self.assertEqual((measured, returncode), (0, 3))
+
+        (measured, returncode, _), _, _ = self.measure("/nonexistent", ["nonexistent"])
+        self.assertEqual((measured, returncode), (0, 127))
+
+    def test_descriptors(self):
+        """Measured programs only inherit their standard streams"""
+        output = os.path.join(self.tmp.name, "fds")
+        # Lists the open descriptors before incrementing the counter
+        script = (
+            "import os, sys\n"
+            "links = []\n"
+            "for fd in os.listdir('/proc/self/fd'):\n"
+            "    try:\n"
+            "        links.append(os.readlink(f'/proc/self/fd/{fd}'))\n"
+            "    except FileNotFoundError:\n"
+            "        pass\n"
+            "with open(sys.argv[2], 'w') as f:\n"
+            "    f.write('\\n'.join(links))\n"
+        ) + INCREMENT
+        argv = [sys.executable, "-c", script, self.msr, output]
+
+        for inputfile in ("", self.msr):
+            msr_reader.measure_exec(
+                self.msr, ENERGY_REG, UNIT_REG, sys.executable, argv, 0, inputfile,
+                np.zeros(1), np.zeros(1),
+            )
+            with open(output, encoding="utf-8") as f:
+                links = f.read().splitlines()
+
+            # The closed descriptor of the listing itself is skipped
+            self.assertEqual(len(links), 3, links)
+            self.assertEqual(links.count(self.msr), 1 if inputfile else 0)
+            self.assertEqual(links.count("/dev/null"), 2 if inputfile else 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from energy_toolkit.perf_counters import PerfCounters
+from energy_toolkit.program import FunctionProgram, Program
+from energy_toolkit.util import ExecutionStatus
+
+# Shell loop running for a few milliseconds of cpu time
+SPIN = ["-c", "i=0; while [ $i -lt 20000 ]; do i=$((i+1)); done"]
+
+
+def task_clock_available():
+    counters = PerfCounters(["task_clock"])
+    available = counters.get_names() == ["task_clock"]
+    counters.close()
+    return available
+
+
+class TestPerfCounters(unittest.TestCase):
+
+    def test_delta(self):
+        """Counter deltas are scaled if the counters were multiplexed"""
+        before = np.array([[100.0, 10.0, 10.0], [50.0, 10.0, 10.0]])
+        after = np.array([[300.0, 20.0, 20.0], [150.0, 30.0, 20.0]])
+
+        counts = PerfCounters.delta(before, after)
+        self.assertEqual(counts.tolist(), [200.0, 200.0])
+
+    def test_unknown_event(self):
+        """Unknown events are rejected"""
+        with self.assertRaises(ValueError):
+            PerfCounters(["branch_misses_per_joule"])
+
+    @unittest.skipUnless(task_clock_available(), "perf events are not available")
+    def test_execution_counts(self):
+        """Counters of an execution start with the exec of the program, not with the launcher"""
+        cores = os.sched_getaffinity(0)
+        result = Program("sh", SPIN).execute(cores, None, None, ["task_clock"])
+
+        self.assertEqual(result.status, ExecutionStatus.OK)
+        cpu_time = result.usage["user_time"] + result.usage["sys_time"]
+        task_clock = result.counters["task_clock"] / 1e9
+        self.assertGreater(task_clock, 0.0)
+        # The rusage of the child also covers the gate before the exec
+        self.assertLessEqual(task_clock, cpu_time + 2 / os.sysconf("SC_CLK_TCK"))
+
+        # Short programs only count their own few instructions, not the toolkit's work
+        self.assertLess(Program("true").execute(cores, None, None, ["task_clock"])
+                        .counters["task_clock"], 0.05 * 1e9)
+
+    @unittest.skipUnless(task_clock_available(), "perf events are not available")
+    def test_gated_execution(self):
+        """Gated programs keep their input file and fail like ungated ones"""
+        with tempfile.NamedTemporaryFile("w", suffix=".txt") as f:
+            f.write("input\n")
+            f.flush()
+            result = Program("grep", ["-q", "input"], f.name).execute(0, None, None, ["task_clock"])
+        self.assertEqual(result.status, ExecutionStatus.OK)
+
+        result = Program("./does-not-exist").execute(0, None, None, ["task_clock"])
+        self.assertEqual(result.status, ExecutionStatus.FAILED)
+
+        result = FunctionProgram(sum, (range(100000),)).execute(0, None, None, ["task_clock"])
+        self.assertGreater(result.counters["task_clock"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import click
+import numpy as np
+from click.testing import CliRunner
+from energy_toolkit.cli import cli
+from energy_toolkit.plotter import Plotter
+from energy_toolkit.util import PlotMode
+
+
+class FakeKaleido:
+    """Kaleido session writing empty files, figures in the failing formats raise errors"""
+
+    sessions = []
+    failing = ()
+
+    def __init__(self, n=1):
+        self.n = n
+        self.jobs = []
+        self.cancel_on_error = None
+        FakeKaleido.sessions.append(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def write_fig_from_object(self, jobs, cancel_on_error=False):
+        self.cancel_on_error = cancel_on_error
+        errors = []
+        for job in jobs:
+            self.jobs.append(job)
+            if job["opts"]["format"] in self.failing:
+                errors.append(RuntimeError("render failed"))
+            else:
+                with open(job["path"], "w", encoding="utf-8"):
+                    pass
+        return tuple(errors)
+
+
+class TestDistributions(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.values = np.concatenate([rng.normal(1, 0.1, 5000), rng.normal(2, 0.1, 5000)])
+
+    def test_kde_is_density(self):
+        """The binned kernel density estimate integrates to one and shows both modes"""
+        grid, density = Plotter._kde(self.values)
+        self.assertAlmostEqual(float(np.sum(density) * (grid[1] - grid[0])), 1.0, places=3)
+
+        peaks = grid[1:-1][(density[1:-1] > density[:-2]) & (density[1:-1] > density[2:])]
+        np.testing.assert_allclose(peaks, [1.0, 2.0], atol=0.05)
+
+    def test_ecdf(self):
+        """The cumulative distribution rises from zero to one"""
+        x, cumulative = Plotter._ecdf(self.values)
+        self.assertEqual(cumulative[0], 0.0)
+        self.assertEqual(cumulative[-1], 1.0)
+        self.assertTrue(np.all(np.diff(cumulative) >= 0))
+        self.assertAlmostEqual(float(np.interp(1.5, x, cumulative)), 0.5, places=2)
+
+    def test_constant_values(self):
+        """Constant samples do not break the binning"""
+        centers, density = Plotter._histogram(np.ones(10), 100)
+        self.assertEqual(centers.tolist(), [1.0])
+        self.assertEqual(density.tolist(), [1.0])
+
+
+@mock.patch("energy_toolkit.plotter.kaleido.Kaleido", FakeKaleido)
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        for pid in ("0", "1"):
+            os.makedirs(os.path.join(self.tmpdir, pid))
+            with open(os.path.join(self.tmpdir, pid, "results.csv"), "w", encoding="utf-8") as f:
+                f.write("# Time,Energy\n1.0,2.0\n1.5,2.5\n")
+        self.output = tempfile.mkdtemp()
+        FakeKaleido.sessions = []
+        FakeKaleido.failing = ()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        shutil.rmtree(self.output)
+
+    def test_export(self):
+        """All modes, programs and formats are rendered by one session"""
+        plotter = Plotter(self.tmpdir, PlotMode.BARCHART)
+        files = plotter.export(
+            self.output, [PlotMode.BARCHART, PlotMode.LINECHART], ["pdf", "svg"], True, parallel=3
+        )
+
+        names = [f"{mode}_{name}.{fmt}" for mode in ("barchart", "linechart")
+                 for name in ("all", "0", "1") for fmt in ("pdf", "svg")]
+        self.assertEqual(files, [os.path.join(self.output, name) for name in names])
+        self.assertEqual(sorted(os.listdir(self.output)), sorted(names))
+
+        self.assertEqual(len(FakeKaleido.sessions), 1)
+        session = FakeKaleido.sessions[0]
+        self.assertEqual(session.n, 3)
+        self.assertFalse(session.cancel_on_error)
+        self.assertEqual([job["opts"]["format"] for job in session.jobs[:2]], ["pdf", "svg"])
+        self.assertEqual(session.jobs[0]["opts"]["width"], Plotter.WIDTH)
+
+    def test_failed_figures(self):
+        """Figures that failed to render are reported, the other ones are still written"""
+        FakeKaleido.failing = ("png",)
+        # Files of an earlier export are not mistaken for rendered figures
+        with open(os.path.join(self.output, "barchart_all.png"), "w", encoding="utf-8"):
+            pass
+
+        plotter = Plotter(self.tmpdir, PlotMode.BARCHART)
+        with self.assertRaises(click.ClickException) as context:
+            plotter.export(self.output, [PlotMode.BARCHART, PlotMode.ECDF], ["png", "pdf"])
+
+        message = context.exception.message
+        self.assertIn("2 of 4 figures", message)
+        self.assertIn(os.path.join(self.output, "barchart_all.png"), message)
+        self.assertIn(os.path.join(self.output, "ecdf_all.png"), message)
+        self.assertNotIn(".pdf", message)
+        self.assertEqual(sorted(os.listdir(self.output)), ["barchart_all.pdf", "ecdf_all.pdf"])
+
+    def test_export_command(self):
+        """The export command passes modes, formats and parallelism to the plotter"""
+        result = CliRunner().invoke(
+            cli,
+            ["export", self.tmpdir, "--mode", "violin", "--format", "PNG", "--format", "svg",
+             "-j", "2", "-o", self.output],
+        )
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(
+            sorted(os.listdir(self.output)),
+            ["violin_all.png", "violin_all.svg"],
+        )
+        self.assertEqual(FakeKaleido.sessions[0].n, 2)
+
+        FakeKaleido.failing = ("svg",)
+        result = CliRunner().invoke(
+            cli, ["export", self.tmpdir, "--format", "svg", "-o", self.output]
+        )
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("barchart_all.svg", result.output)
+
+    def test_export_twice(self):
+        """Figures exported into the result tree do not invalidate it"""
+        for _ in range(2):
+            result = CliRunner().invoke(cli, ["export", self.tmpdir, "--format", "svg"])
+            self.assertEqual(result.exit_code, 0, result.output)
+
+        figures = os.path.join(self.tmpdir, "figures")
+        self.assertIn("barchart_all.svg", os.listdir(figures))
+        plotter = Plotter(self.tmpdir, PlotMode.BARCHART)
+        self.assertEqual(len(plotter.data), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
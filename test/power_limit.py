@@ -0,0 +1,113 @@
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from unittest import mock
+
+from energy_toolkit.power_limit import CapResult, PowerCapSweep, PowerLimit
+from energy_toolkit.rapl_interface import RAPLInterface
+
+# Power unit of 1/8 W, energy unit of 1/2^14 J, time unit of 1/1024 s
+UNITS = 0xA0E03
+# PL1 of 100 W, enabled and clamped, and its time window. PL2 of 125 W, enabled and its window
+ORIGINAL = 0x004283E8_00DD8320
+
+
+class TestPowerLimit(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.msr = os.path.join(self.tmpdir, "msr")
+        with open(self.msr, "wb") as f:
+            f.write(bytes(0x700))
+        self.write_register(PowerLimit.UNIT_REGISTER, UNITS)
+        self.write_register(PowerLimit.REGISTER, ORIGINAL)
+
+        patcher = mock.patch.object(RAPLInterface, "MSR_PATH", self.msr)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write_register(self, register, value):
+        with open(self.msr, "r+b") as f:
+            f.seek(register)
+            f.write(struct.pack("<Q", value))
+
+    def read_register(self, register):
+        with open(self.msr, "rb") as f:
+            f.seek(register)
+            return struct.unpack("<Q", f.read(8))[0]
+
+    def test_set_limit(self):
+        """PL1 and PL2 are capped and enabled, PL1 gets a short time window"""
+        limit = PowerLimit(0)
+        self.assertEqual(limit.get_unit(), 0.125)
+        self.assertEqual(limit.get_time_unit(), 1 / 1024)
+        self.assertEqual(limit.get_limit(), 100.0)
+
+        limit.set_limit(25)
+        value = self.read_register(PowerLimit.REGISTER)
+        self.assertEqual(value & PowerLimit.POWER_MASK, 200)
+        self.assertTrue(value & PowerLimit.ENABLE and value & PowerLimit.CLAMP)
+        # 2^3 * (1 + 2/4) time units of 1/1024 s, the shortest window of at least 10 ms
+        self.assertEqual((value >> 17) & 0x1F, 3)
+        self.assertEqual((value >> 22) & 0x3, 2)
+
+        self.assertEqual((value >> 32) & PowerLimit.POWER_MASK, 200)
+        self.assertTrue(value & PowerLimit.PL2_ENABLE and value & PowerLimit.PL2_CLAMP)
+        # The PL2 time window and the reserved bits are kept
+        kept = ~(0x1FFFFFF | 0x1FFFF << 32)
+        self.assertEqual(value & kept, ORIGINAL & kept)
+        self.assertEqual(limit.get_limit(), 25.0)
+
+        with self.assertRaises(ValueError):
+            limit.set_limit(0)
+        limit.restore()
+
+    def test_restore(self):
+        """The original limit is restored on exit, also after an exception"""
+        with PowerLimit(0) as limit:
+            limit.set_limit(30)
+            limit.set_limit(40)
+        self.assertEqual(self.read_register(PowerLimit.REGISTER), ORIGINAL)
+
+        with self.assertRaises(RuntimeError):
+            with PowerLimit(0) as limit:
+                limit.set_limit(30)
+                raise RuntimeError
+        self.assertEqual(self.read_register(PowerLimit.REGISTER), ORIGINAL)
+
+    def test_locked(self):
+        """Locked limits cannot be changed"""
+        self.write_register(PowerLimit.REGISTER, ORIGINAL | PowerLimit.LOCK)
+        limit = PowerLimit(0)
+        self.assertTrue(limit.is_locked())
+        with self.assertRaises(PermissionError):
+            limit.set_limit(30)
+        self.assertEqual(self.read_register(PowerLimit.REGISTER), ORIGINAL | PowerLimit.LOCK)
+
+    def test_optimum(self):
+        """Energy and energy-delay optimum are marked per program"""
+        results = [
+            CapResult(15, 0, "prog", 10.0, 4.0),
+            CapResult(25, 0, "prog", 8.0, 2.0),
+            CapResult(35, 0, "prog", 9.0, 1.5),
+            CapResult(15, 1, "other", 1.0, 1.0),
+        ]
+        PowerCapSweep.mark_optimum(results)
+        self.assertEqual([r.energy_optimal for r in results], [False, True, False, True])
+        self.assertEqual([r.edp_optimal for r in results], [False, False, True, True])
+        self.assertIn("<- energy optimum", PowerCapSweep.format(results))
+
+        PowerCapSweep.write(self.tmpdir, results)
+        with open(os.path.join(self.tmpdir, "sweep.csv"), encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[0], "# Cap,Pid,Energy,Time,Edp,Energy_optimal,Edp_optimal")
+        self.assertEqual(lines[3], "35,0,9.0,1.5,13.5,0,1")
+
+
+if __name__ == "__main__":
+    unittest.main()
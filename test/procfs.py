@@ -0,0 +1,156 @@
+import builtins
+import os
+import shutil
+import signal
+import tempfile
+import unittest
+from unittest import mock
+
+from energy_toolkit.procfs import CoreIsolation, ProcFS
+
+
+class TestProcFS(unittest.TestCase):
+
+    def test_cpu_list(self):
+        """Cpu lists are parsed and formatted in the kernel notation"""
+        cpus = ProcFS.parse_cpu_list("0-3,8,10-11\n")
+        self.assertEqual(cpus, {0, 1, 2, 3, 8, 10, 11})
+        self.assertEqual(ProcFS.format_cpu_list(cpus), "0-3,8,10-11")
+        self.assertEqual(ProcFS.format_cpu_list({5}), "5")
+
+    def test_core_counters(self):
+        """Busy time and interrupts of an existing core can be read"""
+        core = min(os.sched_getaffinity(0))
+        self.assertGreaterEqual(ProcFS.read_cpu_busy_time(core), 0.0)
+        self.assertGreaterEqual(ProcFS.read_interrupt_count(core), 0)
+
+    def test_priority_restored(self):
+        """The nice value is raised while isolating and restored afterwards"""
+        if os.geteuid() != 0:
+            self.skipTest("Raising the priority requires root rights")
+
+        nice = os.getpriority(os.PRIO_PROCESS, 0)
+        core = min(os.sched_getaffinity(0))
+        with CoreIsolation(core, tasks=False, irqs=False, priority="high"):
+            self.assertEqual(os.getpriority(os.PRIO_PROCESS, 0), -20)
+
+        self.assertEqual(os.getpriority(os.PRIO_PROCESS, 0), nice)
+
+
+@mock.patch.object(CoreIsolation, "_sample", lambda self: (0.0, 0.0, 0))
+class TestCoreIsolation(unittest.TestCase):
+    """Core isolation against a mocked /proc, isolating core 1 of four cores"""
+
+    def setUp(self):
+        # Affinities of the tasks, 13 exits before it is moved and 14 is a per-cpu kthread
+        self.tasks = {10: {0, 1, 2, 3}, 11: {2, 3}, 12: {1}, 13: {1, 2}, 14: {0, 1}}
+        self.exited = {13}
+        self.kthreads = {14}
+
+        # Affinities of the interrupts, 25 is a managed interrupt
+        self.irqdir = tempfile.mkdtemp()
+        self.irqs = {"20": "0-3", "21": "2-3", "22": "1", "25": "1,3"}
+        self.managed = {"25"}
+        for irq, cpus in self.irqs.items():
+            os.makedirs(os.path.join(self.irqdir, irq))
+            self.write_irq(irq, cpus)
+
+        real_open = builtins.open
+
+        def fake_open(path, mode="r", *args, **kwargs):
+            if path.startswith("/proc/irq/"):
+                irq = path.split("/")[3]
+                if "w" in mode and irq in self.managed:
+                    raise OSError("Input/output error")
+                path = os.path.join(self.irqdir, irq, "smp_affinity_list")
+            return real_open(path, mode, *args, **kwargs)
+
+        def getaffinity(tid):
+            if tid in self.exited:
+                raise ProcessLookupError(tid)
+            return set(self.tasks[tid])
+
+        def setaffinity(tid, cpus):
+            if tid in self.kthreads:
+                raise OSError("Invalid argument")
+            self.tasks[tid] = set(cpus)
+
+        patches = [
+            mock.patch.object(ProcFS, "list_tasks", lambda: sorted(self.tasks)),
+            mock.patch.object(ProcFS, "list_irqs", lambda: sorted(self.irqs)),
+            mock.patch("energy_toolkit.procfs.open", fake_open, create=True),
+            mock.patch("energy_toolkit.procfs.os.sched_getaffinity", getaffinity),
+            mock.patch("energy_toolkit.procfs.os.sched_setaffinity", setaffinity),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.irqdir)
+
+    def write_irq(self, irq, cpus):
+        with open(os.path.join(self.irqdir, irq, "smp_affinity_list"), "w", encoding="utf-8") as f:
+            f.write(cpus + "\n")
+
+    def read_irqs(self):
+        irqs = {}
+        for irq in self.irqs:
+            with open(os.path.join(self.irqdir, irq, "smp_affinity_list"), encoding="utf-8") as f:
+                irqs[irq] = f.read().strip()
+        return irqs
+
+    def assert_restored(self):
+        self.assertEqual(
+            self.tasks, {10: {0, 1, 2, 3}, 11: {2, 3}, 12: {1}, 13: {1, 2}, 14: {0, 1}}
+        )
+        self.assertEqual(self.read_irqs(), {"20": "0-3", "21": "2-3", "22": "1", "25": "1,3"})
+
+    def test_move_tasks(self):
+        """Tasks that may run elsewhere leave the core, pinned and exited tasks are counted"""
+        with CoreIsolation(1, irqs=False) as isolation:
+            self.assertEqual(self.tasks[10], {0, 2, 3})
+            self.assertEqual(self.tasks[11], {2, 3})
+            self.assertEqual(self.tasks[12], {1})
+            self.assertEqual(self.tasks[14], {0, 1})
+
+        report = isolation.get_report()
+        self.assertEqual(report.moved_tasks, 1)
+        self.assertEqual(report.pinned_tasks, 2)
+        self.assert_restored()
+
+    def test_move_irqs(self):
+        """Movable interrupts are steered to the other cores, managed ones stay"""
+        with CoreIsolation(1, tasks=False) as isolation:
+            self.assertEqual(self.read_irqs(), {"20": "0,2-3", "21": "2-3", "22": "1", "25": "1,3"})
+
+        report = isolation.get_report()
+        self.assertEqual(report.moved_irqs, 1)
+        self.assertEqual(report.pinned_irqs, 2)
+        self.assert_restored()
+
+    def test_restore_on_exception(self):
+        """Everything is restored if the isolated code raises"""
+        with self.assertRaises(RuntimeError):
+            with CoreIsolation(1):
+                self.assertEqual(self.tasks[10], {0, 2, 3})
+                raise RuntimeError("measurement failed")
+
+        self.assert_restored()
+
+    def test_restore_on_sigterm(self):
+        """Everything is restored and the previous handler reinstated on SIGTERM"""
+        previous = signal.getsignal(signal.SIGTERM)
+
+        with self.assertRaises(SystemExit) as context:
+            with CoreIsolation(1):
+                self.assertEqual(self.read_irqs()["20"], "0,2-3")
+                os.kill(os.getpid(), signal.SIGTERM)
+
+        self.assertEqual(context.exception.code, 128 + signal.SIGTERM)
+        self.assert_restored()
+        self.assertIs(signal.getsignal(signal.SIGTERM), previous)
+
+
+if __name__ == "__main__":
+    unittest.main()
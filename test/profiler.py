@@ -0,0 +1,135 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from energy_toolkit.plotter import Plotter
+from energy_toolkit.profiler import EnergyProfile, EnergyProfiler
+from energy_toolkit.rapl_interface import RAPLInterface
+from energy_toolkit.util import CPU_TYPE, ToolkitUtil
+
+SCRIPT = """import sys
+
+
+def spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+import time
+spin(0.1)
+sys.exit(int(sys.argv[1]))
+"""
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def caller():
+    busy(0.1)
+    busy(0.05)
+
+
+def counter():
+    # A package drawing a constant 10 W
+    return time.perf_counter() * 10.0
+
+
+@mock.patch.object(ToolkitUtil, "get_cpu_vendor", lambda: CPU_TYPE.INTEL)
+@mock.patch.object(RAPLInterface, "domains", lambda vendor, cores: {"package0": 0})
+@mock.patch.object(RAPLInterface, "read", lambda vendor, core: counter())
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_profile(self):
+        """Energy is attributed to the sampled stacks below the profiling frame"""
+        with EnergyProfiler(0, interval=0.002) as profiler:
+            caller()
+        profile = profiler.get_profile()
+
+        self.assertAlmostEqual(profile.total_energy, 10.0 * profile.duration, places=3)
+        self.assertLessEqual(sum(profile.energy.values()), profile.total_energy)
+        self.assertGreater(sum(profile.samples.values()), 10)
+
+        functions = {frame[0]: energy for frame, energy in profile.get_functions().items()}
+        self.assertIn("TestProfiler.test_profile", functions)
+        self.assertNotIn("TestCase.run", functions)
+        # busy does the work, caller only calls it
+        self.assertGreater(functions["busy"][0], 1.0)
+        self.assertAlmostEqual(functions["caller"][0], 0.0, places=2)
+        self.assertAlmostEqual(functions["caller"][1], functions["busy"][1], places=2)
+
+    def test_sampler_affinity(self):
+        """The sampler thread runs off the profiled core even if the caller is pinned to it"""
+        available = os.sched_getaffinity(0)
+        core = min(available)
+        profiler = EnergyProfiler(core, interval=0.002)
+
+        os.sched_setaffinity(0, {core})
+        try:
+            profiler.start()
+            affinity = os.sched_getaffinity(profiler._thread.native_id)
+            profiler.stop()
+        finally:
+            os.sched_setaffinity(0, available)
+
+        self.assertEqual(affinity, (available - {core}) or available)
+
+    def test_outputs(self):
+        """Collapsed stacks, speedscope and flame graph carry the same energy"""
+        frames = [("main", "/src/app.py", 1), ("work", "/src/app.py", 5), ("io", "/src/io.py", 2)]
+        profile = EnergyProfile(
+            {tuple(frames[:2]): 0.5, (frames[0], frames[2]): 0.25, tuple(frames[:1]): 0.125},
+            {tuple(frames[:2]): 4, (frames[0], frames[2]): 2, tuple(frames[:1]): 1},
+            1.0,
+            1.0,
+            0.005,
+        )
+
+        profile.write(self.tmpdir)
+        with open(os.path.join(self.tmpdir, "profile.collapsed"), encoding="utf-8") as f:
+            self.assertEqual(
+                f.read().splitlines(),
+                [
+                    "main (app.py:1) 125000",
+                    "main (app.py:1);io (io.py:2) 250000",
+                    "main (app.py:1);work (app.py:5) 500000",
+                ],
+            )
+
+        with open(os.path.join(self.tmpdir, "profile.speedscope.json"), encoding="utf-8") as f:
+            speedscope = json.load(f)
+        self.assertEqual(len(speedscope["shared"]["frames"]), 3)
+        self.assertEqual(speedscope["profiles"][0]["endValue"], 0.875)
+
+        icicle = Plotter.create_flame_graph(profile).data[0]
+        values = dict(zip(icicle.ids, icicle.values))
+        self.assertEqual(values["main (app.py:1)"], 0.875)
+        self.assertEqual(values["main (app.py:1);work (app.py:5)"], 0.5)
+
+    def test_run_script(self):
+        """Scripts run as __main__ with their arguments, the module frame is outermost"""
+        path = os.path.join(self.tmpdir, "script.py")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(SCRIPT)
+
+        profile, exitcode = EnergyProfiler(0, interval=0.002).run_script(path, ["3"])
+        self.assertEqual(exitcode, 3)
+        self.assertTrue(all(stack[0][0] == "<module>" for stack in profile.energy))
+        self.assertIn("spin", {stack[-1][0] for stack in profile.energy})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+
+import energy_toolkit
+from energy_toolkit.program import FunctionProgram
+from energy_toolkit.util import ExecutionStatus
+
+# Replaces the energy counters by a counter rising by ENERGY_STEP Joule per read
+CONFTEST = """
+import itertools
+import os
+
+import pytest
+
+from energy_toolkit.energy_toolkit import RAPLInterface
+from energy_toolkit.pytest_plugin import EnergyBenchmark
+
+
+@pytest.fixture(autouse=True)
+def fake_counters(monkeypatch):
+    step = float(os.environ["ENERGY_STEP"])
+    counter = itertools.count()
+    monkeypatch.setattr(RAPLInterface, "read", lambda *_: next(counter) * step)
+    monkeypatch.setattr(EnergyBenchmark, "energy_available", lambda *_: True)
+"""
+
+TESTS = """
+def work(n):
+    return sum(range(n))
+
+
+def test_function(energy_benchmark):
+    result = energy_benchmark(work, 1000, repetitions=2)
+    assert result.energy > 0
+    assert len(result.results) == 5
+
+
+def test_command(energy_benchmark):
+    energy_benchmark(["true"])
+"""
+
+FAILING = """
+def broken():
+    raise RuntimeError("broken benchmark")
+
+
+def test_broken_function(energy_benchmark):
+    energy_benchmark(broken)
+
+
+def test_broken_command(energy_benchmark):
+    energy_benchmark(["false"])
+"""
+
+# The pytest processes import the package from the source tree
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(energy_toolkit.__file__)))
+
+
+def work(n):
+    return sum(range(n))
+
+
+def fail():
+    raise RuntimeError("broken benchmark")
+
+
+class TestPytestPlugin(unittest.TestCase):
+
+    def test_function_program(self):
+        """Callables are executed in process and their failures are reported"""
+        program = FunctionProgram(work, (100000,))
+        result = program.execute(min(os.sched_getaffinity(0)))
+        self.assertEqual(result.status, ExecutionStatus.OK)
+        self.assertIn("user_time", result.usage)
+        self.assertEqual(program.to_dict()["args"], ["100000"])
+
+        # The affinity of the calling thread is restored
+        affinity = os.sched_getaffinity(0)
+        self.assertEqual(FunctionProgram(fail).execute().status, ExecutionStatus.FAILED)
+        self.assertEqual(os.sched_getaffinity(0), affinity)
+
+    def _run(self, folder, step, *options):
+        return subprocess.run(
+            [
+                sys.executable, "-m", "pytest", "-q", "-p", "energy_toolkit.pytest_plugin",
+                "-p", "no:cacheprovider", "--energy-datapoints", "5", "--energy-repetitions",
+                "3", "--energy-baseline", os.path.join(folder, "baseline"), "--energy-lock",
+                os.path.join(folder, "lock"), *options,
+            ],
+            cwd=folder,
+            env=dict(os.environ, ENERGY_STEP=str(step), PYTHONPATH=PACKAGE_ROOT),
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+
+    def test_baseline(self):
+        """Benchmarks are saved as baseline and fail once their energy regressed"""
+        with tempfile.TemporaryDirectory() as folder:
+            with open(os.path.join(folder, "conftest.py"), "w", encoding="utf-8") as f:
+                f.write(textwrap.dedent(CONFTEST))
+            with open(os.path.join(folder, "test_bench.py"), "w", encoding="utf-8") as f:
+                f.write(textwrap.dedent(TESTS))
+
+            saved = self._run(folder, 1.0, "--energy-save-baseline")
+            self.assertEqual(saved.returncode, 0, saved.stdout)
+            self.assertTrue(
+                os.path.exists(
+                    os.path.join(folder, "baseline", "test_bench.py__test_command", "0",
+                                 "results.csv")
+                )
+            )
+
+            unchanged = self._run(folder, 1.0)
+            self.assertEqual(unchanged.returncode, 0, unchanged.stdout)
+
+            regressed = self._run(folder, 2.0)
+            self.assertEqual(regressed.returncode, 1, regressed.stdout)
+            self.assertIn("Energy regression of test_bench.py__test_command", regressed.stdout)
+
+            # A looser threshold accepts the change
+            accepted = self._run(folder, 2.0, "--energy-threshold", "1.5")
+            self.assertEqual(accepted.returncode, 0, accepted.stdout)
+
+    def test_failing_benchmark(self):
+        """Benchmarks whose executions keep failing fail the test with their outcomes"""
+        with tempfile.TemporaryDirectory() as folder:
+            with open(os.path.join(folder, "conftest.py"), "w", encoding="utf-8") as f:
+                f.write(textwrap.dedent(CONFTEST))
+            with open(os.path.join(folder, "test_failing.py"), "w", encoding="utf-8") as f:
+                f.write(textwrap.dedent(FAILING))
+
+            failed = self._run(folder, 1.0)
+            self.assertEqual(failed.returncode, 1, failed.stdout)
+            self.assertIn("2 failed", failed.stdout)
+            self.assertNotIn("KeyError", failed.stdout)
+            for test in ("test_broken_function", "test_broken_command"):
+                self.assertIn(
+                    f"Benchmark test_failing.py__{test} could not be measured: 4 failed, "
+                    "0 timed out and 1 skipped program",
+                    failed.stdout,
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
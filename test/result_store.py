@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from energy_toolkit.result_store import ResultStore
+
+
+class TestResultStore(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.store = ResultStore(os.path.join(self.folder.name, "results.db"))
+
+        self.programs = [
+            {"executeable": "/usr/bin/true", "args": [], "input": ""},
+            {"executeable": "/usr/bin/sleep", "args": ["0.1"], "input": ""},
+        ]
+
+    def tearDown(self):
+        self.store.close()
+        self.folder.cleanup()
+
+    def _results(self, offset):
+        dtype = [("energy", float), ("time", float), ("instructions", float)]
+        return {
+            pid: np.array(
+                [(offset + pid + i, 0.5 * i, 100.0 * i) for i in range(5)], dtype=dtype
+            )
+            for pid in range(len(self.programs))
+        }
+
+    def test_roundtrip(self):
+        """Stored datapoints and metrics are returned as columns"""
+        self.store.add_campaign(self.programs, self._results(0.0), 5, 10, 0, "base")
+
+        runs = self.store.query(program="sleep")
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(runs[0].args, ["0.1"])
+        self.assertEqual(runs[0].label, "base")
+        np.testing.assert_allclose(runs[0].columns["energy"], [1.0, 2.0, 3.0, 4.0, 5.0])
+        np.testing.assert_allclose(runs[0].columns["instructions"], [0, 100, 200, 300, 400])
+
+    def test_sparse_metrics(self):
+        """Metrics missing in the first datapoints are kept and nan where they are missing"""
+        rows = [
+            (1.0, 0.1, '{"instructions": 10.0}'),
+            (2.0, 0.2, '{"instructions": 20.0, "region": 3.0}'),
+        ]
+        columns = ResultStore._to_columns(rows)
+
+        self.assertEqual(list(columns), ["time", "energy", "instructions", "region"])
+        np.testing.assert_allclose(columns["energy"], [1.0, 2.0])
+        np.testing.assert_allclose(columns["region"], [np.nan, 3.0])
+
+    def test_query_filters(self):
+        """Programs are shared between campaigns and runs are returned newest first"""
+        first = self.store.add_campaign(self.programs, self._results(0.0), 5, 10, 0, "base")
+        second = self.store.add_campaign(self.programs, self._results(10.0), 5, 10, 0, "new")
+
+        runs = self.store.query(program="/usr/bin/true")
+        self.assertEqual([run.campaign for run in runs], [second, first])
+
+        self.assertEqual(len(self.store.query(last=3)), 3)
+        self.assertEqual(len(self.store.query(label="new")), 2)
+        self.assertEqual(self.store.query(host="no-such-host"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import asyncio
+import itertools
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import energy_toolkit
+from energy_toolkit.program import Program
+from energy_toolkit.roi import RegionMarkers
+from energy_toolkit.util import ExecutionStatus
+
+PYTHON_CLIENT = """
+from energy_toolkit import roi
+with roi.region("setup"):
+    pass
+for _ in range(3):
+    with roi.region("kernel"):
+        sum(range(10000))
+roi.begin("unclosed")
+"""
+
+C_CLIENT = """
+#include "roi.h"
+int main(void)
+{
+    etk_roi_begin("kernel");
+    etk_roi_end("kernel");
+    return 0;
+}
+"""
+
+
+class TestRegionMarkers(unittest.TestCase):
+
+    def setUp(self):
+        # The counter rises by one Joule per reading
+        counter = itertools.count(1)
+        self.markers = RegionMarkers(lambda: float(next(counter)))
+        self.program = Program(sys.executable, ["-c", PYTHON_CLIENT])
+
+    def test_python_client(self):
+        """Regions of a Python program are recorded and repeated entries are summed up"""
+        result = self.program.execute(0, 10, self.markers)
+        self.assertEqual(result.status, ExecutionStatus.OK)
+
+        regions = self.markers.get_regions()
+        self.assertEqual(regions["setup"][0], 1.0)
+        self.assertEqual(regions["setup"][2], 1)
+        self.assertEqual(regions["kernel"][0], 3.0)
+        self.assertEqual(regions["kernel"][2], 3)
+        self.assertEqual(self.markers.get_unclosed(), ["unclosed"])
+        self.assertIn("region_kernel_energy", self.markers.metrics())
+
+    def test_async(self):
+        """Asynchronous executions answer markers from the event loop"""
+        result = asyncio.run(self.program.execute_async(0, 10, self.markers))
+        self.assertEqual(result.status, ExecutionStatus.OK)
+        self.assertEqual(self.markers.get_regions()["kernel"][2], 3)
+
+    def test_standalone(self):
+        """Programs not started by the toolkit ignore their markers"""
+        env = dict(os.environ)
+        env.pop("ENERGY_TOOLKIT_MARKER_FD", None)
+        subprocess.run([sys.executable, "-c", PYTHON_CLIENT], env=env, check=True)
+
+    def test_c_client(self):
+        """The C header implements the same protocol"""
+        compiler = shutil.which("cc") or shutil.which("gcc")
+        if compiler is None:
+            self.skipTest("No C compiler available")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "client.c")
+            with open(source, "w", encoding="utf-8") as f:
+                f.write(C_CLIENT)
+
+            binary = os.path.join(tmp, "client")
+            include = os.path.dirname(energy_toolkit.__file__)
+            subprocess.run([compiler, "-I", include, "-o", binary, source], check=True)
+
+            result = Program(binary).execute(0, None, self.markers)
+
+        self.assertEqual(result.status, ExecutionStatus.OK)
+        self.assertEqual(self.markers.get_regions()["kernel"][0], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from click.testing import CliRunner
+
+from energy_toolkit.cli import cli
+from energy_toolkit.scaling import ScalingAnalysis
+
+
+class TestScaling(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.sizes = np.repeat([1000, 2000, 4000, 8000, 16000], 20).astype(float)
+        self.noise = 1 + rng.normal(0, 0.02, len(self.sizes))
+
+    def test_selects_quadratic(self):
+        """A quadratic program is fitted best by n^2 and its prediction lies in the interval"""
+        values = 0.01 + 3e-9 * self.sizes ** 2 * self.noise
+        fits = ScalingAnalysis(resamples=500, seed=0).fit(self.sizes, values, 100000)
+
+        best = fits[0]
+        self.assertEqual(best.model, "n^2")
+        self.assertGreater(best.r_squared, 0.99)
+        self.assertLessEqual(best.ci_low, best.prediction)
+        self.assertGreaterEqual(best.ci_high, best.prediction)
+        self.assertAlmostEqual(best.prediction, 30.01, delta=1.0)
+        self.assertAlmostEqual(best.get_per_element(), best.prediction / 100000)
+
+    def test_power_law(self):
+        """The exponent of a power law is recovered"""
+        values = 2e-6 * self.sizes ** 1.5 * self.noise
+        fits = ScalingAnalysis(resamples=200, seed=0).fit(self.sizes, values, 32000)
+
+        power_law = next(fit for fit in fits if fit.model == "power law")
+        self.assertAlmostEqual(power_law.slope, 1.5, delta=0.02)
+
+    def test_least_squares_vectorized(self):
+        """Leading axes are fitted independently"""
+        x = np.tile(np.arange(5.0), (3, 1))
+        y = np.stack([1 + 2 * x[0], 3 - x[0], np.full(5, 4.0)])
+
+        intercept, slope = ScalingAnalysis.least_squares(x, y)
+        np.testing.assert_allclose(intercept, [1, 3, 4])
+        np.testing.assert_allclose(slope, [2, -1, 0])
+
+    def test_templates(self):
+        """The size replaces {n} in arguments and input file"""
+        programs = ScalingAnalysis.create_programs("sort", ["-n", "{n}"], "in_{n}.txt", [10, 20])
+        self.assertEqual(programs[1].get_arguments(), ["-n", "20"])
+        self.assertEqual(programs[0].get_inputfile(), "in_10.txt")
+
+    def test_too_few_sizes(self):
+        """At least three sizes are needed"""
+        with self.assertRaises(ValueError):
+            ScalingAnalysis().fit(np.array([1.0, 2.0]), np.array([1.0, 2.0]), 10)
+
+
+    @mock.patch("energy_toolkit.cli.run_measurement", lambda toolkit, exporter: None)
+    @mock.patch("energy_toolkit.cli.is_admin", lambda: True)
+    def test_too_few_measured_sizes(self):
+        """The command fails cleanly if too few sizes could be measured"""
+        for results in ({}, {0: np.zeros(3, dtype=[("energy", float), ("time", float)])}):
+            with tempfile.TemporaryDirectory() as output, \
+                    mock.patch("energy_toolkit.cli.EnergyToolkit") as toolkit:
+                toolkit.return_value.get_results.return_value = results
+                result = CliRunner().invoke(
+                    cli,
+                    ["scale", shutil.which("true"), "--sizes", "10,20,40", "--predict", "100",
+                     "-o", output],
+                )
+
+            self.assertEqual(result.exit_code, 1, result.output)
+            self.assertIn(f"Only {len(results)} of 3 sizes were measured", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
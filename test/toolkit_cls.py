@@ -1,25 +1,31 @@
 import unittest
-from energy_toolkit.energy_toolkit import Energy_Toolkit
+
+import click
+import numpy as np
+
+from energy_toolkit.config_parser import ConfigParser
+from energy_toolkit.energy_toolkit import EnergyToolkit
+from energy_toolkit.util import Datapoint
 
 
 class TestEnergyToolkitClass(unittest.TestCase):
-    toolkit: Energy_Toolkit = None
+    toolkit: EnergyToolkit = None
 
     def setUp(self):
-        self.toolkit = Energy_Toolkit()
+        self.toolkit = EnergyToolkit()
 
     def test_creation(self):
         """Test creation of the toolkit"""
-        tkt = Energy_Toolkit()
+        tkt = EnergyToolkit()
         self.assertIsNotNone(tkt)
 
     def test_parameter(self):
         """Test measurement parameters"""
-        tkt = Energy_Toolkit()
+        tkt = EnergyToolkit()
         self.assertEqual(tkt._datapoints, 100)
         self.assertEqual(tkt._repetitions, 100)
 
-        tkt = Energy_Toolkit(datapoints=50, repetitions=42)
+        tkt = EnergyToolkit(datapoints=50, repetitions=42)
         self.assertEqual(tkt._datapoints, 50)
         self.assertEqual(tkt._repetitions, 42)
 
@@ -35,6 +41,61 @@ class TestEnergyToolkitClass(unittest.TestCase):
         self.toolkit.clear_programs()
         self.assertEqual(len(self.toolkit._programs), 0)
 
+    def test_store_results(self):
+        """Metrics missing in some datapoints are stored as nan"""
+        self.toolkit._store_results(
+            {
+                0: [
+                    Datapoint(1.0, 0.1, {"user_time": 0.1}),
+                    Datapoint(2.0, 0.2, {"user_time": 0.2, "region_main_energy": 1.5}),
+                    Datapoint(3.0, 0.3, {}),
+                ]
+            }
+        )
+
+        results = self.toolkit.get_results()[0]
+        self.assertEqual(
+            results.dtype.names, ("energy", "time", "user_time", "region_main_energy")
+        )
+        np.testing.assert_equal(results["user_time"], [0.1, 0.2, np.nan])
+        np.testing.assert_equal(results["region_main_energy"], [np.nan, 1.5, np.nan])
+
+
+class TestConfigSettings(unittest.TestCase):
+
+    def test_valid_settings(self):
+        """Valid warm-up, cache and timeout settings are accepted"""
+        ConfigParser.validate_settings(0, {})
+        ConfigParser.validate_settings(
+            0, {"warmup": 3, "warmup_time": 0.5, "cache_mode": "evict", "timeout": 2}
+        )
+        ConfigParser.validate(
+            {"programs": [{"executeable": "/bin/sh", "warmup": 0, "cache_mode": "drop"}]}
+        )
+
+    def test_invalid_settings(self):
+        """Invalid settings are rejected with the index of the entry"""
+        invalid = [
+            {"warmup": -1},
+            {"warmup": 1.5},
+            {"warmup": "3"},
+            {"warmup_time": -0.1},
+            {"warmup_time": "1"},
+            {"cache_mode": "cold"},
+            {"timeout": 0},
+            {"timeout": "10"},
+        ]
+        for settings in invalid:
+            with self.assertRaises(click.ClickException) as context:
+                ConfigParser.validate_settings(2, settings)
+            self.assertIn("entry 2", context.exception.message)
+            self.assertIn(f"'{next(iter(settings))}'", context.exception.message)
+
+        with self.assertRaises(click.ClickException):
+            ConfigParser.validate(
+                {"programs": [{"executeable": "/bin/sh", "cache_mode": "cold"}]}
+            )
+
 
 if __name__ == "__main__":
     unittest.main()
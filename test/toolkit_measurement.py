@@ -1,18 +1,21 @@
+import asyncio
 from typing import Dict
 import unittest
+from unittest import mock
 
 import numpy as np
-from energy_toolkit.energy_toolkit import Energy_Toolkit, Program
+from energy_toolkit.energy_toolkit import EnergyToolkit, Program
+from energy_toolkit.util import CacheMode, ToolkitUtil
 
 
 class TestEnergyToolkitMeasurement(unittest.TestCase):
-    toolkit: Energy_Toolkit = None
+    toolkit: EnergyToolkit = None
     result: Dict[str, np.ndarray] = None
 
     @classmethod
     def setUpClass(cls):
         """Initialize a toolkit with a measurement"""
-        cls.toolkit = Energy_Toolkit(3, 2)
+        cls.toolkit = EnergyToolkit(3, 2)
         p = Program("./dummyprog", [], "")
         cls.toolkit.add_program(p)
         cls.toolkit.measure()
@@ -36,5 +39,68 @@ class TestEnergyToolkitMeasurement(unittest.TestCase):
         self.toolkit.write_statistics()
 
 
+class TestWarmUpAndCache(unittest.TestCase):
+
+    def trace(self, program, run=lambda toolkit: toolkit.measure()):
+        """Measure the program once with two repetitions and return the order of the calls"""
+        calls = []
+        readings = iter(range(1, 100))
+        toolkit = EnergyToolkit(1, 2, programs=[program])
+        execute = program.execute
+
+        def record_execute(*args):
+            calls.append("execute")
+            return execute(*args)
+
+        def record_energy():
+            calls.append("energy")
+            return [next(readings)]
+
+        with mock.patch.object(toolkit, "_read_energy", side_effect=record_energy), \
+                mock.patch.object(program, "execute", side_effect=record_execute), \
+                mock.patch.object(program, "execute_async", side_effect=self.to_async(calls)), \
+                mock.patch.object(ToolkitUtil, "drop_page_cache", lambda: calls.append("drop")), \
+                mock.patch.object(program, "evict_cache", lambda: calls.append("evict")):
+            run(toolkit)
+
+        self.assertEqual(len(toolkit.get_results()[0]), 1)
+        return calls
+
+    @staticmethod
+    def to_async(calls):
+        async def record_execute_async(*args):
+            calls.append("execute")
+            return Program("true").execute(*args)
+        return record_execute_async
+
+    def test_warmup_excluded(self):
+        """Warm-up executions run before the first energy reading and are not recorded"""
+        calls = self.trace(Program("true", warmup=3))
+
+        self.assertEqual(calls[:3], ["execute"] * 3)
+        self.assertEqual(calls[3:], ["energy", "execute", "energy"] * 2)
+
+    def test_warmup_time(self):
+        """Warm-up continues until the warm-up time has passed"""
+        calls = self.trace(Program("sleep", ["0.02"], warmup=1, warmup_time=0.1))
+
+        warmups = calls.index("energy")
+        self.assertGreaterEqual(warmups, 4)
+        self.assertEqual(calls[:warmups], ["execute"] * warmups)
+
+    def test_cache_modes(self):
+        """The cache state is prepared outside of the timed section of every repetition"""
+        for mode, name in ((CacheMode.DROP, "drop"), (CacheMode.EVICT, "evict")):
+            for run in (
+                lambda toolkit: toolkit.measure(),
+                lambda toolkit: asyncio.run(toolkit.run_async()),
+            ):
+                calls = self.trace(Program("true", cache_mode=mode), run)
+                self.assertEqual(calls, [name, "energy", "execute", "energy"] * 2)
+
+        calls = self.trace(Program("true", cache_mode=CacheMode.WARM))
+        self.assertEqual(calls, ["energy", "execute", "energy"] * 2)
+
+
 if __name__ == "__main__":
     unittest.main()